@@ -1,8 +1,27 @@
 import streamlit as st
+import atexit
 import base64
-from datetime import datetime
+import io
+from datetime import datetime, timedelta
 import time
 import random
+import os
+
+from safebuild import SafetyExpertSystem
+from safebuild.alerts import AlertDispatcher, create_sinks
+from safebuild.cache import AnalysisCache, make_cache_key
+from safebuild.detections import Detections
+from safebuild.detectors import SimulatorDetector, create_detector
+from safebuild.history import HistoryStore, batch_summary, compliance_ratio
+from safebuild.ingest import IngestLimitError, SessionMemoryBudget, upload_buffer
+from safebuild.metrics import RULE_SECONDS, STAGE_SECONDS, MetricsRegistry, start_metrics_server
+from safebuild.overlay import OverlayCache
+from safebuild.pipeline import AnalysisPipeline
+from safebuild.reports import ExportTooLarge, export, pq
+from safebuild.rules import RuleRegistry
+from safebuild.service import HISTORY_FLUSH_ROWS, HISTORY_FLUSH_S, ServiceClient
+from safebuild.tracking import WorkerTracker
+from safebuild.video import AdaptiveSampler, AlertDebouncer, analyze_stream, iter_frames
 
 # =============================================
 # CONFIGURACIÓN DE LA PÁGINA
@@ -88,149 +107,19 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # =============================================
-# SISTEMA EXPERTO
-# =============================================
-class SafetyExpertSystem:
-    def __init__(self):
-        self.rules = {
-            'no_helmet_critical': {
-                'condition': lambda stats: stats['persons'] > 0 and stats['helmets'] == 0,
-                'message': "CRÍTICO: Ningún trabajador usa casco de seguridad",
-                'level': "ALTA",
-                'action': "DETENER actividades inmediatamente y notificar al supervisor de seguridad"
-            },
-            'no_helmet_partial': {
-                'condition': lambda stats: stats['persons'] > 0 and stats['helmets'] < stats['persons'],
-                'message': "ALTA: Trabajadores detectados sin casco de seguridad",
-                'level': "ALTA", 
-                'action': "Aislar el área y proveer EPP inmediatamente"
-            },
-            'no_vest_critical': {
-                'condition': lambda stats: stats['persons'] > 0 and stats['vests'] == 0,
-                'message': "MEDIA: Ningún trabajador usa chaleco reflectante",
-                'level': "MEDIA",
-                'action': "Notificar al supervisor y proveer chalecos de seguridad"
-            },
-            'no_vest_partial': {
-                'condition': lambda stats: stats['persons'] > 0 and stats['vests'] < stats['persons'],
-                'message': "MEDIA: Trabajadores detectados sin chaleco reflectante",
-                'level': "MEDIA",
-                'action': "Recordar uso obligatorio de chaleco en reunión de seguridad"
-            },
-            'proper_equipment': {
-                'condition': lambda stats: stats['persons'] > 0 and stats['helmets'] >= stats['persons'] and stats['vests'] >= stats['persons'],
-                'message': "OK: Todo el personal cuenta con Equipo de Protección Personal completo",
-                'level': "OK",
-                'action': "Continuar monitoreo y mantener los estándares de seguridad"
-            },
-            'no_persons': {
-                'condition': lambda stats: stats['persons'] == 0,
-                'message': "OK: No se detectaron trabajadores en el área analizada",
-                'level': "OK", 
-                'action': "Continuar con el monitoreo rutinario del área"
-            }
-        }
-    
-    def analyze_detections(self, detections):
-        person_count = sum(1 for det in detections if det['class_name'] == 'person')
-        helmet_count = sum(1 for det in detections if det['class_name'] == 'helmet') 
-        vest_count = sum(1 for det in detections if det['class_name'] == 'safety_vest')
-        
-        detection_stats = {
-            'persons': person_count,
-            'helmets': helmet_count,
-            'vests': vest_count
-        }
-        
-        for rule_name, rule in self.rules.items():
-            if rule['condition'](detection_stats):
-                return {
-                    'alert_level': rule['level'],
-                    'alert_message': rule['message'],
-                    'recommended_action': rule['action'],
-                    'statistics': detection_stats
-                }
-        
-        return {
-            'alert_level': "OK",
-            'alert_message': "Condiciones normales de seguridad detectadas",
-            'recommended_action': "Continuar con el monitoreo rutinario",
-            'statistics': detection_stats
-        }
-
-# =============================================
-# SIMULADOR DE DETECCIÓN DE IMÁGENES
-# =============================================
-def analyze_uploaded_image(image_file):
-    """
-    Simula el análisis de una imagen subida
-    En una implementación real, aquí iría el modelo YOLO
-    """
-    # Simular análisis basado en características de la imagen
-    file_name = image_file.name.lower()
-    file_size = image_file.size
-    
-    # Simular diferentes escenarios basados en nombre y tamaño
-    if any(word in file_name for word in ['safe', 'seguro', 'good', 'completo']):
-        # Escenario seguro
-        return [
-            {'class_name': 'person', 'confidence': 0.92, 'bbox': [100, 100, 180, 250]},
-            {'class_name': 'helmet', 'confidence': 0.89, 'bbox': [110, 90, 140, 120]},
-            {'class_name': 'safety_vest', 'confidence': 0.87, 'bbox': [100, 120, 180, 170]},
-            {'class_name': 'person', 'confidence': 0.85, 'bbox': [300, 150, 380, 300]},
-            {'class_name': 'helmet', 'confidence': 0.88, 'bbox': [310, 140, 340, 170]},
-            {'class_name': 'safety_vest', 'confidence': 0.86, 'bbox': [300, 170, 380, 220]}
-        ]
-    elif any(word in file_name for word in ['peligro', 'peligroso', 'danger', 'alert']):
-        # Escenario crítico
-        return [
-            {'class_name': 'person', 'confidence': 0.94, 'bbox': [100, 100, 180, 250]},
-            {'class_name': 'person', 'confidence': 0.91, 'bbox': [300, 150, 380, 300]},
-            # Sin EPPs
-        ]
-    elif file_size > 1000000:  # Imagen grande - más probabilidad de múltiples personas
-        # Escenario mixto
-        return [
-            {'class_name': 'person', 'confidence': 0.93, 'bbox': [100, 100, 180, 250]},
-            {'class_name': 'helmet', 'confidence': 0.90, 'bbox': [110, 90, 140, 120]},
-            # Falta chaleco
-            {'class_name': 'person', 'confidence': 0.87, 'bbox': [300, 150, 380, 300]},
-            # Falta casco
-            {'class_name': 'safety_vest', 'confidence': 0.85, 'bbox': [300, 170, 380, 220]}
-        ]
-    else:
-        # Escenario aleatorio basado en probabilidades
-        scenarios = [
-            # Escenario seguro
-            [
-                {'class_name': 'person', 'confidence': 0.91, 'bbox': [100, 100, 180, 250]},
-                {'class_name': 'helmet', 'confidence': 0.88, 'bbox': [110, 90, 140, 120]},
-                {'class_name': 'safety_vest', 'confidence': 0.86, 'bbox': [100, 120, 180, 170]}
-            ],
-            # Escenario con alertas
-            [
-                {'class_name': 'person', 'confidence': 0.93, 'bbox': [100, 100, 180, 250]},
-                {'class_name': 'helmet', 'confidence': 0.89, 'bbox': [110, 90, 140, 120]},
-                # Falta chaleco
-                {'class_name': 'person', 'confidence': 0.87, 'bbox': [300, 150, 380, 300]},
-                {'class_name': 'safety_vest', 'confidence': 0.85, 'bbox': [300, 170, 380, 220]}
-            ],
-            # Escenario crítico
-            [
-                {'class_name': 'person', 'confidence': 0.94, 'bbox': [100, 100, 180, 250]},
-                {'class_name': 'person', 'confidence': 0.90, 'bbox': [300, 150, 380, 300]}
-            ]
-        ]
-        return random.choice(scenarios)
-
-# =============================================
-# FUNCIÓN PARA DIBUJAR DETECCIONES (SIMULADO)
+# FUNCIÓN PARA DIBUJAR DETECCIONES
 # =============================================
 def create_analysis_visualization(image, detections, analysis):
     """
-    Crea una visualización HTML con la imagen y los resultados
+    Dibuja las detecciones sobre la copia reducida de la imagen (personas
+    coloreadas según su EPP) y muestra el resumen del análisis. El overlay
+    se cachea: un rerun con las mismas detecciones no lo vuelve a generar.
     """
-    # Simular imagen con bounding boxes (en realidad sería la imagen procesada)
+    overlay = overlay_cache.get_or_render(image.digest, image.image, detections, image.scale)
+    st.image(overlay, caption=f"Detecciones sobre {image.name}", use_column_width=True)
+    st.caption("Personas: 🟩 con casco y chaleco · 🟧 les falta uno · 🟥 sin EPP — "
+               "cascos en azul, chalecos en celeste")
+
     st.markdown(f"""
     <div class="analysis-result">
         <h3>📊 Resultado del Análisis</h3>
@@ -242,10 +131,220 @@ def create_analysis_visualization(image, detections, analysis):
     
     return True
 
+
+def render_alert_box(analysis):
+    """
+    Recuadro con el nivel de alerta, el mensaje y la acción recomendada
+    """
+    alert_level = analysis['alert_level']
+    if alert_level == "ALTA":
+        st.markdown(f"""
+        <div class="alert-high">
+            <h3>🚨 ALERTA CRÍTICA DE SEGURIDAD</h3>
+            <p><strong>{analysis['alert_message']}</strong></p>
+            <p>📋 <strong>Acción Recomendada:</strong> {analysis['recommended_action']}</p>
+            <p>⏰ <strong>Prioridad:</strong> Resolución Inmediata</p>
+        </div>
+        """, unsafe_allow_html=True)
+    elif alert_level == "MEDIA":
+        st.markdown(f"""
+        <div class="alert-medium">
+            <h3>⚠️ ALERTA DE SEGURIDAD</h3>
+            <p><strong>{analysis['alert_message']}</strong></p>
+            <p>📋 <strong>Acción Recomendada:</strong> {analysis['recommended_action']}</p>
+            <p>⏰ <strong>Prioridad:</strong> Resolución en 1 hora</p>
+        </div>
+        """, unsafe_allow_html=True)
+    else:
+        st.markdown(f"""
+        <div class="alert-ok">
+            <h3>✅ CONDICIONES SEGURAS</h3>
+            <p><strong>{analysis['alert_message']}</strong></p>
+            <p>📋 <strong>Acción Recomendada:</strong> {analysis['recommended_action']}</p>
+            <p>⏰ <strong>Estado:</strong> Operaciones Normales</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+
+def analysis_cache_key(ingested):
+    """
+    Clave de caché de una imagen subida con la configuración actual
+    (detector, confianza mínima y reglas de la obra)
+    """
+    detector_config = {**detector.config, 'min_confidence': min_confidence,
+                       'rules': ruleset.fingerprint, 'all_matches': ruleset.all_matches}
+    if detector.depends_on_file_name:
+        # El simulador decide según el nombre del archivo, por eso forma parte de la clave
+        detector_config['file_name'] = ingested.name
+    return make_cache_key(ingested.data, detector_config)
+
+
+def record_upload_analysis(ingested, analysis, elapsed_ms):
+    """
+    Guarda el resultado en el historial y, si corresponde, despacha la alerta
+    """
+    history_store.record(analysis, site, camera, source=ingested.name, elapsed_ms=elapsed_ms)
+    if alert_system:
+        alert_dispatcher.submit_analysis(analysis, site, camera, source=ingested.name)
+
 # =============================================
 # INICIALIZACIÓN
 # =============================================
-expert_system = SafetyExpertSystem()
+@st.cache_resource
+def get_rule_registry():
+    """
+    Reglas por obra desde SAFEBUILD_RULES_DIR (<obra>.yaml|.json o default.*),
+    recargadas cuando cambia el archivo (se revisa cada SAFEBUILD_RULES_CHECK_S segundos)
+    """
+    return RuleRegistry(
+        os.environ.get('SAFEBUILD_RULES_DIR'),
+        check_interval=float(os.environ.get('SAFEBUILD_RULES_CHECK_S', '2'))
+    )
+
+rule_registry = get_rule_registry()
+
+@st.cache_resource
+def get_analysis_cache():
+    """
+    Caché compartida entre sesiones y reruns. El nivel en disco se activa
+    definiendo SAFEBUILD_CACHE_DIR (hasta SAFEBUILD_CACHE_DISK_MB, 512 por defecto).
+    """
+    return AnalysisCache(
+        max_memory_bytes=int(os.environ.get('SAFEBUILD_CACHE_MB', '64')) * 1024 * 1024,
+        disk_dir=os.environ.get('SAFEBUILD_CACHE_DIR') or None,
+        max_disk_bytes=int(os.environ.get('SAFEBUILD_CACHE_DISK_MB', '512')) * 1024 * 1024
+    )
+
+analysis_cache = get_analysis_cache()
+
+@st.cache_resource
+def get_overlay_cache():
+    """
+    Overlays JPEG ya dibujados, por imagen + detecciones
+    """
+    return OverlayCache(max_bytes=int(os.environ.get('SAFEBUILD_OVERLAY_CACHE_MB', '32')) * 1024 * 1024)
+
+overlay_cache = get_overlay_cache()
+
+@st.cache_resource
+def get_metrics():
+    """
+    Histogramas de latencia por etapa y por regla, compartidos por todas las sesiones
+    """
+    return MetricsRegistry()
+
+metrics = get_metrics()
+
+@st.cache_resource
+def get_metrics_server():
+    """
+    Expone /metrics (formato Prometheus) en SAFEBUILD_METRICS_PORT (0 lo desactiva)
+    """
+    port = int(os.environ.get('SAFEBUILD_METRICS_PORT', '9108'))
+    if port == 0:
+        return None, None
+    try:
+        return start_metrics_server(get_metrics(), port), None
+    except OSError as e:
+        return None, f"No se pudo abrir el puerto {port} para /metrics: {e}"
+
+metrics_server, metrics_server_error = get_metrics_server()
+
+@st.cache_resource
+def get_detector():
+    """
+    Carga el detector una sola vez por proceso. Se configura con
+    SAFEBUILD_DETECTOR (simulador | onnx), SAFEBUILD_MODEL_PATH y
+    SAFEBUILD_DETECTOR_THREADS. Con SAFEBUILD_TILE_SIZE (> 0) las imágenes
+    grandes se analizan por mosaico (SAFEBUILD_TILE_OVERLAP, SAFEBUILD_TILE_WORKERS).
+    Si el modelo no se puede cargar se usa el simulador.
+    """
+    backend = os.environ.get('SAFEBUILD_DETECTOR', 'simulador')
+    threads = os.environ.get('SAFEBUILD_DETECTOR_THREADS')
+    tile_overlap = os.environ.get('SAFEBUILD_TILE_OVERLAP')
+    tile_workers = os.environ.get('SAFEBUILD_TILE_WORKERS')
+    try:
+        detector = create_detector(
+            backend,
+            model_path=os.environ.get('SAFEBUILD_MODEL_PATH'),
+            num_threads=int(threads) if threads else None,
+            tile_size=int(os.environ.get('SAFEBUILD_TILE_SIZE') or 0),
+            tile_overlap=int(tile_overlap) if tile_overlap else None,
+            tile_workers=int(tile_workers) if tile_workers else None
+        )
+        return detector, None
+    except (ImportError, OSError, ValueError) as e:
+        return SimulatorDetector(), f"No se pudo cargar el detector '{backend}': {e}"
+
+detector, detector_error = get_detector()
+
+@st.cache_resource
+def get_analysis_pipeline():
+    """
+    Pool de análisis en segundo plano, uno por proceso del servidor
+    """
+    return AnalysisPipeline(
+        SafetyExpertSystem(),
+        detector=get_detector()[0],
+        cache=get_analysis_cache(),
+        metrics=get_metrics(),
+        max_workers=int(os.environ.get('SAFEBUILD_ANALYSIS_WORKERS', '2'))
+    )
+
+analysis_pipeline = get_analysis_pipeline()
+
+@st.cache_resource
+def get_history_store():
+    """
+    Historial persistente compartido por todas las sesiones
+    """
+    return HistoryStore(os.environ.get('SAFEBUILD_HISTORY_DB', 'safebuild_history.db'))
+
+history_store = get_history_store()
+
+@st.cache_resource
+def get_alert_dispatcher():
+    """
+    Despacho de alertas en segundo plano, uno por proceso. Destinos en
+    SAFEBUILD_ALERT_SINKS (p. ej. "stdout,file:alertas.jsonl,webhook:http://localhost:9000/alertas");
+    sin destinos no se despacha nada.
+    """
+    try:
+        sinks = create_sinks(os.environ.get('SAFEBUILD_ALERT_SINKS'))
+    except ValueError as e:
+        return AlertDispatcher([]), str(e)
+    dispatcher = AlertDispatcher(
+        sinks,
+        dedupe_window_s=float(os.environ.get('SAFEBUILD_ALERT_DEDUPE_S', '300')),
+        batch_window_s=float(os.environ.get('SAFEBUILD_ALERT_BATCH_S', '2')),
+        rate_per_minute=float(os.environ.get('SAFEBUILD_ALERT_RATE_PER_MIN', '30'))
+    )
+    # Al cerrar el servidor se despacha lo que quedó en cola
+    atexit.register(dispatcher.close, 2.0)
+    return dispatcher, None
+
+alert_dispatcher, alert_dispatcher_error = get_alert_dispatcher()
+
+@st.cache_resource
+def get_service_client():
+    """
+    Cliente del servicio de ingesta (python -m safebuild.service) en
+    SAFEBUILD_SERVICE_URL, p. ej. http://127.0.0.1:8500. Sin URL el modo
+    servicio solo muestra cómo iniciarlo.
+    """
+    url = os.environ.get('SAFEBUILD_SERVICE_URL')
+    return ServiceClient(url, timeout=2.0) if url else None
+
+service_client = get_service_client()
+
+# Cada sesión retiene como máximo SAFEBUILD_SESSION_MEMORY_MB de imágenes
+# (bytes subidos + copia reducida de SAFEBUILD_PREVIEW_MAX_SIDE px de lado)
+PREVIEW_MAX_SIDE = int(os.environ.get('SAFEBUILD_PREVIEW_MAX_SIDE', '1440'))
+if 'memory_budget' not in st.session_state:
+    st.session_state.memory_budget = SessionMemoryBudget(
+        max_bytes=int(os.environ.get('SAFEBUILD_SESSION_MEMORY_MB', '256')) * 1024 * 1024
+    )
+memory_budget = st.session_state.memory_budget
 
 # =============================================
 # SIDEBAR
@@ -254,13 +353,37 @@ st.sidebar.markdown('<div class="sidebar-section">', unsafe_allow_html=True)
 st.sidebar.header("⚙️ Configuración")
 min_confidence = st.sidebar.slider("Confianza Mínima", 0.1, 0.9, 0.6, 0.05)
 alert_system = st.sidebar.checkbox("Sistema de Alertas Activo", True)
+site = st.sidebar.text_input("Obra", "obra-principal")
+camera = st.sidebar.text_input("Cámara", "subida-manual")
+st.sidebar.caption(f"🧠 Detector: {detector.describe()}")
+if alert_dispatcher.channels:
+    alert_summary = alert_dispatcher.summary()
+    failing = [channel['channel'] for channel in alert_summary['channels'] if channel['last_error']]
+    st.sidebar.caption(f"📣 Alertas: {', '.join(c.sink.describe() for c in alert_dispatcher.channels)} · "
+                       f"{alert_summary['queued']} encoladas · {alert_summary['deduplicated']} repetidas")
+    if failing:
+        st.sidebar.warning(f"⚠️ Fallan los envíos a: {', '.join(failing)}")
+if alert_dispatcher_error:
+    st.sidebar.warning(f"⚠️ Alertas: {alert_dispatcher_error}")
+
+# Reglas de la obra: si su archivo cambió se recompilan aquí, sin reiniciar
+rule_book = rule_registry.book(site)
+ruleset = rule_registry.rules_for(site)
+expert_system = SafetyExpertSystem(ruleset)
+rules_label = os.path.basename(ruleset.source) if ruleset.source else "de fábrica"
+st.sidebar.caption(f"📜 Reglas: {rules_label} ({len(ruleset.rules)})"
+                   + (" · todas las coincidencias" if ruleset.all_matches else ""))
+if rule_book is not None and rule_book.error:
+    st.sidebar.warning(f"⚠️ Reglas: {rule_book.error}. Se mantienen las anteriores.")
+if detector_error:
+    st.sidebar.warning(f"⚠️ {detector_error}. Usando el simulador.")
 st.sidebar.markdown('</div>', unsafe_allow_html=True)
 
 st.sidebar.markdown('<div class="sidebar-section">', unsafe_allow_html=True)
 st.sidebar.header("🎯 Modo de Operación")
 mode = st.sidebar.radio(
     "Selecciona el modo:",
-    ["📸 Subir Mi Imagen", "📊 Demo con Escenarios"],
+    ["📸 Subir Mi Imagen", "🎥 Video / Secuencia", "🛰️ Servicio de Ingesta", "📊 Demo con Escenarios"],
     index=0
 )
 st.sidebar.markdown('</div>', unsafe_allow_html=True)
@@ -283,70 +406,155 @@ with col1:
     if mode == "📸 Subir Mi Imagen":
         st.info("📸 **Sube una imagen de tu obra para analizar la seguridad**")
         
-        # Widget para subir imagen
-        uploaded_file = st.file_uploader(
-            "Selecciona una imagen de la obra:",
+        # Widget para subir imágenes (una o el lote completo de la jornada)
+        uploaded_files = st.file_uploader(
+            "Selecciona una o varias imágenes de la obra:",
             type=['jpg', 'jpeg', 'png', 'bmp'],
+            accept_multiple_files=True,
             help="Formatos soportados: JPG, JPEG, PNG, BMP"
         )
-        
-        if uploaded_file is not None:
+
+        # Cada archivo se decodifica una sola vez, ya reducido, en su propio slot
+        # del presupuesto de la sesión; la vista previa y el detector comparten esa copia
+        upload_slots = {f"upload:{uploaded_file.file_id}": uploaded_file for uploaded_file in uploaded_files}
+        memory_budget.release_missing('upload:', upload_slots)
+        ingested_images = []
+        for slot, uploaded_file in upload_slots.items():
+            ingested = memory_budget.get(slot)
+            if ingested is None:
+                try:
+                    with metrics.time_stage('decode'):
+                        ingested = memory_budget.ingest(
+                            slot, uploaded_file.name, upload_buffer(uploaded_file), max_side=PREVIEW_MAX_SIDE
+                        )
+                except IngestLimitError as e:
+                    st.error(f"❌ {uploaded_file.name}: imagen demasiado grande para esta sesión: {e}")
+                    continue
+                except OSError as e:
+                    st.error(f"❌ {uploaded_file.name}: no se pudo leer la imagen: {e}")
+                    continue
+            ingested_images.append(ingested)
+
+        if len(ingested_images) == 1:
+            ingested = ingested_images[0]
             # Mostrar información de la imagen
-            st.success(f"✅ **Imagen cargada:** {uploaded_file.name}")
+            st.success(f"✅ **Imagen cargada:** {ingested.name}")
             
             # Mostrar la imagen subida
-            st.image(uploaded_file, caption=f"Imagen de la obra: {uploaded_file.name}", use_column_width=True)
+            original_width, original_height = ingested.original_size
+            st.image(ingested.image, caption=f"Imagen de la obra: {ingested.name} ({original_width}×{original_height})",
+                     use_column_width=True)
             
             # Botón para analizar
             if st.button("🔍 Analizar Imagen", use_container_width=True):
-                with st.spinner("Analizando imagen con IA..."):
-                    # Simular tiempo de procesamiento
-                    progress_bar = st.progress(0)
-                    for i in range(100):
-                        time.sleep(0.02)
-                        progress_bar.progress(i + 1)
-                    
-                    # Analizar la imagen
-                    detections = analyze_uploaded_image(uploaded_file)
-                    analysis = expert_system.analyze_detections(detections)
-                
-                st.success("✅ Análisis completado")
-                
-                # Mostrar visualización del análisis
-                create_analysis_visualization(uploaded_file, detections, analysis)
-                
-                # Mostrar resultados del análisis
-                alert_level = analysis['alert_level']
-                if alert_level == "ALTA":
-                    st.markdown(f"""
-                    <div class="alert-high">
-                        <h3>🚨 ALERTA CRÍTICA DE SEGURIDAD</h3>
-                        <p><strong>{analysis['alert_message']}</strong></p>
-                        <p>📋 <strong>Acción Recomendada:</strong> {analysis['recommended_action']}</p>
-                        <p>⏰ <strong>Prioridad:</strong> Resolución Inmediata</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                elif alert_level == "MEDIA":
-                    st.markdown(f"""
-                    <div class="alert-medium">
-                        <h3>⚠️ ALERTA DE SEGURIDAD</h3>
-                        <p><strong>{analysis['alert_message']}</strong></p>
-                        <p>📋 <strong>Acción Recomendada:</strong> {analysis['recommended_action']}</p>
-                        <p>⏰ <strong>Prioridad:</strong> Resolución en 1 hora</p>
-                    </div>
-                    """, unsafe_allow_html=True)
+                analysis_start = time.perf_counter()
+                with metrics.time_stage('hash'):
+                    cache_key = analysis_cache_key(ingested)
+                cached = analysis_cache.get(cache_key)
+
+                job = None
+                if cached is not None:
+                    detections, analysis = Detections.from_json(cached['detections']), cached['analysis']
                 else:
-                    st.markdown(f"""
-                    <div class="alert-ok">
-                        <h3>✅ CONDICIONES SEGURAS</h3>
-                        <p><strong>{analysis['alert_message']}</strong></p>
-                        <p>📋 <strong>Acción Recomendada:</strong> {analysis['recommended_action']}</p>
-                        <p>⏰ <strong>Estado:</strong> Operaciones Normales</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-        
-        else:
-            st.info("👆 **Selecciona una imagen de tu obra para comenzar el análisis**")
+                    # El análisis corre en segundo plano; la interfaz solo consulta su avance
+                    job = analysis_pipeline.submit(
+                        ingested,
+                        min_confidence=min_confidence,
+                        cache_key=cache_key,
+                        expert_system=expert_system
+                    )
+                    progress_bar = st.progress(0.0, text=job.stage_label)
+                    while not job.wait(0.05):
+                        progress_bar.progress(job.progress, text=job.stage_label)
+                    progress_bar.progress(job.progress, text=job.stage_label)
+
+                    if job.error is None:
+                        detections, analysis = job.detections, job.analysis
+                    else:
+                        st.error(f"❌ No se pudo analizar la imagen: {job.error}")
+
+                if job is None or job.error is None:
+                    with job.stage('render') if job is not None else metrics.time_stage('render'):
+                        st.success("✅ Análisis completado")
+
+                        # Mostrar visualización del análisis
+                        create_analysis_visualization(ingested, detections, analysis)
+
+                        # Mostrar resultados del análisis
+                        render_alert_box(analysis)
+                    if job is not None:
+                        total_ms = sum(job.timings.values()) * 1000
+                        progress_bar.progress(1.0, text=f"✅ Análisis completado en {total_ms:.0f} ms")
+
+                    record_upload_analysis(ingested, analysis, (time.perf_counter() - analysis_start) * 1000)
+
+        elif ingested_images:
+            st.success(f"✅ **{len(ingested_images)} imágenes cargadas**")
+
+            if st.button(f"🔍 Analizar {len(ingested_images)} Imágenes", use_container_width=True):
+                # Todo el lote se encola en el pool acotado del pipeline; cada tarjeta
+                # se muestra apenas termina su imagen, en orden de llegada
+                batch_start = time.perf_counter()
+                batch_analyses = []
+                batch_progress = st.progress(0.0, text=f"0 de {len(ingested_images)} imágenes analizadas")
+
+                def show_card(ingested, detections, analysis, job=None):
+                    card_start = time.perf_counter()
+                    with job.stage('render') if job is not None else metrics.time_stage('render'):
+                        with st.expander(f"📷 {ingested.name} — {analysis['alert_level']}", expanded=True):
+                            create_analysis_visualization(ingested, detections, analysis)
+                            render_alert_box(analysis)
+                    batch_analyses.append(analysis)
+                    # El tiempo propio de la imagen (etapas de su job), no el transcurrido
+                    # desde el inicio del lote; las que salen de la caché solo se dibujan
+                    elapsed_s = sum(job.timings.values()) if job is not None else time.perf_counter() - card_start
+                    record_upload_analysis(ingested, analysis, elapsed_s * 1000)
+                    batch_progress.progress(
+                        len(batch_analyses) / len(ingested_images),
+                        text=f"{len(batch_analyses)} de {len(ingested_images)} imágenes analizadas"
+                    )
+
+                pending = []
+                for ingested in ingested_images:
+                    with metrics.time_stage('hash'):
+                        cache_key = analysis_cache_key(ingested)
+                    cached = analysis_cache.get(cache_key)
+                    if cached is not None:
+                        pending.append((None, ingested, cached))
+                    else:
+                        job = analysis_pipeline.submit(
+                            ingested,
+                            min_confidence=min_confidence,
+                            cache_key=cache_key,
+                            expert_system=expert_system
+                        )
+                        pending.append((job, ingested, None))
+
+                failed = 0
+                while pending:
+                    waiting = []
+                    for job, ingested, cached in pending:
+                        if job is None:
+                            show_card(ingested, Detections.from_json(cached['detections']), cached['analysis'])
+                        elif not job.done:
+                            waiting.append((job, ingested, cached))
+                        elif job.error is None:
+                            show_card(ingested, job.detections, job.analysis, job)
+                        else:
+                            failed += 1
+                            st.error(f"❌ No se pudo analizar {ingested.name}: {job.error}")
+                    pending = waiting
+                    if pending:
+                        pending[0][0].wait(0.05)
+
+                batch_totals = batch_summary(batch_analyses)
+                batch_progress.progress(
+                    1.0, text=f"✅ Lote analizado: {len(batch_analyses)} imágenes en "
+                              f"{time.perf_counter() - batch_start:.1f} s" + (f" · {failed} con error" if failed else "")
+                )
+
+        elif not uploaded_files:
+            st.info("👆 **Selecciona una o varias imágenes de tu obra para comenzar el análisis**")
             st.markdown("""
             **📝 Tip:** Puedes subir fotos de:
             - Trabajadores en la obra
@@ -354,7 +562,165 @@ with col1:
             - Áreas de trabajo
             - Equipos y personal
             """)
-            
+
+    elif mode == "🎥 Video / Secuencia":
+        st.info("🎥 **Analiza un video local o un directorio de frames de una cámara**")
+
+        stream_source = st.text_input(
+            "Ruta del video o directorio de frames:",
+            help="Video (requiere OpenCV) o carpeta con imágenes JPG/PNG ordenadas por nombre"
+        )
+        col_fps, col_stride, col_debounce = st.columns(3)
+        with col_fps:
+            stream_fps = st.number_input("FPS (directorio de frames)", 0.1, 60.0, 1.0)
+        with col_stride:
+            max_stride = st.number_input("Salto máximo sin personas", 1, 300, 30)
+        with col_debounce:
+            raise_after = st.number_input("Frames para confirmar alerta", 1, 30, 3)
+
+        if st.button("▶️ Procesar Secuencia", use_container_width=True, disabled=not stream_source):
+            if not os.path.exists(stream_source):
+                st.error(f"❌ No existe la ruta: {stream_source}")
+            else:
+                status = st.empty()
+                events_box = st.expander("🚨 Eventos de alerta confirmados", expanded=True)
+                workers_box = st.expander("👷 Episodios por trabajador", expanded=True)
+                tracker = WorkerTracker(raise_after=int(raise_after))
+                stream_camera = os.path.basename(stream_source.rstrip(os.sep))
+                # El historial se escribe en lotes durante la secuencia (como el colector
+                # del servicio): la memoria no crece con la duración del video
+                history_rows = []
+                history_flushed_at = time.monotonic()
+                analyzed_frames = 0
+
+                def show_worker_event(worker_event):
+                    if worker_event['kind'] == 'start':
+                        message = f"⏱️ {worker_event['started_at']:.1f}s — **{worker_event['alert_level']}**: {worker_event['alert_message']}"
+                        if worker_event['alert_level'] == "ALTA":
+                            workers_box.error(message)
+                        else:
+                            workers_box.warning(message)
+                    else:
+                        workers_box.info(
+                            f"⏱️ {worker_event['timestamp']:.1f}s — {worker_event['alert_message']} "
+                            f"(duración {worker_event['duration_s']:.1f}s)"
+                        )
+
+                try:
+                    for result in analyze_stream(
+                        iter_frames(stream_source, fps=stream_fps),
+                        expert_system,
+                        sampler=AdaptiveSampler(max_stride=int(max_stride)),
+                        debouncer=AlertDebouncer(raise_after=int(raise_after)),
+                        detector=detector,
+                        min_confidence=min_confidence,
+                        metrics=metrics,
+                        tracker=tracker
+                    ):
+                        analysis = result['analysis']
+                        history_rows.append({
+                            'analysis': analysis, 'site': site, 'camera': stream_camera,
+                            'source': f"frame {result['frame_index']}"
+                        })
+                        analyzed_frames += 1
+                        if (len(history_rows) >= HISTORY_FLUSH_ROWS
+                                or time.monotonic() - history_flushed_at >= HISTORY_FLUSH_S):
+                            history_store.record_many(history_rows)
+                            history_rows = []
+                            history_flushed_at = time.monotonic()
+                        speed = result['frames_seen'] / result['elapsed_s'] if result['elapsed_s'] > 0 else 0.0
+                        status.markdown(
+                            f"🎞️ Frame **{result['frame_index']}** ({result['timestamp']:.1f}s) · "
+                            f"Nivel confirmado: **{result['confirmed_level']}** · "
+                            f"{analyzed_frames} de {result['frames_seen']} frames analizados · {speed:.0f} frames/s · "
+                            f"👷 {len(result['tracks'])} trabajadores seguidos"
+                        )
+                        for worker_event in result['worker_events']:
+                            show_worker_event(worker_event)
+                            if alert_system and worker_event['kind'] == 'start':
+                                # Una alerta por episodio: cada trabajador y elemento es una clave distinta
+                                alert_dispatcher.submit_analysis(
+                                    {**worker_event, 'rule': f"trabajador-{worker_event['track_id']}-{worker_event['item']}"},
+                                    site, stream_camera, source=f"frame {result['frame_index']}"
+                                )
+                        event = result['event']
+                        if event is not None:
+                            if alert_system:
+                                alert_dispatcher.submit_analysis(
+                                    {**event, 'rule': analysis['rule']}, site, stream_camera,
+                                    source=f"frame {result['frame_index']}"
+                                )
+                            message = f"⏱️ {event['timestamp']:.1f}s — **{event['alert_level']}**: {event['alert_message']}"
+                            if event['alert_level'] == "ALTA":
+                                events_box.error(message)
+                            elif event['alert_level'] == "MEDIA":
+                                events_box.warning(message)
+                            else:
+                                events_box.success(message)
+                except RuntimeError as e:
+                    st.error(f"❌ {e}")
+                finally:
+                    # Lo pendiente se guarda aunque la secuencia se corte con cualquier error
+                    if history_rows:
+                        history_store.record_many(history_rows)
+                for worker_event in tracker.close():
+                    show_worker_event(worker_event)
+
+                if analyzed_frames:
+                    st.success(f"✅ Secuencia procesada: {analyzed_frames} frames analizados")
+
+    elif mode == "🛰️ Servicio de Ingesta":
+        # Solo lectura: el análisis corre en los procesos del servicio, no en esta sesión
+        st.info("🛰️ **Estado del servicio de ingesta al que las cámaras envían sus frames**")
+        if service_client is None:
+            st.warning("⚠️ Define SAFEBUILD_SERVICE_URL con la dirección del servicio para ver su estado.")
+            st.code("python -m safebuild.service --workers 4 --history safebuild_history.db\n"
+                    "SAFEBUILD_SERVICE_URL=http://127.0.0.1:8500 streamlit run app.py", language="bash")
+        else:
+            st.button("🔄 Actualizar", use_container_width=True)
+            try:
+                service_status = service_client.status()
+            except OSError as e:
+                st.error(f"❌ No se pudo consultar el servicio en {service_client.url}: {e}")
+            else:
+                alive = sum(worker['alive'] for worker in service_status['workers'])
+                col_workers, col_accepted, col_rejected, col_errors = st.columns(4)
+                col_workers.metric("Procesos activos", f"{alive}/{len(service_status['workers'])}")
+                col_accepted.metric("Frames analizados", service_status['processed'])
+                col_rejected.metric("Rechazados (429)", service_status['rejected'])
+                col_errors.metric("Errores", service_status['errors'])
+                st.caption(
+                    f"⏱️ Activo hace {service_status['uptime_s'] / 60:.0f} min · "
+                    f"en vuelo: {sum(worker['inflight'] for worker in service_status['workers'])} · "
+                    f"cola por proceso: {service_status['queue_size']} · "
+                    f"reinicios: {service_status['restarts']}"
+                )
+                failed = [worker['index'] for worker in service_status['workers'] if worker.get('failed')]
+                if failed:
+                    st.error(f"🛑 Procesos detenidos tras agotar sus reinicios: {', '.join(map(str, failed))} "
+                             f"(sus cámaras reciben 503 hasta reiniciar el servicio)")
+                site_cameras = [camera_state for camera_state in service_status['cameras']
+                                if camera_state['site'] == site]
+                if site_cameras:
+                    st.table([
+                        {
+                            "Cámara": camera_state['camera'],
+                            "Proceso": camera_state['worker'],
+                            "Frames": camera_state['frames'],
+                            "Nivel confirmado": camera_state['confirmed_level'],
+                            "Trabajadores": camera_state['persons'],
+                            "Con EPP completo": camera_state['compliant'],
+                            "Episodios abiertos": camera_state['open_episodes'],
+                            "Rechazados": camera_state['rejected'],
+                        }
+                        for camera_state in site_cameras
+                    ])
+                    for camera_state in site_cameras:
+                        if camera_state['last_error']:
+                            st.warning(f"⚠️ {camera_state['camera']}: {camera_state['last_error']}")
+                else:
+                    st.write(f"• Ninguna cámara de la obra **{site}** envió frames todavía")
+
     else:
         # Modo demo (mantenemos el anterior por si acaso)
         st.info("🎯 **Selecciona un escenario para analizar:**")
@@ -366,6 +732,7 @@ with col1:
         )
         
         if st.button("🚀 Ejecutar Análisis de Seguridad", use_container_width=True):
+            analysis_start = time.perf_counter()
             with st.spinner("🔍 Analizando condiciones de seguridad..."):
                 # Simular escenarios
                 scenario_map = {"✅ Condiciones Seguras": "seguro", "⚠️ Alertas Parciales": "alerta", "🚨 Condiciones Críticas": "critico"}
@@ -393,8 +760,14 @@ with col1:
                         {'class_name': 'person', 'confidence': 0.88, 'bbox': [300, 150, 380, 300]},
                     ]
                 
+                detections = Detections.from_dicts(detections).filter_confidence(min_confidence)
                 analysis = expert_system.analyze_detections(detections)
-                time.sleep(1)
+                history_store.record(
+                    analysis, site, "demo", source=f"demo:{selected_scenario}",
+                    elapsed_ms=(time.perf_counter() - analysis_start) * 1000
+                )
+                if alert_system:
+                    alert_dispatcher.submit_analysis(analysis, site, "demo", source=f"demo:{selected_scenario}")
             
             st.success("✅ Análisis completado")
             
@@ -428,13 +801,18 @@ with col1:
 with col2:
     st.subheader("📊 Panel de Control")
     
-    # Mostrar estadísticas actuales
-    if 'analysis' in locals():
+    # Mostrar estadísticas actuales (del lote si se analizó uno)
+    if 'batch_totals' in locals():
+        persons, helmets, vests = batch_totals['persons'], batch_totals['helmets'], batch_totals['vests']
+        compliance = (batch_totals['compliance'] or 0) * 100
+    elif 'analysis' in locals():
         stats = analysis.get('statistics', {})
         persons = stats.get('persons', 0)
         helmets = stats.get('helmets', 0)
         vests = stats.get('vests', 0)
-        compliance = min(helmets, vests) / persons * 100 if persons > 0 else 0
+        # Trabajadores con casco y chaleco puestos, con la misma estimación que el historial
+        compliance = (compliance_ratio({'persons': persons, 'helmets': helmets, 'vests': vests,
+                                        'compliant': stats.get('compliant')}) or 0) * 100
     else:
         persons = helmets = vests = compliance = 0
     
@@ -443,11 +821,15 @@ with col2:
     col_a, col_b = st.columns(2)
     with col_a:
         st.metric("👥 Trabajadores", persons)
-        st.metric("🪖 Cascos", helmets)
+        st.metric("🪖 Con Casco", helmets)
     with col_b:
-        st.metric("🦺 Chalecos", vests)
+        st.metric("🦺 Con Chaleco", vests)
         st.metric("📈 Cumplimiento", f"{compliance:.1f}%")
     st.markdown('</div>', unsafe_allow_html=True)
+    if 'batch_totals' in locals():
+        levels = batch_totals['levels']
+        st.caption(f"📦 Lote de {batch_totals['images']} imágenes · 🚨 {levels['ALTA']} con alerta ALTA · "
+                   f"⚠️ {levels['MEDIA']} MEDIA · ✅ {levels['OK']} sin alerta")
     
     # Alertas activas
     st.subheader("🚨 Estado Actual")
@@ -463,13 +845,19 @@ with col2:
             st.success("✅ Chalecos OK")
     else:
         st.info("👀 No hay trabajadores detectados")
+    if 'analysis' in locals() and len(analysis.get('matched_rules', [])) > 1:
+        st.caption("📜 Reglas que se cumplen: " + " · ".join(
+            f"{match['rule']} ({match['alert_level']})" for match in analysis['matched_rules']))
     
     # Historial de análisis
     st.subheader("📋 Historial Reciente")
-    if 'uploaded_file' in locals() and uploaded_file is not None:
-        st.write(f"• **Última imagen:** {uploaded_file.name}")
-        st.write(f"• **Resultado:** {analysis.get('alert_level', 'N/A')}")
-        st.write(f"• **Trabajadores:** {persons}")
+    recent_analyses = history_store.recent(limit=5, site=site)
+    if recent_analyses:
+        level_icons = {"ALTA": "🚨", "MEDIA": "⚠️", "OK": "✅"}
+        for row in recent_analyses:
+            when = datetime.fromtimestamp(row['ts']).strftime("%d/%m %H:%M:%S")
+            st.write(f"• {level_icons.get(row['alert_level'], '•')} **{row['source']}** "
+                     f"({row['camera']}, {when}) — {row['persons']} trabajadores")
     else:
         st.write("• Aún no se han analizado imágenes")
         st.write("• Sube una imagen para comenzar")
@@ -480,15 +868,139 @@ with col2:
 st.markdown("---")
 st.subheader("📈 Estadísticas del Sistema")
 
+site_summary = history_store.summary(site=site)
+
 col3, col4, col5, col6 = st.columns(4)
 with col3:
-    st.metric("Imágenes Analizadas", "15")
+    st.metric("Imágenes Analizadas", site_summary['analyses'])
 with col4:
-    st.metric("Alertas Totales", "8")
+    st.metric("Alertas Totales", site_summary['alerts'])
 with col5:
-    st.metric("Cumplimiento Promedio", "83%")
+    avg_compliance = site_summary['avg_compliance']
+    st.metric("Cumplimiento Promedio", f"{avg_compliance:.0%}" if avg_compliance is not None else "—")
 with col6:
-    st.metric("Tiempo Análisis", "2.1s")
+    avg_elapsed = site_summary['avg_elapsed_ms']
+    st.metric("Tiempo Análisis", f"{avg_elapsed / 1000:.2f}s" if avg_elapsed is not None else "—")
+
+# =============================================
+# EXPORTACIÓN DE REPORTES
+# =============================================
+REPORT_PERIODS = {"Diario": 'day', "Semanal": 'week', "Mensual": 'month'}
+REPORT_KINDS = {"Cumplimiento por período": 'report', "Filas del historial": 'analyses'}
+# download_button necesita el archivo completo en memoria: la interfaz exporta
+# como mucho estas filas; para más, la CLI escribe el archivo por tramos
+EXPORT_MAX_ROWS = int(os.environ.get('SAFEBUILD_EXPORT_MAX_ROWS', '200000'))
+
+with st.expander("📥 Exportar reporte de cumplimiento"):
+    col_kind, col_period, col_format = st.columns(3)
+    with col_kind:
+        report_kind = st.selectbox("Contenido", list(REPORT_KINDS))
+    with col_period:
+        report_period = st.selectbox("Período", list(REPORT_PERIODS), disabled=REPORT_KINDS[report_kind] != 'report')
+    with col_format:
+        report_format = st.selectbox("Formato", ["CSV", "Parquet"] if pq is not None else ["CSV"])
+    today = datetime.now().date()
+    report_dates = st.date_input("Fechas", (today - timedelta(days=30), today))
+    all_sites = st.checkbox("Todas las obras", False)
+    st.caption(f"El archivo se arma en memoria para descargarlo: hasta {EXPORT_MAX_ROWS:,} filas. "
+               f"Para historiales más grandes usa `python -m safebuild.reports` (escribe por tramos).")
+
+    if st.button("📦 Preparar exportación"):
+        if not isinstance(report_dates, (list, tuple)) or len(report_dates) != 2:
+            st.warning("⚠️ Elige la fecha inicial y la final")
+        else:
+            report_start = datetime.combine(report_dates[0], datetime.min.time())
+            report_end = datetime.combine(report_dates[1], datetime.min.time()) + timedelta(days=1)
+            fmt = report_format.lower()
+            # Se lee el historial por tramos; download_button necesita el archivo completo en bytes
+            export_buffer = io.BytesIO()
+            export_out = export_buffer if fmt == 'parquet' else io.TextIOWrapper(export_buffer, encoding='utf-8', newline='')
+            try:
+                with st.spinner("Generando archivo..."):
+                    exported_rows = export(history_store, export_out, kind=REPORT_KINDS[report_kind], fmt=fmt,
+                                           period=REPORT_PERIODS[report_period], start=report_start,
+                                           end=report_end, site=None if all_sites else site,
+                                           max_rows=EXPORT_MAX_ROWS)
+            except ExportTooLarge:
+                st.warning(
+                    f"⚠️ La exportación supera {EXPORT_MAX_ROWS:,} filas: acorta las fechas o genérala con la CLI"
+                )
+                cli_args = ['--rows'] if REPORT_KINDS[report_kind] == 'analyses' else ['--period', REPORT_PERIODS[report_period]]
+                if not all_sites:
+                    cli_args += ['--site', site]
+                cli_args += ['--from', f"{report_dates[0]:%Y-%m-%d}", '--to', f"{report_dates[1]:%Y-%m-%d}",
+                             '-o', f"reporte.{fmt}"]
+                st.code(f"python -m safebuild.reports --history {history_store.path} {' '.join(cli_args)}",
+                        language="bash")
+            else:
+                if export_out is not export_buffer:
+                    export_out.flush()
+                    export_out.detach()
+                report_name = (f"safebuild_{'todas' if all_sites else site}_{REPORT_KINDS[report_kind]}"
+                               f"_{report_dates[0]:%Y%m%d}-{report_dates[1]:%Y%m%d}.{fmt}")
+                # Se pasa el BytesIO (sin getvalue() propio): Streamlit hace la única copia
+                st.download_button(
+                    f"⬇️ Descargar {report_name} ({exported_rows} filas)",
+                    export_buffer,
+                    file_name=report_name,
+                    mime="text/csv" if fmt == 'csv' else "application/octet-stream"
+                )
+
+# =============================================
+# LATENCIAS
+# =============================================
+STAGE_ORDER = {'decode': 0, 'hash': 1, 'detect': 2, 'rules': 3, 'render': 4}
+STAGE_NAMES = {'decode': "Decodificación", 'hash': "Clave de caché", 'detect': "Detección", 'rules': "Reglas",
+               'render': "Visualización"}
+
+with st.expander("⏱️ Latencia por etapa (p50 / p95 / p99)"):
+    stage_rows = sorted(metrics.summary(STAGE_SECONDS), key=lambda row: STAGE_ORDER.get(row['stage'], 99))
+    if stage_rows:
+        st.table([
+            {
+                "Etapa": STAGE_NAMES.get(row['stage'], row['stage']),
+                "Muestras": row['count'],
+                "p50 (ms)": f"{row['p50_ms']:.2f}",
+                "p95 (ms)": f"{row['p95_ms']:.2f}",
+                "p99 (ms)": f"{row['p99_ms']:.2f}",
+            }
+            for row in stage_rows
+        ])
+        st.table([
+            {
+                "Regla disparada": row['rule'],
+                "Muestras": row['count'],
+                "p50 (ms)": f"{row['p50_ms']:.3f}",
+                "p95 (ms)": f"{row['p95_ms']:.3f}",
+                "p99 (ms)": f"{row['p99_ms']:.3f}",
+            }
+            for row in metrics.summary(RULE_SECONDS)
+        ])
+    else:
+        st.write("• Aún no hay mediciones: analiza una imagen o una secuencia")
+
+    if metrics_server is not None:
+        host, port = metrics_server.server_address[:2]
+        st.caption(f"📡 Métricas en formato Prometheus: http://{host}:{port}/metrics")
+    elif metrics_server_error:
+        st.caption(f"⚠️ {metrics_server_error}")
+
+# =============================================
+# CACHÉ DE ANÁLISIS
+# =============================================
+cache_stats = analysis_cache.stats()
+st.sidebar.markdown("---")
+st.sidebar.markdown('<div class="sidebar-section">', unsafe_allow_html=True)
+st.sidebar.subheader("🗄️ Caché de Análisis")
+col_hit, col_miss = st.sidebar.columns(2)
+col_hit.metric("Aciertos", cache_stats['hits'] + cache_stats['disk_hits'])
+col_miss.metric("Fallos", cache_stats['misses'])
+st.sidebar.caption(
+    f"Tasa de aciertos: {cache_stats['hit_rate']:.0%} · "
+    f"{cache_stats['entries']} entradas · {cache_stats['memory_bytes'] / 1024:.1f} KB en memoria"
+    + (f" · {cache_stats['disk_hits']} desde disco" if analysis_cache.disk_dir else "")
+)
+st.sidebar.markdown('</div>', unsafe_allow_html=True)
 
 # =============================================
 # INFORMACIÓN DEL SISTEMA
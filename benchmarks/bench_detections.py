@@ -0,0 +1,110 @@
+"""
+Benchmark de la representación de detecciones: lista de dicts vs. Detections.
+
+Mide memoria retenida, tiempo de una recolección completa del GC y el costo
+de filtrar por confianza + analizar con el sistema experto.
+
+Uso:
+    python benchmarks/bench_detections.py [--frames 200] [--boxes 2000]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from safebuild import Detections, SafetyExpertSystem
+
+CLASSES = ['person', 'helmet', 'safety_vest']
+
+
+def generate_dict_frames(n_frames, n_boxes, seed=0):
+    rng = random.Random(seed)
+    return [
+        [
+            {
+                'class_name': rng.choice(CLASSES),
+                'confidence': round(rng.uniform(0.1, 1.0), 4),
+                'bbox': [round(rng.uniform(0, 1000), 1) for _ in range(4)],
+            }
+            for _ in range(n_boxes)
+        ]
+        for _ in range(n_frames)
+    ]
+
+
+def retained_bytes(build):
+    gc.collect()
+    tracemalloc.start()
+    data = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return data, current
+
+
+def gc_time(repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        gc.collect()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def best_of(repeat, fn):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--boxes', type=int, default=2000)
+    parser.add_argument('--min-confidence', type=float, default=0.6)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    expert_system = SafetyExpertSystem()
+    n_total = args.frames * args.boxes
+
+    dict_frames, dict_bytes = retained_bytes(lambda: generate_dict_frames(args.frames, args.boxes))
+    dict_gc = gc_time()
+    dict_time, dict_results = best_of(args.repeat, lambda: [
+        expert_system.analyze_detections([d for d in frame if d['confidence'] >= args.min_confidence])
+        for frame in dict_frames
+    ])
+
+    columnar_frames, columnar_bytes = retained_bytes(
+        lambda: [Detections.from_dicts(frame) for frame in dict_frames])
+    del dict_frames
+    columnar_gc = gc_time()
+    columnar_time, columnar_results = best_of(args.repeat, lambda: [
+        expert_system.analyze_detections(frame.filter_confidence(args.min_confidence))
+        for frame in columnar_frames
+    ])
+
+    assert dict_results == columnar_results, "Los resultados difieren entre representaciones"
+
+    print(f"{args.frames} frames x {args.boxes} cajas = {n_total:,} detecciones")
+    print(f"  {'':<18} {'memoria':>12} {'bytes/caja':>11} {'gc.collect':>11} {'filtro+reglas':>14}")
+    for name, size, collect, elapsed in (
+        ('lista de dicts', dict_bytes, dict_gc, dict_time),
+        ('Detections', columnar_bytes, columnar_gc, columnar_time),
+    ):
+        print(f"  {name:<18} {size / 2**20:10.1f}MB {size / n_total:11.1f} "
+              f"{collect * 1000:9.1f}ms {elapsed * 1000:12.1f}ms")
+    print(f"  reducción: memoria x{dict_bytes / columnar_bytes:.1f}, gc x{dict_gc / max(columnar_gc, 1e-9):.1f}, "
+          f"filtro+reglas x{dict_time / columnar_time:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark del sistema experto: análisis frame a frame vs. analyze_batch.
+
+La implementación original (conteos globales, sin asociar EPP a personas) se
+mide solo como referencia de tiempo: sus resultados ya no son comparables.
+Asociar cada casco y chaleco a una persona tiene un costo que los conteos no
+tenían; como referencia, con 20 000 frames de ~11 cajas en un núcleo:
+legacy ~130 ms, analyze_detections ~1.2 s y analyze_batch ~0.7 s.
+
+Uso:
+    python benchmarks/bench_expert_system.py [--frames 20000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_generator import iter_dict_frames
+from safebuild import SafetyExpertSystem
+
+
+def legacy_analyze_detections(expert_system, detections):
+    """
+    Implementación original (tres pasadas + reglas en orden), usada como referencia
+    """
+    person_count = sum(1 for det in detections if det['class_name'] == 'person')
+    helmet_count = sum(1 for det in detections if det['class_name'] == 'helmet')
+    vest_count = sum(1 for det in detections if det['class_name'] == 'safety_vest')
+
+    detection_stats = {
+        'persons': person_count,
+        'helmets': helmet_count,
+        'vests': vest_count
+    }
+
+    for rule_name, rule in expert_system.rules.items():
+        if rule['condition'](detection_stats):
+            return {
+                'alert_level': rule['level'],
+                'alert_message': rule['message'],
+                'recommended_action': rule['action'],
+                'statistics': detection_stats
+            }
+
+    return {
+        'alert_level': "OK",
+        'alert_message': "Condiciones normales de seguridad detectadas",
+        'recommended_action': "Continuar con el monitoreo rutinario",
+        'statistics': detection_stats
+    }
+
+
+def best_of(repeat, fn):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--frames', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    expert_system = SafetyExpertSystem()
+    frames = list(iter_dict_frames(args.frames))
+
+    timings = {}
+    timings['legacy (frame a frame)'], _ = best_of(
+        args.repeat, lambda: [legacy_analyze_detections(expert_system, f) for f in frames])
+    timings['analyze_detections'], per_frame = best_of(
+        args.repeat, lambda: [expert_system.analyze_detections(f) for f in frames])
+    timings['analyze_batch'], batched = best_of(
+        args.repeat, lambda: expert_system.analyze_batch(frames))
+    # Solo el motor de reglas vectorizado, sobre estadísticas ya calculadas
+    counts, _ = expert_system.worker_stats_batch(frames)
+    timings['match_rules_batch'], _ = best_of(
+        args.repeat, lambda: expert_system.match_rules_batch(counts))
+
+    assert per_frame == batched, "analyze_batch difiere de analyze_detections"
+
+    baseline = timings['legacy (frame a frame)']
+    print(f"{args.frames} frames, mejor de {args.repeat} corridas")
+    for name, elapsed in timings.items():
+        print(f"  {name:<24} {elapsed * 1000:8.1f} ms  "
+              f"{args.frames / elapsed:>12,.0f} frames/s  x{baseline / elapsed:.2f}")
+
+
+if __name__ == '__main__':
+    main()
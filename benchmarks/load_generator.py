@@ -0,0 +1,94 @@
+"""
+Generador sintético de carga a partir de los escenarios del simulador
+(seguro, parcial, crítico).
+
+Cada frame toma un escenario al azar según `mix`, lo replica para 1..max_groups
+grupos de trabajadores desplazados por la imagen y agrega ruido a las cajas y
+a la confianza. Se genera por bloques con NumPy, así producir millones de
+frames no requiere tenerlos todos en memoria.
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from safebuild import Detections, analyze_uploaded_image
+
+DEFAULT_MIX = {'safe': 0.5, 'partial': 0.3, 'critical': 0.2}
+
+
+def scenario_templates():
+    """
+    Detecciones canónicas de cada escenario, tomadas del simulador
+    """
+    return {
+        'safe': Detections.from_dicts(analyze_uploaded_image(SimpleNamespace(name='safe.jpg', size=0))),
+        'partial': Detections.from_dicts(analyze_uploaded_image(SimpleNamespace(name='obra.jpg', size=2_000_000))),
+        'critical': Detections.from_dicts(analyze_uploaded_image(SimpleNamespace(name='peligro.jpg', size=0))),
+    }
+
+
+def iter_frames(n_frames, mix=None, max_groups=4, image_size=(1920, 1080), chunk_size=50_000, seed=0):
+    """
+    Genera n_frames objetos Detections
+    """
+    mix = mix or DEFAULT_MIX
+    templates = scenario_templates()
+    names = list(mix)
+    weights = np.array([mix[name] for name in names], dtype=np.float64)
+    weights /= weights.sum()
+
+    # Todas las plantillas en una tabla: el escenario s ocupa [start[s], start[s] + length[s])
+    table = np.concatenate([templates[name].array for name in names])
+    length = np.array([len(templates[name]) for name in names])
+    start = np.cumsum(length) - length
+
+    rng = np.random.default_rng(seed)
+    width, height = image_size
+    produced = 0
+    while produced < n_frames:
+        n = min(chunk_size, n_frames - produced)
+        scenario = rng.choice(len(names), size=n, p=weights)
+        groups = rng.integers(1, max_groups + 1, size=n)
+        sizes = length[scenario] * groups
+        bounds = np.cumsum(sizes)
+
+        # Para cada caja del bloque: frame, posición dentro del frame, grupo y caja de plantilla
+        frame_of_box = np.repeat(np.arange(n), sizes)
+        position = np.arange(bounds[-1]) - np.repeat(bounds - sizes, sizes)
+        template_length = length[scenario][frame_of_box]
+        group = (np.cumsum(groups) - groups)[frame_of_box] + position // template_length
+        boxes = table[start[scenario][frame_of_box] + position % template_length]
+
+        # Cada grupo se desplaza como bloque; cada caja recibe un poco de ruido
+        offsets = rng.uniform((0, 0), (width - 400, height - 320), size=(groups.sum(), 2)).astype(np.float32)
+        boxes['bbox'] += np.tile(offsets, 2)[group] + rng.normal(0, 2, size=(len(boxes), 4)).astype(np.float32)
+        boxes['confidence'] = np.clip(boxes['confidence'] + rng.normal(0, 0.05, len(boxes)), 0.05, 0.99)
+
+        for frame_start, frame_end in zip((bounds - sizes).tolist(), bounds.tolist()):
+            yield Detections(boxes[frame_start:frame_end])
+        produced += n
+
+
+def iter_dict_frames(n_frames, **options):
+    """
+    Igual que iter_frames pero en el formato clásico (lista de dicts)
+    """
+    for detections in iter_frames(n_frames, **options):
+        yield detections.to_dicts()
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Mide la velocidad del generador de carga")
+    parser.add_argument('--frames', type=int, default=1_000_000)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    boxes = sum(len(frame) for frame in iter_frames(args.frames))
+    elapsed = time.perf_counter() - start
+    print(f"{args.frames:,} frames ({boxes:,} cajas) en {elapsed:.1f}s — {args.frames / elapsed:,.0f} frames/s")
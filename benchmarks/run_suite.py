@@ -0,0 +1,240 @@
+"""
+Suite de benchmarks y regresiones de latencia del camino crítico de análisis.
+
+Casos:
+- rules/*    SafetyExpertSystem.analyze_detections con frames de tamaño creciente
+             y analyze_batch sobre carga sintética
+- detect/*   detector (decodificación + inferencia) con imágenes de distintos tamaños
+- render/*   overlay de cajas sobre la copia reducida, con frames de tamaño creciente
+- app/*      rerun completo de app.py con el harness AppTest de Streamlit
+
+Uso:
+    python benchmarks/run_suite.py [--quick] [--output resultados.json]
+    python benchmarks/run_suite.py --compare base.json [--threshold 0.15]
+
+Con --compare el proceso termina con código 1 si la mediana de algún caso
+empeora más que el umbral respecto de la corrida base.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_generator import iter_dict_frames, iter_frames
+from safebuild import Detections, MemoryImageFile, SafetyExpertSystem, create_detector
+from safebuild.ingest import IngestedImage
+from safebuild.overlay import render_overlay
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+
+def measure(fn, repeat, warmup=1, items=1):
+    """
+    Ejecuta fn `repeat` veces y resume la distribución de tiempos
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    median = statistics.median(samples)
+    return {
+        'repeat': repeat,
+        'items': items,
+        'min_s': samples[0],
+        'median_s': median,
+        'p95_s': samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))],
+        'max_s': samples[-1],
+        'items_per_s': items / median if median > 0 else None,
+    }
+
+
+def bench_rules(quick):
+    expert_system = SafetyExpertSystem()
+    results = {}
+    sizes = [1, 10, 100, 1000] if quick else [1, 10, 100, 1000, 10000]
+    # Reserva de cajas realistas de la que se toman frames de tamaño creciente
+    pool = np.concatenate([frame.array for frame in iter_frames(2000)])
+    for size in sizes:
+        frame = Detections(pool[:size])
+        frame_dicts = frame.to_dicts()
+        repeat = 200 if size <= 100 else 20
+        results[f'rules/analyze_detections/dicts/{size}'] = measure(
+            lambda: expert_system.analyze_detections(frame_dicts), repeat)
+        results[f'rules/analyze_detections/columnar/{size}'] = measure(
+            lambda: expert_system.analyze_detections(frame), repeat)
+
+    n_frames = 20_000 if quick else 200_000
+    frames = list(iter_frames(n_frames))
+    results[f'rules/analyze_batch/{n_frames}'] = measure(
+        lambda: expert_system.analyze_batch(frames), 7, items=n_frames)
+    dict_frames = list(iter_dict_frames(n_frames // 10))
+    results[f'rules/per_frame_dicts/{n_frames // 10}'] = measure(
+        lambda: [expert_system.analyze_detections(f) for f in dict_frames], 7, items=n_frames // 10)
+    return results
+
+
+def synthetic_jpeg(width, height):
+    # Gradiente + ruido suave: comprime como una foto, no como ruido puro
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    rng = np.random.default_rng(0)
+    pixels = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    pixels += rng.normal(0, 8, pixels.shape).astype(np.float32)
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def bench_detect(quick, detector_options):
+    detector = create_detector(**detector_options)
+    results = {}
+    sizes = [(640, 480), (1920, 1080)] if quick else [(640, 480), (1920, 1080), (4000, 3000), (8000, 6000)]
+    for width, height in sizes:
+        image_file = MemoryImageFile(f'obra_{width}x{height}.jpg', synthetic_jpeg(width, height))
+
+        def decode_and_detect():
+            with Image.open(io.BytesIO(image_file.getvalue())) as image:
+                image.size
+            detector.detect(image_file)
+
+        results[f'detect/{detector.name}/{width}x{height}'] = measure(decode_and_detect, 5 if quick else 10)
+    return results
+
+
+def bench_render(quick):
+    image = IngestedImage('obra_4000x3000.jpg', synthetic_jpeg(4000, 3000))
+    pool = np.concatenate([frame.array for frame in iter_frames(1000, image_size=(4000, 3000))])
+    results = {}
+    for size in ([10, 100, 1000] if quick else [10, 100, 1000, 5000]):
+        frame = Detections(pool[:size])
+        results[f'render/overlay/{size}'] = measure(
+            lambda: render_overlay(image.image, frame, image.scale), 10 if quick else 30)
+    return results
+
+
+def bench_app(quick):
+    from streamlit.testing.v1 import AppTest
+
+    app_path = os.path.join(ROOT, 'app.py')
+    results = {}
+    # El historial del benchmark no debe mezclarse con el real
+    os.environ.setdefault('SAFEBUILD_HISTORY_DB', os.path.join(tempfile.mkdtemp(), 'bench_history.db'))
+
+    def cold_run():
+        AppTest.from_file(app_path, default_timeout=60).run()
+
+    results['app/cold_run'] = measure(cold_run, 3 if quick else 5, warmup=0)
+
+    app = AppTest.from_file(app_path, default_timeout=60).run()
+    results['app/rerun'] = measure(app.run, 5 if quick else 20)
+
+    app.sidebar.radio[0].set_value("📊 Demo con Escenarios").run()
+
+    def demo_click():
+        app.button[0].click().run()
+
+    results['app/demo_analysis'] = measure(demo_click, 5 if quick else 20)
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(current, baseline, threshold):
+    """
+    Devuelve la lista de casos cuya mediana empeoró más que `threshold`
+    """
+    regressions = []
+    print(f"\n{'caso':<48} {'base':>10} {'actual':>10} {'cambio':>8}")
+    for name, result in sorted(current['results'].items()):
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:<48} {'—':>10} {result['median_s'] * 1000:9.3f}ms {'nuevo':>8}")
+            continue
+        change = result['median_s'] / base['median_s'] - 1 if base['median_s'] else 0.0
+        flag = '  ❌' if change > threshold else ''
+        print(f"{name:<48} {base['median_s'] * 1000:9.3f}ms {result['median_s'] * 1000:9.3f}ms {change:+7.1%}{flag}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suite de benchmarks de SafeBuild")
+    parser.add_argument('--quick', action='store_true', help="Tamaños reducidos (para CI)")
+    parser.add_argument('--only', nargs='*', choices=['rules', 'detect', 'render', 'app'],
+                        default=['rules', 'detect', 'render', 'app'])
+    parser.add_argument('--backend', default='simulador', help="Backend del detector para detect/*")
+    parser.add_argument('--model', help="Modelo ONNX para detect/* con --backend onnx")
+    parser.add_argument('--tile-size', type=int, help="Detección por mosaico en detect/* (lado del recorte en px)")
+    parser.add_argument('--tile-workers', type=int, help="Workers del mosaico en detect/*")
+    parser.add_argument('--output', help="Archivo JSON de salida (por defecto benchmarks/results/<fecha>.json)")
+    parser.add_argument('--compare', help="Corrida base con la cual comparar")
+    parser.add_argument('--threshold', type=float, default=0.15, help="Empeoramiento relativo tolerado (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    results = {}
+    if 'rules' in args.only:
+        results.update(bench_rules(args.quick))
+    if 'detect' in args.only:
+        results.update(bench_detect(args.quick, {'backend': args.backend, 'model_path': args.model,
+                                                 'tile_size': args.tile_size, 'tile_workers': args.tile_workers}))
+    if 'render' in args.only:
+        results.update(bench_render(args.quick))
+    if 'app' in args.only:
+        results.update(bench_app(args.quick))
+
+    report = {'environment': environment(), 'quick': args.quick, 'results': results}
+    output = args.output or os.path.join(
+        RESULTS_DIR, datetime.now().strftime('%Y%m%d-%H%M%S') + ('-quick' if args.quick else '') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in results.items():
+        rate = f"{result['items_per_s']:,.0f}/s" if result['items'] > 1 else ''
+        print(f"{name:<48} mediana {result['median_s'] * 1000:9.3f}ms  p95 {result['p95_s'] * 1000:9.3f}ms  {rate}")
+    print(f"\nResultados guardados en {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regresiones por encima de {args.threshold:.0%}")
+            sys.exit(1)
+        print(f"\n✅ Sin regresiones por encima de {args.threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
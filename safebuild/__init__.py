@@ -0,0 +1,22 @@
+"""
+Núcleo de SafeBuild: lógica de análisis independiente de la interfaz Streamlit.
+"""
+from safebuild.detection import LocalImageFile, MemoryImageFile, analyze_uploaded_image
+from safebuild.detections import Detections
+from safebuild.detectors import Detector, OnnxDetector, SimulatorDetector, TiledDetector, create_detector
+from safebuild.expert_system import CLASS_IDS, CLASS_NAMES, SafetyExpertSystem
+
+__all__ = [
+    'CLASS_IDS',
+    'CLASS_NAMES',
+    'Detections',
+    'Detector',
+    'LocalImageFile',
+    'MemoryImageFile',
+    'OnnxDetector',
+    'SafetyExpertSystem',
+    'SimulatorDetector',
+    'TiledDetector',
+    'analyze_uploaded_image',
+    'create_detector',
+]
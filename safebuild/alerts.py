@@ -0,0 +1,366 @@
+import json
+import queue
+import sys
+import threading
+import time
+import urllib.request
+from datetime import datetime
+
+# =============================================
+# DESPACHO DE ALERTAS EN SEGUNDO PLANO
+# =============================================
+# El análisis solo encola (put_nowait, nunca bloquea). Un hilo coordinador
+# deduplica por (obra, cámara, regla), junta las ráfagas en lotes y los
+# reparte entre los canales; cada canal tiene su propio hilo, su cola y su
+# límite de envíos, así un destino lento o caído no frena a los demás ni
+# al análisis.
+ALERT_LEVELS = ("MEDIA", "ALTA")
+DEFAULT_DEDUPE_WINDOW_S = 300.0
+DEFAULT_BATCH_WINDOW_S = 2.0
+DEFAULT_MAX_BATCH = 50
+DEFAULT_MAX_QUEUE = 10000
+
+_STOP = object()
+
+
+def make_alert(analysis, site, camera, source=None, timestamp=None):
+    """
+    Alerta a despachar a partir de un resultado del sistema experto
+    """
+    return {
+        'site': site,
+        'camera': camera,
+        'rule': analysis.get('rule'),
+        'alert_level': analysis['alert_level'],
+        'alert_message': analysis['alert_message'],
+        'recommended_action': analysis.get('recommended_action'),
+        'source': source,
+        'timestamp': timestamp if timestamp is not None else time.time(),
+    }
+
+
+def alert_key(alert):
+    return alert['site'], alert['camera'], alert['rule']
+
+
+# =============================================
+# DESTINOS
+# =============================================
+class AlertSink:
+    """
+    Destino de alertas. send recibe un mensaje {'channel', 'sent_at',
+    'alerts': [...]} y lanza una excepción si no pudo entregarlo.
+    """
+    name = 'base'
+
+    def send(self, message):
+        raise NotImplementedError
+
+    def describe(self):
+        return self.name
+
+
+class StdoutSink(AlertSink):
+    """
+    Una línea JSON por mensaje en stdout (para pruebas)
+    """
+    name = 'stdout'
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def send(self, message):
+        stream = self.stream or sys.stdout
+        stream.write(json.dumps(message, ensure_ascii=False) + '\n')
+        stream.flush()
+
+
+class FileSink(AlertSink):
+    """
+    Agrega una línea JSON por mensaje al archivo
+    """
+    name = 'file'
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, message):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(message, ensure_ascii=False) + '\n')
+
+    def describe(self):
+        return f"{self.name}:{self.path}"
+
+
+class WebhookSink(AlertSink):
+    """
+    POST del mensaje en JSON a una URL (p. ej. un webhook local)
+    """
+    name = 'webhook'
+
+    def __init__(self, url, timeout=5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, message):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(message, ensure_ascii=False).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def describe(self):
+        return f"{self.name}:{self.url}"
+
+
+SINK_TYPES = {
+    StdoutSink.name: lambda target: StdoutSink(),
+    FileSink.name: FileSink,
+    WebhookSink.name: WebhookSink,
+}
+
+
+def create_sinks(spec):
+    """
+    Destinos desde una lista separada por comas, p. ej.
+    "stdout,file:/var/log/alertas.jsonl,webhook:http://localhost:9000/alertas"
+    """
+    sinks = []
+    for item in (part.strip() for part in (spec or '').split(',')):
+        if not item:
+            continue
+        kind, _, target = item.partition(':')
+        if kind not in SINK_TYPES:
+            raise ValueError(f"Destino de alertas desconocido: {kind} (opciones: {', '.join(SINK_TYPES)})")
+        if kind != StdoutSink.name and not target:
+            raise ValueError(f"El destino '{kind}' necesita una ruta o URL ({kind}:...)")
+        sinks.append(SINK_TYPES[kind](target))
+    return sinks
+
+
+# =============================================
+# CANALES (UNO POR DESTINO)
+# =============================================
+class AlertChannel:
+    """
+    Entrega los lotes a un destino desde su propio hilo, con límite de
+    envíos (token bucket: rate_per_minute, ráfagas de hasta burst; 0 es sin
+    límite) y reintentos. Mientras espera un turno, los lotes pendientes se
+    unen en un solo mensaje; si se acumulan más de max_pending alertas se
+    descartan las más viejas.
+    """
+
+    def __init__(self, sink, rate_per_minute=30.0, burst=5, max_pending=1000, max_retries=3, retry_delay_s=1.0):
+        if rate_per_minute < 0:
+            raise ValueError(f"rate_per_minute no puede ser negativo: {rate_per_minute}")
+        self.sink = sink
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_delay_s = retry_delay_s
+        self.stats = {'sent_messages': 0, 'sent_alerts': 0, 'failed_alerts': 0, 'dropped_alerts': 0}
+        self.last_error = None
+        self._pending = []
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._closing = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f'safebuild-alerts-{sink.name}', daemon=True)
+        self._thread.start()
+
+    def offer(self, alerts):
+        with self._condition:
+            self._pending.extend(alerts)
+            overflow = len(self._pending) - self.max_pending
+            if overflow > 0:
+                del self._pending[:overflow]
+                self.stats['dropped_alerts'] += overflow
+            self._condition.notify()
+
+    def _wait_for_token(self):
+        """
+        Espera un turno de envío (con el lock tomado). Al cerrar, o sin límite
+        de envíos, no espera.
+        """
+        if not self.rate_per_minute:
+            return
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate_per_minute / 60)
+            self._refilled_at = now
+            if self._tokens >= 1 or self._closing:
+                self._tokens = max(self._tokens - 1, 0.0)
+                return
+            self._condition.wait((1 - self._tokens) * 60 / self.rate_per_minute)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closing:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                self._wait_for_token()
+                alerts, self._pending = self._pending, []
+
+            message = {
+                'channel': self.sink.describe(),
+                'sent_at': datetime.now().isoformat(timespec='seconds'),
+                'alerts': alerts,
+            }
+            for attempt in range(self.max_retries + 1):
+                try:
+                    self.sink.send(message)
+                except Exception as e:  # cualquier falla del destino queda en este hilo
+                    with self._condition:
+                        self.last_error = f"{type(e).__name__}: {e}"
+                    if attempt < self.max_retries and not self._closing:
+                        time.sleep(self.retry_delay_s * 2 ** attempt)
+                        continue
+                    with self._condition:
+                        self.stats['failed_alerts'] += len(alerts)
+                else:
+                    # El destino se recuperó: el error anterior ya no aplica
+                    with self._condition:
+                        self.last_error = None
+                        self.stats['sent_messages'] += 1
+                        self.stats['sent_alerts'] += len(alerts)
+                break
+
+    def summary(self):
+        """
+        Contadores del canal y último error (None si el último envío funcionó)
+        """
+        with self._condition:
+            return {'channel': self.sink.describe(), **self.stats, 'last_error': self.last_error}
+
+    def close(self, timeout=None):
+        with self._condition:
+            self._closing = True
+            self._condition.notify()
+        self._thread.join(timeout)
+
+
+# =============================================
+# DESPACHADOR
+# =============================================
+class AlertDispatcher:
+    """
+    Recibe alertas sin bloquear y las despacha en segundo plano:
+    - Deduplica por (obra, cámara, regla): una alerta repetida dentro de
+      dedupe_window_s no se reenvía; se cuenta en 'count' de la próxima.
+    - Junta en un lote lo que llega durante batch_window_s (o hasta max_batch).
+    - Reparte cada lote entre los canales, cada uno con su límite de envíos.
+    """
+
+    def __init__(self, sinks, dedupe_window_s=DEFAULT_DEDUPE_WINDOW_S, batch_window_s=DEFAULT_BATCH_WINDOW_S,
+                 max_batch=DEFAULT_MAX_BATCH, max_queue=DEFAULT_MAX_QUEUE, **channel_options):
+        self.channels = [AlertChannel(sink, **channel_options) for sink in sinks]
+        self.dedupe_window_s = dedupe_window_s
+        self.batch_window_s = batch_window_s
+        self.max_batch = max_batch
+        self.stats = {'queued': 0, 'deduplicated': 0, 'dropped': 0, 'batches': 0}
+        self._stats_lock = threading.Lock()
+        self._closing = False
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._last_sent = {}
+        self._suppressed = {}
+        self._thread = threading.Thread(target=self._run, name='safebuild-alerts', daemon=True)
+        self._thread.start()
+
+    def submit(self, alert):
+        """
+        Encola una alerta. Nunca bloquea: con la cola llena la descarta.
+        Devuelve False si la descartó.
+        """
+        if not self.channels or self._closing:
+            return False
+        try:
+            self._queue.put_nowait(alert)
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('queued')
+        return True
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def submit_analysis(self, analysis, site, camera, source=None, timestamp=None):
+        """
+        Encola el resultado si es una alerta (nivel MEDIA o ALTA)
+        """
+        if analysis['alert_level'] not in ALERT_LEVELS:
+            return False
+        return self.submit(make_alert(analysis, site, camera, source=source, timestamp=timestamp))
+
+    def _accept(self, alert, batch):
+        key = alert_key(alert)
+        if key in batch:
+            batch[key]['count'] += 1
+            return
+        last = self._last_sent.get(key)
+        if last is not None and alert['timestamp'] - last < self.dedupe_window_s:
+            self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            self._count('deduplicated')
+            return
+        batch[key] = {**alert, 'count': 1 + self._suppressed.pop(key, 0)}
+        self._last_sent[key] = alert['timestamp']
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        alerts = list(batch.values())
+        for channel in self.channels:
+            channel.offer(alerts)
+        self._count('batches')
+        # Las claves viejas ya no deduplican nada
+        if len(self._last_sent) > 4 * self._queue.maxsize:
+            horizon = time.time() - self.dedupe_window_s
+            self._last_sent = {key: ts for key, ts in self._last_sent.items() if ts >= horizon}
+
+    def _run(self):
+        batch, deadline = {}, None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                alert = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                alert = None
+            if alert is not None and alert is not _STOP:
+                self._accept(alert, batch)
+                if deadline is None and batch:
+                    deadline = time.monotonic() + self.batch_window_s
+            # Si close no pudo encolar _STOP (cola llena), termina al vaciarla
+            if alert is _STOP or (self._closing and self._queue.empty()):
+                self._flush(batch)
+                return
+            if deadline is not None and (time.monotonic() >= deadline or len(batch) >= self.max_batch):
+                self._flush(batch)
+                batch, deadline = {}, None
+
+    def summary(self):
+        """
+        Contadores del despachador y de cada canal
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {**stats, 'channels': [channel.summary() for channel in self.channels]}
+
+    def close(self, timeout=5.0):
+        """
+        Despacha lo pendiente y detiene los hilos (espera hasta `timeout` por hilo)
+        """
+        self._closing = True
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        for channel in self.channels:
+            channel.close(timeout)
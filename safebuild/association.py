@@ -0,0 +1,281 @@
+import math
+from array import array
+
+import numpy as np
+
+from safebuild.boxes import box_centers, concat_ranges, normalize_boxes
+from safebuild.detections import CLASS_IDS, OTHER_CLASS_ID, as_detections
+
+# =============================================
+# ASOCIACIÓN PERSONA - EPP
+# =============================================
+# Regiones de la caja de una persona, como fracción de su alto medida desde
+# el borde superior. El casco suele sobresalir por arriba de la caja.
+HEAD_REGION = (-0.15, 0.30)
+TORSO_REGION = (0.15, 0.75)
+
+# Hasta este número de pares (puntos x regiones) conviene probarlos todos
+BRUTE_FORCE_PAIRS = 4096
+# Frames de hasta este número de cajas se asocian sin NumPy
+SMALL_FRAME = 32
+
+PERSON_ID = CLASS_IDS['person']
+HELMET_ID = CLASS_IDS['helmet']
+VEST_ID = CLASS_IDS['safety_vest']
+
+# Un registro por persona: frame y posiciones (en las detecciones) de su caja,
+# su casco y su chaleco (-1 si no tiene)
+WORKER_DTYPE = np.dtype([
+    ('frame', np.int64),
+    ('person', np.int64),
+    ('helmet', np.int64),
+    ('vest', np.int64),
+])
+
+
+def person_regions(boxes, region):
+    """
+    Franja horizontal de cada caja de persona (mismo ancho, alto relativo)
+    """
+    top, bottom = region
+    heights = boxes[:, 3] - boxes[:, 1]
+    regions = boxes.astype(np.float64, copy=True)
+    regions[:, 1] = boxes[:, 1] + top * heights
+    regions[:, 3] = boxes[:, 1] + bottom * heights
+    return regions
+
+
+def match_points_to_regions(points, point_groups, regions, region_groups):
+    """
+    Para cada punto, la región (del mismo grupo/frame) que lo contiene y cuyo
+    centro está más cerca, o -1.
+
+    Con pocas cajas se prueban todos los pares. Si no, se usa una grilla
+    uniforme con celdas del tamaño típico de una región: cada región se
+    registra en las pocas celdas que toca y cada punto solo se compara con
+    las regiones de su celda. El costo es O((n + pares) log n) en lugar de
+    O(n²) con cientos de personas por frame.
+
+    Los puntos y las regiones con coordenadas no finitas (NaN / inf) no se
+    asocian.
+    """
+    matches = np.full(len(points), -1, dtype=np.int64)
+    if not len(points) or not len(regions):
+        return matches
+
+    valid_points = np.isfinite(points).all(axis=1)
+    valid_regions = np.isfinite(regions).all(axis=1)
+    if not (valid_points.all() and valid_regions.all()):
+        point_index, region_index = np.flatnonzero(valid_points), np.flatnonzero(valid_regions)
+        inner = match_points_to_regions(points[point_index], point_groups[point_index],
+                                        regions[region_index], region_groups[region_index])
+        found = inner >= 0
+        matches[point_index[found]] = region_index[inner[found]]
+        return matches
+
+    if len(points) * len(regions) <= BRUTE_FORCE_PAIRS:
+        # Matriz densa (puntos x regiones)
+        px, py = points[:, 0:1], points[:, 1:2]
+        inside = (
+            (px >= regions[:, 0]) & (px <= regions[:, 2]) & (py >= regions[:, 1]) & (py <= regions[:, 3])
+            & (point_groups[:, None] == region_groups)
+        )
+        distance = ((points[:, None, :] - box_centers(regions)) ** 2).sum(axis=2)
+        distance[~inside] = np.inf
+        best = distance.argmin(axis=1)
+        found = inside[np.arange(len(points)), best]
+        matches[found] = best[found]
+        return matches
+
+    pair_point, pair_region = _grid_candidates(points, point_groups, regions, region_groups)
+
+    px, py = points[pair_point, 0], points[pair_point, 1]
+    candidate = regions[pair_region]
+    inside = (px >= candidate[:, 0]) & (px <= candidate[:, 2]) & (py >= candidate[:, 1]) & (py <= candidate[:, 3])
+    pair_point, pair_region = pair_point[inside], pair_region[inside]
+    if not len(pair_point):
+        return matches
+
+    # Entre varias regiones candidatas gana la de centro más cercano
+    centers = box_centers(regions[pair_region])
+    distance = ((points[pair_point] - centers) ** 2).sum(axis=1)
+    best = np.lexsort((distance, pair_point))
+    pair_point, pair_region = pair_point[best], pair_region[best]
+    is_first = np.ones(len(pair_point), dtype=bool)
+    is_first[1:] = pair_point[1:] != pair_point[:-1]
+    matches[pair_point[is_first]] = pair_region[is_first]
+    return matches
+
+
+def _grid_candidates(points, point_groups, regions, region_groups):
+    """
+    Pares (punto, región) que comparten celda de la grilla
+    """
+    sizes = np.maximum(regions[:, 2:] - regions[:, :2], 0)
+    cell = max(float(np.median(sizes.max(axis=1))), 1.0)
+    origin = np.minimum(regions[:, :2].min(axis=0), points.min(axis=0))
+
+    # Celdas que cubre cada región (una región invertida no contiene ningún
+    # punto, igual que en la matriz densa: no ocupa celdas)
+    first = np.floor((regions[:, :2] - origin) / cell).astype(np.int64)
+    last = np.floor((regions[:, 2:] - origin) / cell).astype(np.int64)
+    span = np.maximum(last - first + 1, 0)
+    n_cells = span[:, 0] * span[:, 1]
+    entry_region = np.repeat(np.arange(len(regions)), n_cells)
+    offset = concat_ranges(n_cells)
+    entry_x = first[entry_region, 0] + offset % span[entry_region, 0]
+    entry_y = first[entry_region, 1] + offset // span[entry_region, 0]
+
+    point_cells = np.floor((points - origin) / cell).astype(np.int64)
+    n_columns = int(max(entry_x.max(), point_cells[:, 0].max())) + 1
+    n_rows = int(max(entry_y.max(), point_cells[:, 1].max())) + 1
+
+    def cell_keys(groups, x, y):
+        return (groups * n_rows + y) * n_columns + x
+
+    entry_keys = cell_keys(region_groups[entry_region], entry_x, entry_y)
+    order = np.argsort(entry_keys, kind='stable')
+    entry_keys, entry_region = entry_keys[order], entry_region[order]
+
+    # Pares candidatos (punto, región de su celda)
+    point_keys = cell_keys(point_groups, point_cells[:, 0], point_cells[:, 1])
+    start = np.searchsorted(entry_keys, point_keys, side='left')
+    counts = np.searchsorted(entry_keys, point_keys, side='right') - start
+    pair_point = np.repeat(np.arange(len(points)), counts)
+    pair_region = entry_region[np.repeat(start, counts) + concat_ranges(counts)]
+    return pair_point, pair_region
+
+
+def associate_batch(class_ids, boxes, frame_ids):
+    """
+    Asocia cascos y chalecos a personas en muchos frames a la vez (las
+    detecciones concatenadas, con el frame de cada una). Devuelve un array
+    WORKER_DTYPE con un registro por persona, en el orden de las detecciones;
+    los índices son globales (posiciones en class_ids). Las cajas con las
+    esquinas invertidas se normalizan y las que tienen coordenadas no finitas
+    no se asocian.
+    """
+    class_ids = np.asarray(class_ids)
+    boxes = normalize_boxes(np.asarray(boxes, dtype=np.float64).reshape(-1, 4))
+    frame_ids = np.asarray(frame_ids, dtype=np.int64)
+
+    persons = np.flatnonzero(class_ids == PERSON_ID)
+    workers = np.empty(len(persons), dtype=WORKER_DTYPE)
+    workers['frame'] = frame_ids[persons]
+    workers['person'] = persons
+
+    for field, class_id, region in (('helmet', HELMET_ID, HEAD_REGION), ('vest', VEST_ID, TORSO_REGION)):
+        items = np.flatnonzero(class_ids == class_id)
+        owner = match_points_to_regions(
+            box_centers(boxes[items]), frame_ids[items],
+            person_regions(boxes[persons], region), workers['frame']
+        )
+        # Si una persona tiene varios, se queda con el primero
+        assigned = np.full(len(persons), -1, dtype=np.int64)
+        matched = np.flatnonzero(owner >= 0)[::-1]
+        assigned[owner[matched]] = items[matched]
+        workers[field] = assigned
+    return workers
+
+
+def _normalize_box(box):
+    """
+    Caja con las esquinas en orden, o None si alguna coordenada no es finita
+    """
+    x1, y1, x2, y2 = box
+    if not all(map(math.isfinite, box)):
+        return None
+    return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+
+def _match_small(class_ids, boxes):
+    """
+    Mismo criterio que associate_batch para un frame chico, en Python puro:
+    con pocas cajas el costo fijo de cada operación de NumPy domina.
+    Devuelve [frame, persona, casco, chaleco] por persona.
+    """
+    # Caso común primero: la comparación encadenada descarta NaN e inf de una vez
+    boxes = [
+        box if -math.inf < box[0] <= box[2] < math.inf and -math.inf < box[1] <= box[3] < math.inf
+        else _normalize_box(box)
+        for box in boxes
+    ]
+    workers = []
+    # Por clase de EPP: (campo del registro, regiones de las personas como
+    # (registro, x1, y1, x2, y2, centro x, centro y))
+    targets = {HELMET_ID: (2, []), VEST_ID: (3, [])}
+    for index, class_id in enumerate(class_ids):
+        if class_id != PERSON_ID:
+            continue
+        worker = [0, index, -1, -1]
+        workers.append(worker)
+        if boxes[index] is None:
+            continue
+        x1, y1, x2, y2 = boxes[index]
+        height = y2 - y1
+        for (top, bottom), (_, regions) in ((HEAD_REGION, targets[HELMET_ID]), (TORSO_REGION, targets[VEST_ID])):
+            ry1, ry2 = y1 + top * height, y1 + bottom * height
+            regions.append((worker, x1, ry1, x2, ry2, (x1 + x2) / 2, (ry1 + ry2) / 2))
+
+    for item, class_id in enumerate(class_ids):
+        target = targets.get(class_id)
+        if target is None or boxes[item] is None:
+            continue
+        field, regions = target
+        x1, y1, x2, y2 = boxes[item]
+        px, py = (x1 + x2) / 2, (y1 + y2) / 2
+        best, best_distance = None, math.inf
+        for worker, rx1, ry1, rx2, ry2, cx, cy in regions:
+            if rx1 <= px <= rx2 and ry1 <= py <= ry2:
+                distance = (px - cx) ** 2 + (py - cy) ** 2
+                if distance < best_distance:
+                    best, best_distance = worker, distance
+        # Si una persona tiene varios, se queda con el primero
+        if best is not None and best[field] == -1:
+            best[field] = item
+    return workers
+
+
+def _associate_small(class_ids, boxes):
+    return np.array([tuple(worker) for worker in _match_small(class_ids, boxes)], dtype=WORKER_DTYPE)
+
+
+def associate_ppe(detections):
+    """
+    Registros por persona (WORKER_DTYPE) de un frame: qué casco y qué
+    chaleco le corresponden según la geometría de las cajas
+    """
+    detections = as_detections(detections)
+    if len(detections) <= SMALL_FRAME:
+        return _associate_small(detections.class_ids.tolist(), detections.boxes.astype(np.float64).tolist())
+    return associate_batch(detections.class_ids, detections.boxes, np.zeros(len(detections), dtype=np.int64))
+
+
+def associate_dicts(detections):
+    """
+    Registros por persona (como worker_records) de un frame chico en el
+    formato clásico de dicts, sin convertirlo a Detections: analizando frame
+    a frame, esa conversión cuesta más que la asociación. Las cajas se
+    redondean a float32 y a un decimal igual que en el camino con NumPy.
+    """
+    class_ids = [CLASS_IDS.get(det['class_name'], OTHER_CLASS_ID) for det in detections]
+    boxes = [array('f', det['bbox']).tolist() for det in detections]
+    return [
+        {'bbox': [round(value * 10) / 10 if math.isfinite(value) else value for value in boxes[person]],
+         'helmet': helmet >= 0, 'vest': vest >= 0}
+        for _, person, helmet, vest in _match_small(class_ids, boxes)
+    ]
+
+
+def worker_records(workers, boxes):
+    """
+    Registros por persona serializables: caja y si usa casco / chaleco
+    """
+    return [
+        {'bbox': bbox, 'helmet': helmet, 'vest': vest}
+        for bbox, helmet, vest in zip(
+            np.round(boxes[workers['person']].astype(np.float64), 1).tolist(),
+            (workers['helmet'] >= 0).tolist(),
+            (workers['vest'] >= 0).tolist(),
+        )
+    ]
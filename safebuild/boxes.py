@@ -0,0 +1,124 @@
+import numpy as np
+
+# =============================================
+# OPERACIONES SOBRE BOUNDING BOXES
+# =============================================
+# Todas las funciones trabajan con arrays (N, 4) en formato [x1, y1, x2, y2]
+
+
+def concat_ranges(lengths):
+    """
+    Concatenación de arange(n) para cada n de lengths, sin bucles
+    (p. ej. [2, 3] -> [0, 1, 0, 1, 2])
+    """
+    return np.arange(lengths.sum(), dtype=np.int64) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+
+def normalize_boxes(boxes):
+    """
+    Cajas con x1 <= x2 e y1 <= y2 (algunos modelos y datos importados traen
+    las esquinas invertidas)
+    """
+    return np.concatenate([np.minimum(boxes[:, :2], boxes[:, 2:]), np.maximum(boxes[:, :2], boxes[:, 2:])], axis=1)
+
+
+def box_area(boxes):
+    return np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+
+
+def pairwise_iou(boxes_a, boxes_b):
+    """
+    Matriz (len(a), len(b)) de IoU
+    """
+    # Por coordenada (columnas contiguas): broadcasting con un eje final de
+    # largo 2 es varias veces más lento
+    ax1, ay1, ax2, ay2 = (np.ascontiguousarray(boxes_a[:, i])[:, None] for i in range(4))
+    bx1, by1, bx2, by2 = (np.ascontiguousarray(boxes_b[:, i]) for i in range(4))
+    width = np.minimum(ax2, bx2) - np.maximum(ax1, bx1)
+    height = np.minimum(ay2, by2) - np.maximum(ay1, by1)
+    np.clip(width, 0, None, out=width)
+    np.clip(height, 0, None, out=height)
+    intersection = width * height
+    union = box_area(boxes_a)[:, None] + box_area(boxes_b)[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection, dtype=np.float64), where=union > 0)
+
+
+def paired_iou(boxes_a, boxes_b):
+    """
+    IoU elemento a elemento entre dos arrays (N, 4) del mismo largo
+    """
+    width = np.clip(np.minimum(boxes_a[:, 2], boxes_b[:, 2]) - np.maximum(boxes_a[:, 0], boxes_b[:, 0]), 0, None)
+    height = np.clip(np.minimum(boxes_a[:, 3], boxes_b[:, 3]) - np.maximum(boxes_a[:, 1], boxes_b[:, 1]), 0, None)
+    intersection = width * height
+    union = box_area(boxes_a) + box_area(boxes_b) - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection, dtype=np.float64), where=union > 0)
+
+
+def nms(boxes, scores, iou_threshold=0.45, class_ids=None):
+    """
+    Non-maximum suppression. Con class_ids se suprime solo dentro de la misma
+    clase (desplazando las cajas de cada clase para que no se toquen).
+    Devuelve los índices conservados, ordenados por score descendente.
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    boxes = np.asarray(boxes, dtype=np.float64)
+    if class_ids is not None:
+        # El ancho total del rango (no solo el máximo): vale con coordenadas negativas
+        offset = boxes.max() - boxes.min() + 1
+        boxes = boxes + (np.asarray(class_ids, dtype=np.float64) * offset)[:, None]
+
+    order = np.argsort(-np.asarray(scores), kind='stable')
+    keep = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        if order.size == 1:
+            break
+        ious = pairwise_iou(boxes[best:best + 1], boxes[order[1:]])[0]
+        order = order[1:][ious <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def box_centers(boxes):
+    return (boxes[:, :2] + boxes[:, 2:]) / 2
+
+
+def fast_nms(boxes, scores, iou_threshold=0.5, class_ids=None):
+    """
+    NMS vectorizada (variante Fast NMS): una caja se descarta si alguna de
+    score mayor la solapa más que el umbral, aunque esa otra también haya
+    sido descartada. Es algo más agresiva que nms y no tiene bucle por caja.
+
+    Solo se evalúan los pares que se solapan en x (barrido sobre las cajas
+    ordenadas por x1), así el costo es O(n log n + pares) y no O(n²).
+    Devuelve los índices conservados, ordenados por score descendente.
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    boxes = np.asarray(boxes, dtype=np.float64)
+    if class_ids is not None:
+        # Desplaza cada clase a su propia franja en x: no hay pares entre clases
+        offset = boxes.max() - boxes.min() + 1
+        boxes = boxes + (np.asarray(class_ids, dtype=np.float64) * offset)[:, None]
+
+    order = np.argsort(-np.asarray(scores), kind='stable')
+    rank = np.empty(len(boxes), dtype=np.int64)
+    rank[order] = np.arange(len(boxes))
+
+    # Pares (i, j) con x1_i <= x1_j < x2_i
+    by_x = np.argsort(boxes[:, 0], kind='stable')
+    starts = boxes[by_x, 0]
+    ends = np.searchsorted(starts, boxes[by_x, 2], side='left')
+    counts = np.maximum(ends - np.arange(1, len(boxes) + 1), 0)
+    first = np.repeat(np.arange(len(boxes)), counts)
+    second = first + 1 + concat_ranges(counts)
+    a, b = by_x[first], by_x[second]
+
+    overlapping = paired_iou(boxes[a], boxes[b]) > iou_threshold
+    a, b = a[overlapping], b[overlapping]
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    suppressed[np.where(rank[a] > rank[b], a, b)] = True
+    return order[~suppressed[order]]
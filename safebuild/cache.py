@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# =============================================
+# CACHÉ DE RESULTADOS DE ANÁLISIS
+# =============================================
+DEFAULT_MAX_MEMORY_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_DISK_BYTES = 512 * 1024 * 1024
+# Al superar el límite de disco se borran los archivos más viejos hasta esta fracción
+DISK_PRUNE_RATIO = 0.9
+
+
+def make_cache_key(data, config):
+    """
+    Genera la clave de caché a partir del contenido de la imagen y la
+    configuración del detector (backend, confianza mínima, etc.)
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    # Acepta bytes o memoryview sin copiarlos
+    hasher.update(data)
+    hasher.update(json.dumps(config, sort_keys=True).encode('utf-8'))
+    return hasher.hexdigest()
+
+
+class AnalysisCache:
+    """
+    Caché de dos niveles para resultados de análisis:
+    - Memoria: LRU con desalojo por tamaño total (bytes serializados)
+    - Disco (opcional): un archivo JSON por clave, sobrevive reinicios.
+      Acotado a max_disk_bytes: se borran los archivos usados hace más
+      tiempo (prune_disk). Un archivo ilegible cuenta como fallo y se borra.
+    Los valores deben ser serializables a JSON.
+    """
+
+    def __init__(self, max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES, disk_dir=None,
+                 max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_dir = disk_dir
+
+        self._entries = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.prune_disk()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _store_in_memory(self, key, payload):
+        size = len(payload)
+        if size > self.max_memory_bytes:
+            return
+        if key in self._entries:
+            self._memory_bytes -= len(self._entries.pop(key))
+        self._entries[key] = payload
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _remove_disk_file(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def prune_disk(self):
+        """
+        Borra los archivos de disco usados hace más tiempo (fecha de
+        modificación, que se renueva en cada acierto) hasta quedar por debajo
+        de DISK_PRUNE_RATIO del límite. Devuelve los bytes que quedan.
+        """
+        files = []
+        with os.scandir(self.disk_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.json'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:  # otro proceso lo borró
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        if total > self.max_disk_bytes:
+            files.sort()
+            target = self.max_disk_bytes * DISK_PRUNE_RATIO
+            for _, size, path in files:
+                if total <= target:
+                    break
+                self._remove_disk_file(path)
+                total -= size
+        with self._lock:
+            self._disk_bytes = total
+        return total
+
+    def get(self, key):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(payload)
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, 'rb') as f:
+                    payload = f.read()
+                value = json.loads(payload)
+            except FileNotFoundError:
+                payload = None
+            except ValueError:
+                # Archivo truncado o corrupto (disco lleno, edición manual): es un fallo
+                self._remove_disk_file(path)
+                payload = None
+            if payload is not None:
+                try:
+                    os.utime(path)  # más reciente para prune_disk
+                except FileNotFoundError:
+                    pass
+                with self._lock:
+                    self._store_in_memory(key, payload)
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        payload = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        with self._lock:
+            self._store_in_memory(key, payload)
+
+        if self.disk_dir:
+            # Escritura atómica: otro proceso nunca ve un archivo a medio escribir
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+            # Estimación (otros procesos también escriben); prune_disk la corrige
+            with self._lock:
+                self._disk_bytes += len(payload)
+                over_limit = self._disk_bytes > self.max_disk_bytes
+            if over_limit:
+                self.prune_disk()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'memory_bytes': self._memory_bytes,
+                'disk_bytes': self._disk_bytes,
+            }
@@ -0,0 +1,223 @@
+"""
+Análisis masivo sin interfaz gráfica.
+
+Recorre un directorio, reparte las imágenes en un pool de procesos y escribe
+una línea JSON por imagen apenas termina. Si la salida ya existe, las imágenes
+analizadas con éxito se omiten, de modo que una corrida interrumpida continúa
+donde quedó; las que fallaron se reintentan.
+
+Uso:
+    python -m safebuild.cli DIRECTORIO --output resultados.jsonl [--workers 4]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from safebuild.detection import LocalImageFile
+from safebuild.detectors import DETECTOR_BACKENDS, create_detector
+from safebuild.expert_system import SafetyExpertSystem
+from safebuild.history import HistoryStore
+from safebuild.rules import RuleFileError, RuleRegistry, load_rule_file
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+_expert_system = None
+_detector = None
+
+
+def iter_images(root):
+    """
+    Recorre el directorio de forma perezosa (sin listar todo en memoria)
+    """
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield entry.path
+
+
+def path_key(path):
+    """
+    Clave compacta de una ruta (hash de 64 bits) para el conjunto de
+    imágenes ya analizadas
+    """
+    return int.from_bytes(hashlib.blake2b(path.encode('utf-8', 'surrogateescape'), digest_size=8).digest(), 'big')
+
+
+def load_completed(output_path):
+    """
+    Claves (path_key) de las imágenes ya analizadas con éxito; las que
+    terminaron con error no se incluyen, así se reintentan. Descarta una
+    última línea incompleta (corrida cortada a mitad de escritura).
+
+    El conjunto crece con la cantidad de imágenes de la salida (unos 100
+    bytes por imagen con la clave de 64 bits, sin importar el largo de la
+    ruta): para millones de archivos son cientos de MB como mucho.
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    valid_bytes = 0
+    with open(output_path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                record = json.loads(line)
+                path = record['path']
+            except (ValueError, KeyError, TypeError):
+                break
+            if 'error' not in record:
+                completed.add(path_key(path))
+            valid_bytes += len(line)
+
+    if valid_bytes != os.path.getsize(output_path):
+        with open(output_path, 'r+b') as f:
+            f.truncate(valid_bytes)
+    return completed
+
+
+def load_rules(rules_path, site):
+    """
+    Reglas de --rules: un archivo, o un directorio con las reglas por obra
+    """
+    if rules_path is None:
+        return None
+    if os.path.isdir(rules_path):
+        registry = RuleRegistry(rules_path)
+        book = registry.book(site)
+        if book is not None and book.error:
+            raise RuleFileError(book.error)
+        return registry.rules_for(site)
+    return load_rule_file(rules_path)
+
+
+def _init_worker(detector_options, rules_path=None, site='cli'):
+    # Cada proceso carga el modelo y compila las reglas una sola vez
+    global _expert_system, _detector
+    _expert_system = SafetyExpertSystem(load_rules(rules_path, site))
+    _detector = create_detector(**detector_options)
+
+
+def analyze_path(path, min_confidence=None):
+    start = time.perf_counter()
+    try:
+        detections = _detector.detect(LocalImageFile(path)).filter_confidence(min_confidence)
+        analysis = _expert_system.analyze_detections(detections)
+    except Exception as e:  # una imagen ilegible (o un fallo del modelo) no debe cortar la corrida
+        return {'path': path, 'error': f"{type(e).__name__}: {e}"}
+    return {
+        'path': path,
+        'detections': detections.to_dicts(),
+        'analysis': analysis,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 3),
+    }
+
+
+def run(root, output_path, workers=None, max_pending=None, history=None, site='cli', camera='lote',
+        detector_options=None, min_confidence=None, rules_path=None):
+    workers = workers or os.cpu_count() or 1
+    # Ventana acotada de tareas en vuelo: la memoria no crece con el directorio
+    max_pending = max_pending or workers * 4
+    completed = load_completed(output_path)
+    processed = errors = 0
+
+    with open(output_path, 'a', encoding='utf-8') as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(detector_options or {}, rules_path, site)) as pool:
+        pending = set()
+
+        def drain():
+            nonlocal pending, processed, errors
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            records = [future.result() for future in done]
+            for record in records:
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                processed += 1
+                errors += 'error' in record
+            out.flush()
+            if history is not None:
+                history.record_many(
+                    {'analysis': r['analysis'], 'site': site, 'camera': camera,
+                     'source': r['path'], 'elapsed_ms': r['elapsed_ms']}
+                    for r in records if 'error' not in r
+                )
+
+        for path in iter_images(root):
+            if path_key(path) in completed:
+                continue
+            pending.add(pool.submit(analyze_path, path, min_confidence))
+            if len(pending) >= max_pending:
+                drain()
+
+        while pending:
+            drain()
+
+    return {'processed': processed, 'skipped': len(completed), 'errors': errors}
+
+
+def add_detector_arguments(parser):
+    """
+    Opciones de detector y reglas comunes a la CLI y al servicio de ingesta
+    """
+    parser.add_argument('--backend', default='simulador', choices=sorted(DETECTOR_BACKENDS), help="Backend de detección")
+    parser.add_argument('--model', help="Modelo ONNX (backend 'onnx')")
+    parser.add_argument('--min-confidence', type=float, default=None,
+                        help="Descarta detecciones con confianza menor (0-1)")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="Hilos de inferencia por proceso (con varios procesos conviene 1)")
+    parser.add_argument('--tile-size', type=int, default=None,
+                        help="Analiza por mosaico de recortes de este lado en px (imágenes grandes)")
+    parser.add_argument('--tile-overlap', type=int, default=None, help="Solape entre recortes en px (por defecto 128)")
+    parser.add_argument('--tile-workers', type=int, default=None,
+                        help="Hilos que analizan recortes en paralelo, por proceso (por defecto, núcleos de CPU)")
+    parser.add_argument('--rules', help="Reglas en YAML/JSON, o directorio con <obra>.yaml (ver safebuild/rules.py)")
+
+
+def detector_options(args):
+    return {'backend': args.backend, 'model_path': args.model, 'num_threads': args.threads,
+            'tile_size': args.tile_size, 'tile_overlap': args.tile_overlap, 'tile_workers': args.tile_workers}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Análisis masivo de imágenes de obra (sin interfaz)")
+    parser.add_argument('directory', help="Directorio con imágenes (se recorre recursivamente)")
+    parser.add_argument('--output', '-o', required=True, help="Archivo JSONL de resultados")
+    parser.add_argument('--workers', '-w', type=int, default=None, help="Procesos en paralelo (por defecto, núcleos de CPU)")
+    add_detector_arguments(parser)
+    parser.add_argument('--history', help="Base SQLite del historial donde registrar cada análisis")
+    parser.add_argument('--site', default='cli', help="Obra con la que se registran los análisis en el historial")
+    parser.add_argument('--camera', default='lote', help="Cámara con la que se registran los análisis en el historial")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"no existe el directorio: {args.directory}")
+    try:
+        # Se validan antes de lanzar los procesos
+        load_rules(args.rules, args.site)
+    except (OSError, RuleFileError) as e:
+        parser.error(f"reglas inválidas: {e}")
+
+    history = HistoryStore(args.history) if args.history else None
+    try:
+        summary = run(args.directory, args.output, workers=args.workers,
+                      history=history, site=args.site, camera=args.camera,
+                      detector_options=detector_options(args),
+                      min_confidence=args.min_confidence, rules_path=args.rules)
+    finally:
+        if history is not None:
+            history.close()
+    print(f"Procesadas: {summary['processed']} · Omitidas (ya hechas): {summary['skipped']} · "
+          f"Errores: {summary['errors']}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import os
+import random
+
+# =============================================
+# SIMULADOR DE DETECCIÓN DE IMÁGENES
+# =============================================
+def analyze_uploaded_image(image_file):
+    """
+    Simula el análisis de una imagen subida
+    En una implementación real, aquí iría el modelo YOLO
+    """
+    # Simular análisis basado en características de la imagen
+    file_name = image_file.name.lower()
+    file_size = image_file.size
+    
+    # Simular diferentes escenarios basados en nombre y tamaño
+    if any(word in file_name for word in ['safe', 'seguro', 'good', 'completo']):
+        # Escenario seguro
+        return [
+            {'class_name': 'person', 'confidence': 0.92, 'bbox': [100, 100, 180, 250]},
+            {'class_name': 'helmet', 'confidence': 0.89, 'bbox': [110, 90, 140, 120]},
+            {'class_name': 'safety_vest', 'confidence': 0.87, 'bbox': [100, 120, 180, 170]},
+            {'class_name': 'person', 'confidence': 0.85, 'bbox': [300, 150, 380, 300]},
+            {'class_name': 'helmet', 'confidence': 0.88, 'bbox': [310, 140, 340, 170]},
+            {'class_name': 'safety_vest', 'confidence': 0.86, 'bbox': [300, 170, 380, 220]}
+        ]
+    elif any(word in file_name for word in ['peligro', 'peligroso', 'danger', 'alert']):
+        # Escenario crítico
+        return [
+            {'class_name': 'person', 'confidence': 0.94, 'bbox': [100, 100, 180, 250]},
+            {'class_name': 'person', 'confidence': 0.91, 'bbox': [300, 150, 380, 300]},
+            # Sin EPPs
+        ]
+    elif file_size > 1000000:  # Imagen grande - más probabilidad de múltiples personas
+        # Escenario mixto
+        return [
+            {'class_name': 'person', 'confidence': 0.93, 'bbox': [100, 100, 180, 250]},
+            {'class_name': 'helmet', 'confidence': 0.90, 'bbox': [110, 90, 140, 120]},
+            # Falta chaleco
+            {'class_name': 'person', 'confidence': 0.87, 'bbox': [300, 150, 380, 300]},
+            # Falta casco
+            {'class_name': 'safety_vest', 'confidence': 0.85, 'bbox': [300, 170, 380, 220]}
+        ]
+    else:
+        # Escenario aleatorio basado en probabilidades
+        scenarios = [
+            # Escenario seguro
+            [
+                {'class_name': 'person', 'confidence': 0.91, 'bbox': [100, 100, 180, 250]},
+                {'class_name': 'helmet', 'confidence': 0.88, 'bbox': [110, 90, 140, 120]},
+                {'class_name': 'safety_vest', 'confidence': 0.86, 'bbox': [100, 120, 180, 170]}
+            ],
+            # Escenario con alertas
+            [
+                {'class_name': 'person', 'confidence': 0.93, 'bbox': [100, 100, 180, 250]},
+                {'class_name': 'helmet', 'confidence': 0.89, 'bbox': [110, 90, 140, 120]},
+                # Falta chaleco
+                {'class_name': 'person', 'confidence': 0.87, 'bbox': [300, 150, 380, 300]},
+                {'class_name': 'safety_vest', 'confidence': 0.85, 'bbox': [300, 170, 380, 220]}
+            ],
+            # Escenario crítico
+            [
+                {'class_name': 'person', 'confidence': 0.94, 'bbox': [100, 100, 180, 250]},
+                {'class_name': 'person', 'confidence': 0.90, 'bbox': [300, 150, 380, 300]}
+            ]
+        ]
+        return random.choice(scenarios)
+
+
+# =============================================
+# IMÁGENES LOCALES (SIN STREAMLIT)
+# =============================================
+class LocalImageFile:
+    """
+    Adaptador de un archivo en disco con la misma interfaz mínima que el
+    UploadedFile de Streamlit (name, size, getvalue)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.size = os.path.getsize(path)
+
+    def getvalue(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+
+class MemoryImageFile:
+    """
+    Copia inmutable (nombre + bytes) de una imagen ya cargada en memoria
+    """
+
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+        self.size = len(data)
+
+    def getvalue(self):
+        return bytes(self.data)
@@ -0,0 +1,108 @@
+import numpy as np
+
+# =============================================
+# CLASES DE DETECCIÓN
+# =============================================
+# Ids enteros de las clases que entiende el sistema experto. Cualquier otra
+# clase se guarda como OTHER_CLASS_ID y no participa en las reglas.
+CLASS_NAMES = ('person', 'helmet', 'safety_vest')
+CLASS_IDS = {name: class_id for class_id, name in enumerate(CLASS_NAMES)}
+OTHER_CLASS_ID = len(CLASS_NAMES)
+OTHER_CLASS_NAME = 'other'
+
+DETECTION_DTYPE = np.dtype([
+    ('class_id', np.int16),
+    ('confidence', np.float32),
+    ('bbox', np.float32, (4,)),
+])
+
+
+class Detections:
+    """
+    Detecciones de una imagen en un único array estructurado de NumPy
+    (22 bytes por caja) en lugar de un dict por caja.
+    """
+    __slots__ = ('array',)
+
+    def __init__(self, array=None):
+        self.array = np.empty(0, dtype=DETECTION_DTYPE) if array is None else array
+
+    @classmethod
+    def from_arrays(cls, class_ids, confidences, boxes):
+        array = np.empty(len(class_ids), dtype=DETECTION_DTYPE)
+        array['class_id'] = class_ids
+        array['confidence'] = confidences
+        array['bbox'] = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        return cls(array)
+
+    @classmethod
+    def from_dicts(cls, detections):
+        """
+        Convierte el formato clásico [{'class_name', 'confidence', 'bbox'}, ...]
+        """
+        array = np.empty(len(detections), dtype=DETECTION_DTYPE)
+        for i, det in enumerate(detections):
+            array[i] = (CLASS_IDS.get(det['class_name'], OTHER_CLASS_ID), det['confidence'], det['bbox'])
+        return cls(array)
+
+    @classmethod
+    def from_json(cls, data):
+        return cls.from_arrays(data['class_id'], data['confidence'], data['bbox'])
+
+    def to_json(self):
+        """
+        Forma columnar serializable (para caché y almacenamiento)
+        """
+        return {
+            'class_id': self.array['class_id'].tolist(),
+            'confidence': np.round(self.array['confidence'].astype(np.float64), 4).tolist(),
+            'bbox': np.round(self.array['bbox'].astype(np.float64), 1).tolist(),
+        }
+
+    def to_dicts(self):
+        names = CLASS_NAMES + (OTHER_CLASS_NAME,)
+        return [
+            {'class_name': names[class_id], 'confidence': confidence, 'bbox': bbox}
+            for class_id, confidence, bbox in zip(*self.to_json().values())
+        ]
+
+    @property
+    def class_ids(self):
+        return self.array['class_id']
+
+    @property
+    def confidences(self):
+        return self.array['confidence']
+
+    @property
+    def boxes(self):
+        return self.array['bbox']
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, index):
+        return Detections(self.array[index])
+
+    def filter_confidence(self, min_confidence):
+        """
+        Conserva solo las detecciones con confianza >= min_confidence (máscara vectorizada)
+        """
+        if not min_confidence:
+            return self
+        return Detections(self.array[self.array['confidence'] >= min_confidence])
+
+    def class_counts(self):
+        """
+        Conteo por clase en una pasada: array de largo len(CLASS_NAMES) + 1
+        """
+        return np.bincount(self.array['class_id'], minlength=OTHER_CLASS_ID + 1)
+
+
+def as_detections(detections):
+    """
+    Acepta Detections o la lista de dicts clásica y devuelve Detections
+    """
+    if isinstance(detections, Detections):
+        return detections
+    return Detections.from_dicts(detections)
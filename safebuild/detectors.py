@@ -0,0 +1,399 @@
+import ast
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+import numpy as np
+from PIL import Image
+
+from safebuild.boxes import fast_nms, nms
+from safebuild.detection import analyze_uploaded_image
+from safebuild.detections import CLASS_IDS, OTHER_CLASS_ID, Detections
+from safebuild.ingest import decode_downscaled, estimate_decode_bytes
+
+try:
+    import onnxruntime as ort
+except ImportError:  # ONNX Runtime es opcional: sin él solo está el simulador
+    ort = None
+
+# =============================================
+# DETECTORES DE EPP
+# =============================================
+# Nombres que usan los datasets públicos de EPP -> nombres del sistema experto
+CLASS_ALIASES = {
+    'person': 'person', 'persona': 'person', 'worker': 'person',
+    'helmet': 'helmet', 'hardhat': 'helmet', 'hard-hat': 'helmet', 'hard_hat': 'helmet', 'casco': 'helmet',
+    'safety_vest': 'safety_vest', 'safety-vest': 'safety_vest', 'vest': 'safety_vest', 'chaleco': 'safety_vest',
+}
+
+
+class Detector:
+    """
+    Interfaz común de los detectores. detect_batch recibe objetos con la
+    interfaz de UploadedFile (name, size, getvalue) y devuelve, por imagen,
+    un objeto Detections. Si el objeto trae una copia decodificada (atributo
+    image + original_size, ver IngestedImage) los detectores la reutilizan.
+    """
+    name = 'base'
+    # El simulador decide según el nombre del archivo; los modelos reales no
+    depends_on_file_name = False
+
+    @property
+    def config(self):
+        """
+        Parámetros que afectan el resultado (forman parte de la clave de caché)
+        """
+        return {'backend': self.name}
+
+    def detect(self, image_file):
+        return self.detect_batch([image_file])[0]
+
+    def detect_batch(self, image_files):
+        raise NotImplementedError
+
+    def describe(self):
+        return self.name
+
+
+class SimulatorDetector(Detector):
+    """
+    Detector simulado (sin modelo). Es el respaldo cuando no hay modelo disponible.
+    """
+    name = 'simulador'
+    depends_on_file_name = True
+
+    def detect_batch(self, image_files):
+        return [Detections.from_dicts(analyze_uploaded_image(image_file)) for image_file in image_files]
+
+
+class OnnxDetector(Detector):
+    """
+    Detector YOLO (v5 / v8 exportado a ONNX) sobre CPU con ONNX Runtime.
+    El modelo se carga una sola vez en el constructor; conviene reutilizar
+    la instancia (st.cache_resource en la app, una por proceso en la CLI).
+    """
+    name = 'onnx'
+
+    def __init__(self, model_path=None, num_threads=None, input_size=640, score_threshold=0.25,
+                 iou_threshold=0.45, class_names=None):
+        if ort is None:
+            raise ImportError("El backend 'onnx' necesita onnxruntime (pip install onnxruntime)")
+        if not model_path:
+            raise ValueError("El backend 'onnx' necesita la ruta del modelo")
+        if not os.path.isfile(model_path):
+            raise FileNotFoundError(f"No existe el modelo: {model_path}")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch_dim, _, height, width = model_input.shape
+        # Modelos exportados con batch fijo (=1) se ejecutan imagen por imagen
+        self.max_batch = batch_dim if isinstance(batch_dim, int) else None
+        self.input_size = (
+            (height, width) if isinstance(height, int) and isinstance(width, int) else (input_size, input_size)
+        )
+
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.score_threshold = score_threshold
+        self.iou_threshold = iou_threshold
+        self.class_names = [CLASS_ALIASES.get(n.lower(), n) for n in (class_names or self._model_class_names())]
+        # Índice de clase del modelo -> id de clase del sistema experto
+        self._class_id_map = np.array([CLASS_IDS.get(n, OTHER_CLASS_ID) for n in self.class_names], dtype=np.int16)
+
+    def _model_class_names(self):
+        # Ultralytics guarda {0: 'person', ...} en los metadatos del modelo
+        names = self.session.get_modelmeta().custom_metadata_map.get('names')
+        if names is None:
+            raise ValueError("El modelo no declara sus clases; indica class_names explícitamente")
+        names = ast.literal_eval(names)
+        return [names[i] for i in sorted(names)]
+
+    @property
+    def config(self):
+        stat = os.stat(self.model_path)
+        return {
+            'backend': self.name,
+            'model': os.path.abspath(self.model_path),
+            'model_mtime': stat.st_mtime,
+            'input_size': list(self.input_size),
+            'score_threshold': self.score_threshold,
+            'iou_threshold': self.iou_threshold,
+        }
+
+    def describe(self):
+        threads = f"{self.num_threads} hilos" if self.num_threads else "hilos automáticos"
+        return f"{self.name} · {os.path.basename(self.model_path)} · {threads}"
+
+    def _letterbox(self, image_file):
+        """
+        Redimensiona manteniendo proporción y rellena hasta el tamaño de entrada.
+        Devuelve el tensor CHW y los parámetros para deshacer la transformación.
+        """
+        target_h, target_w = self.input_size
+        shared = getattr(image_file, 'image', None)
+        if shared is not None:
+            # IngestedImage: se reutiliza la copia reducida ya decodificada
+            original_size = image_file.original_size
+            scale = min(target_w / original_size[0], target_h / original_size[1])
+            new_w, new_h = max(1, round(original_size[0] * scale)), max(1, round(original_size[1] * scale))
+            resized = shared.resize((new_w, new_h), Image.BILINEAR)
+        else:
+            with Image.open(io.BytesIO(image_file.getvalue())) as image:
+                original_size = image.size
+                scale = min(target_w / original_size[0], target_h / original_size[1])
+                new_w, new_h = max(1, round(original_size[0] * scale)), max(1, round(original_size[1] * scale))
+                # En JPEG, draft decodifica directamente a una escala cercana a la del modelo
+                image.draft('RGB', (new_w, new_h))
+                resized = image.convert('RGB').resize((new_w, new_h), Image.BILINEAR)
+
+        canvas = np.full((target_h, target_w, 3), 114, dtype=np.uint8)
+        pad_x, pad_y = (target_w - new_w) // 2, (target_h - new_h) // 2
+        canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = np.asarray(resized)
+        tensor = canvas.transpose(2, 0, 1).astype(np.float32) / 255.0
+        return tensor, (scale, pad_x, pad_y, original_size)
+
+    def _decode(self, prediction, transform):
+        """
+        Convierte la salida cruda de una imagen en detecciones en píxeles originales
+        """
+        n_classes = len(self.class_names)
+        if prediction.shape[0] == 4 + n_classes:
+            # YOLOv8: (4 + nc, N), sin objectness
+            prediction = prediction.T
+            boxes, class_scores = prediction[:, :4], prediction[:, 4:]
+        else:
+            # YOLOv5: (N, 5 + nc), score = objectness * prob. de clase
+            boxes, class_scores = prediction[:, :4], prediction[:, 5:] * prediction[:, 4:5]
+
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+        mask = scores >= self.score_threshold
+        boxes, scores, class_ids = boxes[mask], scores[mask], class_ids[mask]
+
+        scale, pad_x, pad_y, (width, height) = transform
+        xyxy = np.empty_like(boxes)
+        xyxy[:, 0] = (boxes[:, 0] - boxes[:, 2] / 2 - pad_x) / scale
+        xyxy[:, 1] = (boxes[:, 1] - boxes[:, 3] / 2 - pad_y) / scale
+        xyxy[:, 2] = (boxes[:, 0] + boxes[:, 2] / 2 - pad_x) / scale
+        xyxy[:, 3] = (boxes[:, 1] + boxes[:, 3] / 2 - pad_y) / scale
+        xyxy[:, [0, 2]] = np.clip(xyxy[:, [0, 2]], 0, width)
+        xyxy[:, [1, 3]] = np.clip(xyxy[:, [1, 3]], 0, height)
+
+        keep = nms(xyxy, scores, self.iou_threshold, class_ids=class_ids)
+        return Detections.from_arrays(self._class_id_map[class_ids[keep]], scores[keep], xyxy[keep])
+
+    def detect_batch(self, image_files):
+        if not image_files:
+            return []
+        prepared = [self._letterbox(image_file) for image_file in image_files]
+        step = self.max_batch or len(prepared)
+
+        results = []
+        for start in range(0, len(prepared), step):
+            chunk = prepared[start:start + step]
+            batch = np.stack([tensor for tensor, _ in chunk])
+            output = self.session.run(None, {self.input_name: batch})[0]
+            results.extend(self._decode(prediction, transform) for prediction, (_, transform) in zip(output, chunk))
+        return results
+
+
+# =============================================
+# DETECCIÓN POR MOSAICO (IMÁGENES GRANDES)
+# =============================================
+class ImageRegion:
+    """
+    Recorte ya decodificado que se pasa al detector interno con la interfaz
+    de IngestedImage (image + original_size): no se vuelve a codificar
+    """
+
+    def __init__(self, name, image):
+        self.name = name
+        self.image = image
+        self.original_size = image.size
+        self.size = image.width * image.height * 3
+
+    def getvalue(self):
+        buffer = io.BytesIO()
+        self.image.save(buffer, 'PNG')
+        return buffer.getvalue()
+
+
+def tile_starts(length, tile_size, step):
+    """
+    Inicios de los recortes sobre un eje: paso fijo y el último pegado al borde
+    """
+    if length <= tile_size:
+        return [0]
+    starts = list(range(0, length - tile_size, step))
+    return starts + [length - tile_size]
+
+
+class TiledDetector(Detector):
+    """
+    Envuelve otro detector para imágenes grandes: la imagen se parte en
+    recortes solapados de tile_size px que se analizan en paralelo en un
+    pool de hilos (ONNX Runtime libera el GIL; conviene un hilo de ORT por
+    sesión y tantos workers como núcleos). Además se analiza la imagen
+    entera reducida, que encuentra los objetos más grandes que el solape.
+
+    Las cajas de un recorte que tocan un borde interior se descartan (el
+    objeto aparece completo en el recorte vecino) y los duplicados de las
+    costuras se fusionan con fast_nms.
+    """
+    name = 'mosaico'
+
+    def __init__(self, detector, tile_size=640, overlap=128, workers=None, max_side=4096, iou_threshold=0.5,
+                 edge_margin=2):
+        if overlap < 0 or overlap >= tile_size:
+            raise ValueError(f"El solape ({overlap} px) debe ser menor que el recorte ({tile_size} px)")
+        self.detector = detector
+        self.depends_on_file_name = detector.depends_on_file_name
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.workers = workers or os.cpu_count() or 1
+        self.max_side = max_side
+        self.iou_threshold = iou_threshold
+        self.edge_margin = edge_margin
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def config(self):
+        return {
+            **self.detector.config,
+            'tile_size': self.tile_size,
+            'tile_overlap': self.overlap,
+            'tile_max_side': self.max_side,
+            'tile_iou_threshold': self.iou_threshold,
+        }
+
+    def describe(self):
+        return (f"{self.detector.describe()} · mosaico {self.tile_size} px "
+                f"(solape {self.overlap} px) · {self.workers} workers")
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='safebuild-tiles')
+            return self._executor
+
+    def _decode(self, image_file, reservations):
+        """
+        Imagen a la resolución del mosaico (lado mayor <= max_side). La copia
+        de una IngestedImage se reutiliza si ya tiene esa resolución; si no,
+        la decodificación se descuenta del presupuesto de su sesión hasta
+        terminar el lote.
+        """
+        shared = getattr(image_file, 'image', None)
+        if shared is not None and max(shared.size) >= min(self.max_side, max(image_file.original_size)):
+            return shared, image_file.original_size
+        data = image_file.getvalue()
+        budget = getattr(image_file, 'budget', None)
+        if budget is not None:
+            reservations.enter_context(budget.reserve(estimate_decode_bytes(data, self.max_side)))
+        return decode_downscaled(data, self.max_side)
+
+    def _regions(self, image_file, reservations):
+        """
+        Recortes de una imagen: (ImageRegion, origen x, origen y, bordes interiores)
+        """
+        image, original_size = self._decode(image_file, reservations)
+        width, height = image.size
+        regions = [(ImageRegion(image_file.name, image), 0, 0, (False, False, False, False))]
+        if max(width, height) <= self.tile_size:
+            return regions, image.width / original_size[0], original_size
+
+        step = self.tile_size - self.overlap
+        for top in tile_starts(height, self.tile_size, step):
+            for left in tile_starts(width, self.tile_size, step):
+                right, bottom = min(left + self.tile_size, width), min(top + self.tile_size, height)
+                # (izquierda, arriba, derecha, abajo): True si el borde no es el de la imagen
+                inner_edges = (left > 0, top > 0, right < width, bottom < height)
+                tile = image.crop((left, top, right, bottom))
+                regions.append((ImageRegion(image_file.name, tile), left, top, inner_edges))
+        return regions, image.width / original_size[0], original_size
+
+    def _detect_chunk(self, regions):
+        return self.detector.detect_batch([region for region, *_ in regions])
+
+    def _merge(self, regions, results, scale, original_size):
+        class_ids, scores, boxes = [], [], []
+        for (region, left, top, inner_edges), detections in zip(regions, results):
+            tile_boxes = detections.boxes.astype(np.float64)
+            keep = np.ones(len(tile_boxes), dtype=bool)
+            for axis, (edge, limit) in enumerate(zip(inner_edges, (0, 0) + region.image.size)):
+                if edge:
+                    distance = tile_boxes[:, axis] - limit
+                    keep &= np.abs(distance) > self.edge_margin
+            tile_boxes = tile_boxes[keep]
+            tile_boxes[:, [0, 2]] += left
+            tile_boxes[:, [1, 3]] += top
+            class_ids.append(detections.class_ids[keep])
+            scores.append(detections.confidences[keep])
+            boxes.append(tile_boxes / scale)
+
+        class_ids, scores, boxes = np.concatenate(class_ids), np.concatenate(scores), np.concatenate(boxes)
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, original_size[0])
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, original_size[1])
+        keep = fast_nms(boxes, scores, self.iou_threshold, class_ids=class_ids)
+        return Detections.from_arrays(class_ids[keep], scores[keep], boxes[keep])
+
+    def detect_batch(self, image_files):
+        if not image_files:
+            return []
+        with ExitStack() as reservations:
+            images = [self._regions(image_file, reservations) for image_file in image_files]
+            regions = [region for image_regions, _, _ in images for region in image_regions]
+
+            # Un lote de recortes por worker: se paralelizan y cada uno aprovecha el batch del modelo
+            chunk_size = -(-len(regions) // self.workers)
+            chunks = [regions[start:start + chunk_size] for start in range(0, len(regions), chunk_size)]
+            if len(chunks) == 1:
+                results = self._detect_chunk(chunks[0])
+            else:
+                results = [detections for chunk in self._pool().map(self._detect_chunk, chunks)
+                           for detections in chunk]
+
+            merged, position = [], 0
+            for image_regions, scale, original_size in images:
+                count = len(image_regions)
+                merged.append(self._merge(image_regions, results[position:position + count], scale, original_size))
+                position += count
+        return merged
+
+
+DETECTOR_BACKENDS = {
+    SimulatorDetector.name: SimulatorDetector,
+    OnnxDetector.name: OnnxDetector,
+}
+
+
+def create_detector(backend='simulador', tile_size=None, tile_overlap=None, tile_workers=None, **options):
+    """
+    Crea un detector por nombre de backend. Las opciones sin valor se ignoran
+    y el simulador no usa ninguna. Con tile_size el detector se envuelve en
+    un TiledDetector (el simulador no trabaja con píxeles y no se envuelve).
+    """
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(f"Backend de detección desconocido: {backend} (opciones: {', '.join(DETECTOR_BACKENDS)})")
+    if backend == SimulatorDetector.name:
+        return SimulatorDetector()
+    options = {key: value for key, value in options.items() if value is not None}
+    if not tile_size:
+        return DETECTOR_BACKENDS[backend](**options)
+
+    # Un hilo de ORT por sesión: el paralelismo lo aportan los workers del mosaico
+    options.setdefault('num_threads', 1)
+    tile_options = {'overlap': tile_overlap, 'workers': tile_workers}
+    tile_options = {key: value for key, value in tile_options.items() if value is not None}
+    return TiledDetector(DETECTOR_BACKENDS[backend](**options), tile_size=tile_size, **tile_options)
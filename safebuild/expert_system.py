@@ -0,0 +1,215 @@
+import numpy as np
+
+from safebuild.association import SMALL_FRAME, associate_batch, associate_dicts, associate_ppe, worker_records
+from safebuild.detections import CLASS_IDS, CLASS_NAMES, OTHER_CLASS_ID, Detections, as_detections
+from safebuild.rules import BUILTIN_RULES
+
+# Clave de estadística -> columna de la matriz de estadísticas por frame
+STAT_KEYS = {'persons': 0, 'helmets': 1, 'vests': 2, 'compliant': 3}
+
+DEFAULT_RESULT = {
+    'alert_level': "OK",
+    'alert_message': "Condiciones normales de seguridad detectadas",
+    'recommended_action': "Continuar con el monitoreo rutinario",
+}
+
+
+# =============================================
+# SISTEMA EXPERTO
+# =============================================
+class SafetyExpertSystem:
+    """
+    Evalúa las reglas (ver safebuild.rules) sobre las estadísticas de cada
+    frame. Por defecto gana la primera regla que se cumple; con all_matches
+    el resultado también lista todas las que se cumplen ('matched_rules').
+    """
+
+    def __init__(self, rules=None, all_matches=None):
+        # Las condiciones compiladas usan & / | en lugar de and / or para que
+        # la misma regla funcione con enteros (un frame) y con arrays (lote).
+        ruleset = rules if rules is not None else BUILTIN_RULES
+        self.ruleset = ruleset
+        self.rules = ruleset.rules
+        self.all_matches = ruleset.all_matches if all_matches is None else all_matches
+
+    def count_classes(self, detections):
+        """
+        Cuenta personas, cascos y chalecos en una sola pasada. Acepta
+        Detections (bincount sobre los ids) o la lista de dicts clásica.
+        """
+        if isinstance(detections, Detections):
+            counts = detections.class_counts().tolist()
+        else:
+            counts = [0] * (OTHER_CLASS_ID + 1)
+            for det in detections:
+                counts[CLASS_IDS.get(det['class_name'], OTHER_CLASS_ID)] += 1
+        return {'persons': counts[0], 'helmets': counts[1], 'vests': counts[2]}
+
+    def worker_stats(self, detections):
+        """
+        Asocia cada casco y chaleco a una persona por geometría (ver
+        safebuild.association). Devuelve las estadísticas que consumen las
+        reglas (personas, personas con casco, con chaleco y con ambos) y los
+        registros por persona.
+        """
+        if isinstance(detections, Detections) or len(detections) > SMALL_FRAME:
+            detections = as_detections(detections)
+            workers = worker_records(associate_ppe(detections), detections.boxes)
+        else:
+            workers = associate_dicts(detections)
+        detection_stats = {
+            'persons': len(workers),
+            'helmets': sum(worker['helmet'] for worker in workers),
+            'vests': sum(worker['vest'] for worker in workers),
+            'compliant': sum(worker['helmet'] and worker['vest'] for worker in workers),
+        }
+        return detection_stats, workers
+
+    def _build_result(self, rule_name, detection_stats, workers):
+        rule = self.rules.get(rule_name)
+        if rule is None:
+            return {**DEFAULT_RESULT, 'statistics': detection_stats, 'workers': workers, 'rule': None}
+        return {
+            'alert_level': rule['level'],
+            'alert_message': rule['message'],
+            'recommended_action': rule['action'],
+            'statistics': detection_stats,
+            'workers': workers,
+            'rule': rule_name,
+        }
+
+    def _matched_rules(self, names):
+        return [
+            {'rule': name, 'alert_level': self.rules[name]['level'], 'alert_message': self.rules[name]['message']}
+            for name in names
+        ]
+
+    def analyze_detections(self, detections):
+        """
+        Evalúa las reglas sobre un frame. 'helmets' y 'vests' cuentan personas
+        que usan cada elemento: un casco que no está sobre ninguna cabeza no suma.
+        """
+        detection_stats, workers = self.worker_stats(detections)
+
+        if self.all_matches:
+            names = [rule_name for rule_name, rule in self.rules.items() if rule['condition'](detection_stats)]
+            result = self._build_result(names[0] if names else None, detection_stats, workers)
+            result['matched_rules'] = self._matched_rules(names)
+            return result
+
+        for rule_name, rule in self.rules.items():
+            if rule['condition'](detection_stats):
+                return self._build_result(rule_name, detection_stats, workers)
+
+        return self._build_result(None, detection_stats, workers)
+
+    def count_classes_batch(self, frames):
+        """
+        Cuenta las clases de muchos frames a la vez.
+        Devuelve una matriz (n_frames, n_clases + 1) de enteros.
+        """
+        lengths = np.fromiter((len(frame) for frame in frames), dtype=np.int64, count=len(frames))
+        if all(isinstance(frame, Detections) for frame in frames):
+            class_ids = np.concatenate([frame.class_ids for frame in frames]).astype(np.int64)
+        else:
+            class_ids = np.fromiter(
+                (CLASS_IDS.get(det['class_name'], OTHER_CLASS_ID)
+                 for frame in frames
+                 for det in (frame.to_dicts() if isinstance(frame, Detections) else frame)),
+                dtype=np.int64,
+                count=int(lengths.sum())
+            )
+        frame_ids = np.repeat(np.arange(len(frames), dtype=np.int64), lengths)
+        n_columns = OTHER_CLASS_ID + 1
+        counts = np.bincount(frame_ids * n_columns + class_ids, minlength=len(frames) * n_columns)
+        return counts.reshape(len(frames), n_columns)
+
+    def worker_stats_batch(self, frames):
+        """
+        Asociación persona-EPP de muchos frames en una sola pasada vectorizada.
+        Devuelve la matriz (n_frames, 4) de estadísticas (columnas según
+        STAT_KEYS) y, por frame, la lista de registros por persona.
+        """
+        lengths = np.fromiter((len(frame) for frame in frames), dtype=np.int64, count=len(frames))
+        if any(isinstance(frame, Detections) for frame in frames):
+            frames = [as_detections(frame) for frame in frames]
+            # Por campo: concatenar arrays estructurados es mucho más lento
+            class_ids = np.concatenate([frame.class_ids for frame in frames])
+            boxes = np.concatenate([frame.boxes for frame in frames])
+        else:
+            # Listas de dicts: una sola pasada, sin un Detections intermedio por frame
+            class_ids = np.fromiter(
+                (CLASS_IDS.get(det['class_name'], OTHER_CLASS_ID) for frame in frames for det in frame),
+                dtype=np.int16, count=int(lengths.sum())
+            )
+            boxes = np.array([det['bbox'] for frame in frames for det in frame], dtype=np.float32).reshape(-1, 4)
+        frame_ids = np.repeat(np.arange(len(frames), dtype=np.int64), lengths)
+        workers = associate_batch(class_ids, boxes, frame_ids)
+
+        has_helmet, has_vest = workers['helmet'] >= 0, workers['vest'] >= 0
+        stats = np.empty((len(frames), len(STAT_KEYS)), dtype=np.int64)
+        for key, mask in (('persons', slice(None)), ('helmets', has_helmet), ('vests', has_vest),
+                          ('compliant', has_helmet & has_vest)):
+            stats[:, STAT_KEYS[key]] = np.bincount(workers['frame'][mask], minlength=len(frames))
+
+        records = worker_records(workers, boxes)
+        bounds = np.cumsum(stats[:, STAT_KEYS['persons']]).tolist()
+        per_frame = [records[start:end] for start, end in zip([0] + bounds[:-1], bounds)]
+        return stats, per_frame
+
+    def rule_masks(self, counts):
+        """
+        Tabla de decisión: matriz (reglas + 1, frames) con qué reglas se
+        cumplen en cada frame, evaluando cada regla como predicado vectorizado
+        sobre la matriz de estadísticas. La última fila (centinela) es True.
+        """
+        stats = {key: counts[:, column] for key, column in STAT_KEYS.items()}
+        n_frames = counts.shape[0]
+        masks = np.empty((len(self.rules) + 1, n_frames), dtype=bool)
+        for i, rule in enumerate(self.rules.values()):
+            masks[i] = np.broadcast_to(rule['condition'](stats), n_frames)
+        masks[-1] = True
+        return masks
+
+    def match_rules_batch(self, counts):
+        """
+        Devuelve, por frame, el índice de la primera regla que se cumple
+        (orden de evaluación) o -1 si ninguna aplica
+        """
+        # Si ninguna regla aplica, argmax cae en la fila centinela
+        matched = np.argmax(self.rule_masks(counts), axis=0)
+        matched[matched == len(self.rules)] = -1
+        return matched
+
+    def analyze_batch(self, frames):
+        """
+        Analiza una lista de frames (cada uno, Detections o lista de detecciones).
+        Produce exactamente lo mismo que llamar a analyze_detections frame a frame.
+        """
+        frames = list(frames)
+        if not frames:
+            return []
+
+        counts, workers = self.worker_stats_batch(frames)
+        masks = self.rule_masks(counts)
+        matched = np.argmax(masks, axis=0)
+        matched[matched == len(self.rules)] = -1
+
+        # Una plantilla por regla (la última, para "ninguna regla"); solo cambian estadísticas y personas
+        templates = [self._build_result(rule_name, None, None) for rule_name in self.rules]
+        templates.append(self._build_result(None, None, None))
+        stat_columns = counts[:, list(STAT_KEYS.values())].tolist()
+        results = []
+        for rule_index, (persons, helmets, vests, compliant), frame_workers in zip(
+                matched.tolist(), stat_columns, workers):
+            result = templates[rule_index].copy()
+            result['statistics'] = {'persons': persons, 'helmets': helmets, 'vests': vests, 'compliant': compliant}
+            result['workers'] = frame_workers
+            results.append(result)
+
+        if self.all_matches:
+            names = list(self.rules)
+            for result, frame_masks in zip(results, masks[:-1].T.tolist()):
+                result['matched_rules'] = self._matched_rules(
+                    [name for name, hit in zip(names, frame_masks) if hit])
+        return results
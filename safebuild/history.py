@@ -0,0 +1,334 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+# =============================================
+# HISTORIAL PERSISTENTE DE ANÁLISIS
+# =============================================
+# Comodín para los agregados: ('*', '*') es el total global y
+# (obra, '*') el total de una obra
+ALL = '*'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    site TEXT NOT NULL,
+    camera TEXT NOT NULL,
+    source TEXT NOT NULL,
+    persons INTEGER NOT NULL,
+    helmets INTEGER NOT NULL,
+    vests INTEGER NOT NULL,
+    compliant INTEGER,
+    alert_level TEXT NOT NULL,
+    alert_message TEXT NOT NULL,
+    elapsed_ms REAL
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_site_camera_ts ON analyses (site, camera, ts);
+CREATE INDEX IF NOT EXISTS idx_analyses_site_ts ON analyses (site, ts);
+CREATE INDEX IF NOT EXISTS idx_analyses_ts ON analyses (ts);
+
+CREATE TABLE IF NOT EXISTS aggregates (
+    site TEXT NOT NULL,
+    camera TEXT NOT NULL,
+    analyses INTEGER NOT NULL DEFAULT 0,
+    alerts_alta INTEGER NOT NULL DEFAULT 0,
+    alerts_media INTEGER NOT NULL DEFAULT 0,
+    alerts_ok INTEGER NOT NULL DEFAULT 0,
+    persons INTEGER NOT NULL DEFAULT 0,
+    images_with_persons INTEGER NOT NULL DEFAULT 0,
+    compliance_sum REAL NOT NULL DEFAULT 0,
+    elapsed_ms_sum REAL NOT NULL DEFAULT 0,
+    elapsed_count INTEGER NOT NULL DEFAULT 0,
+    last_ts REAL,
+    PRIMARY KEY (site, camera)
+);
+"""
+
+UPSERT_AGGREGATE = """
+INSERT INTO aggregates (site, camera, analyses, alerts_alta, alerts_media, alerts_ok, persons,
+                        images_with_persons, compliance_sum, elapsed_ms_sum, elapsed_count, last_ts)
+VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (site, camera) DO UPDATE SET
+    analyses = analyses + 1,
+    alerts_alta = alerts_alta + excluded.alerts_alta,
+    alerts_media = alerts_media + excluded.alerts_media,
+    alerts_ok = alerts_ok + excluded.alerts_ok,
+    persons = persons + excluded.persons,
+    images_with_persons = images_with_persons + excluded.images_with_persons,
+    compliance_sum = compliance_sum + excluded.compliance_sum,
+    elapsed_ms_sum = elapsed_ms_sum + excluded.elapsed_ms_sum,
+    elapsed_count = elapsed_count + excluded.elapsed_count,
+    last_ts = MAX(COALESCE(last_ts, excluded.last_ts), excluded.last_ts)
+"""
+
+
+# Columnas de las filas del historial que se exportan
+ANALYSIS_COLUMNS = ('id', 'ts', 'site', 'camera', 'source', 'persons', 'helmets', 'vests', 'compliant',
+                    'alert_level', 'alert_message', 'elapsed_ms')
+
+# Períodos de los reportes: inicio del período (hora local) como expresión de
+# SQLite sobre ts, y el inicio del período siguiente en Python
+PERIODS = {
+    'day': "date(ts, 'unixepoch', 'localtime')",
+    'week': "date(ts, 'unixepoch', 'localtime', 'weekday 0', '-6 days')",
+    'month': "date(ts, 'unixepoch', 'localtime', 'start of month')",
+}
+REPORT_COLUMNS = ('period', 'site', 'analyses', 'images_with_persons', 'persons', 'helmets', 'vests', 'compliant',
+                  'compliance', 'helmet_ratio', 'vest_ratio', 'alerts_alta', 'alerts_media', 'alerts_ok')
+
+# Filas anteriores a la columna 'compliant': se estima como en compliant_count
+COMPLIANT_EXPRESSION = "COALESCE(compliant, MIN(helmets, vests, persons))"
+REPORT_SELECT = f"""
+SELECT {{period}} AS period, site, COUNT(*) AS analyses,
+       SUM(persons > 0) AS images_with_persons, SUM(persons) AS persons, SUM(helmets) AS helmets,
+       SUM(vests) AS vests, SUM({COMPLIANT_EXPRESSION}) AS compliant,
+       SUM(alert_level = 'ALTA') AS alerts_alta, SUM(alert_level = 'MEDIA') AS alerts_media,
+       SUM(alert_level = 'OK') AS alerts_ok
+FROM analyses WHERE ts >= ? AND ts < ?{{site_filter}}
+GROUP BY period, site ORDER BY period, site
+"""
+
+
+def period_start(moment, period):
+    """
+    Inicio (hora local, sin zona) del período que contiene `moment`
+    """
+    day = datetime(moment.year, moment.month, moment.day)
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_period(start, period):
+    if period == 'week':
+        return start + timedelta(days=7)
+    if period == 'month':
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start + timedelta(days=1)
+
+
+def compliant_count(statistics):
+    """
+    Trabajadores con casco y chaleco. Los resultados anteriores a la
+    asociación persona-EPP no traen 'compliant': se estima con el mínimo de
+    cascos, chalecos y personas (igual que COMPLIANT_EXPRESSION en SQL).
+    """
+    compliant = statistics.get('compliant')
+    if compliant is None:
+        compliant = min(statistics['helmets'], statistics['vests'], statistics['persons'])
+    return compliant
+
+
+def compliance_ratio(statistics):
+    """
+    Fracción de trabajadores con casco y chaleco (None si no hay personas)
+    """
+    persons = statistics['persons']
+    if persons == 0:
+        return None
+    return compliant_count(statistics) / persons
+
+
+def batch_summary(analyses):
+    """
+    Agregados de un lote de análisis: totales de trabajadores y de EPP,
+    cumplimiento del lote (trabajadores con casco y chaleco sobre el total,
+    None si no hay personas) y cantidad de imágenes por nivel de alerta
+    """
+    totals = {'images': 0, 'persons': 0, 'helmets': 0, 'vests': 0, 'compliant': 0}
+    levels = {"ALTA": 0, "MEDIA": 0, "OK": 0}
+    for analysis in analyses:
+        statistics = analysis['statistics']
+        totals['images'] += 1
+        totals['persons'] += statistics['persons']
+        totals['helmets'] += statistics['helmets']
+        totals['vests'] += statistics['vests']
+        totals['compliant'] += compliant_count(statistics)
+        levels[analysis['alert_level']] = levels.get(analysis['alert_level'], 0) + 1
+    return {
+        **totals,
+        'compliance': compliance_ratio(totals) if totals['persons'] else None,
+        'levels': levels,
+    }
+
+
+class HistoryStore:
+    """
+    Historial de resultados de analyze_detections en SQLite (modo WAL).
+    Cada inserción actualiza en la misma transacción los agregados global,
+    por obra y por cámara, así el tablero lee resúmenes en O(1) sin
+    recorrer el historial.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        # Bases creadas antes de guardar 'compliant' (las filas viejas quedan en NULL)
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(analyses)")}
+        if 'compliant' not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE analyses ADD COLUMN compliant INTEGER")
+
+    def _insert(self, analysis, site, camera, source, elapsed_ms, timestamp):
+        stats = analysis['statistics']
+        level = analysis['alert_level']
+        ts = time.time() if timestamp is None else timestamp
+        cursor = self._conn.execute(
+            "INSERT INTO analyses (ts, site, camera, source, persons, helmets, vests, compliant, alert_level, "
+            "alert_message, elapsed_ms) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (ts, site, camera, source, stats['persons'], stats['helmets'], stats['vests'], stats.get('compliant'),
+             level, analysis['alert_message'], elapsed_ms)
+        )
+
+        compliance = compliance_ratio(stats)
+        values = (
+            level == "ALTA", level == "MEDIA", level == "OK",
+            stats['persons'],
+            compliance is not None, compliance or 0.0,
+            elapsed_ms or 0.0, elapsed_ms is not None,
+            ts,
+        )
+        for scope in ((ALL, ALL), (site, ALL), (site, camera)):
+            self._conn.execute(UPSERT_AGGREGATE, scope + values)
+        return cursor.lastrowid
+
+    def record(self, analysis, site, camera, source='upload', elapsed_ms=None, timestamp=None):
+        with self._lock, self._conn:
+            return self._insert(analysis, site, camera, source, elapsed_ms, timestamp)
+
+    def record_many(self, records):
+        """
+        Inserta muchos resultados en una sola transacción. Cada registro es un
+        dict con las claves de record()
+        """
+        with self._lock, self._conn:
+            for record in records:
+                self._insert(
+                    record['analysis'], record['site'], record['camera'],
+                    record.get('source', 'upload'), record.get('elapsed_ms'), record.get('timestamp')
+                )
+
+    def summary(self, site=ALL, camera=ALL):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM aggregates WHERE site = ? AND camera = ?", (site, camera)
+            ).fetchone()
+
+        if row is None:
+            return {
+                'analyses': 0, 'alerts': 0, 'alerts_alta': 0, 'alerts_media': 0, 'alerts_ok': 0,
+                'persons': 0, 'avg_compliance': None, 'avg_elapsed_ms': None, 'last_ts': None,
+            }
+        return {
+            'analyses': row['analyses'],
+            'alerts': row['alerts_alta'] + row['alerts_media'],
+            'alerts_alta': row['alerts_alta'],
+            'alerts_media': row['alerts_media'],
+            'alerts_ok': row['alerts_ok'],
+            'persons': row['persons'],
+            'avg_compliance': row['compliance_sum'] / row['images_with_persons'] if row['images_with_persons'] else None,
+            'avg_elapsed_ms': row['elapsed_ms_sum'] / row['elapsed_count'] if row['elapsed_count'] else None,
+            'last_ts': row['last_ts'],
+        }
+
+    def recent(self, limit=5, site=None, camera=None):
+        """
+        Últimos análisis (servidos por los índices de fecha, obra+fecha y obra+cámara+fecha)
+        """
+        query = "SELECT * FROM analyses"
+        params = []
+        if site is not None:
+            query += " WHERE site = ?"
+            params.append(site)
+            if camera is not None:
+                query += " AND camera = ?"
+                params.append(camera)
+        query += " ORDER BY ts DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, params)]
+
+    def time_range(self, site=None):
+        """
+        (primer ts, último ts) del historial o de una obra; (None, None) si está vacío
+        """
+        query = "SELECT MIN(ts), MAX(ts) FROM analyses" + (" WHERE site = ?" if site is not None else "")
+        with self._lock:
+            return tuple(self._conn.execute(query, (site,) if site is not None else ()).fetchone())
+
+    def iter_report(self, period='day', start=None, end=None, site=None, chunk_periods=32):
+        """
+        Reporte de cumplimiento por período ('day', 'week', 'month') y obra,
+        en orden. Recorre el rango en tramos de chunk_periods períodos
+        alineados a sus límites: cada tramo es una consulta por el índice de
+        fecha (u obra + fecha) y ningún grupo queda partido entre tramos, así
+        la memoria no depende del tamaño del historial. start / end son
+        datetime locales (end excluido); por defecto, todo el historial.
+        """
+        if period not in PERIODS:
+            raise ValueError(f"Período desconocido: {period} (opciones: {', '.join(PERIODS)})")
+        if start is None or end is None:
+            first, last = self.time_range(site)
+            if first is None:
+                return
+            start = start or datetime.fromtimestamp(first)
+            end = end or datetime.fromtimestamp(last) + timedelta(seconds=1)
+        query = REPORT_SELECT.format(period=PERIODS[period], site_filter=" AND site = ?" if site is not None else "")
+
+        chunk_start = period_start(start, period)
+        while chunk_start < end:
+            chunk_end = chunk_start
+            for _ in range(chunk_periods):
+                chunk_end = next_period(chunk_end, period)
+            params = [max(chunk_start, start).timestamp(), min(chunk_end, end).timestamp()]
+            if site is not None:
+                params.append(site)
+            with self._lock:
+                rows = self._conn.execute(query, params).fetchall()
+            for row in rows:
+                row = dict(row)
+                persons = row['persons']
+                row['compliance'] = row['compliant'] / persons if persons else None
+                row['helmet_ratio'] = row['helmets'] / persons if persons else None
+                row['vest_ratio'] = row['vests'] / persons if persons else None
+                yield row
+            chunk_start = chunk_end
+
+    def iter_analyses(self, start=None, end=None, site=None, chunk_size=5000):
+        """
+        Filas del historial en orden de fecha, de a chunk_size por consulta
+        (paginación por (ts, id), sin OFFSET: cada tramo cuesta lo mismo)
+        """
+        conditions, params = ["(ts, id) > (?, ?)"], []
+        if end is not None:
+            conditions.append("ts < ?")
+            params.append(end.timestamp())
+        if site is not None:
+            conditions.append("site = ?")
+            params.append(site)
+        query = (f"SELECT {', '.join(ANALYSIS_COLUMNS)} FROM analyses WHERE {' AND '.join(conditions)} "
+                 f"ORDER BY ts, id LIMIT {int(chunk_size)}")
+        cursor = (start.timestamp() if start is not None else float('-inf'), 0)
+        while True:
+            with self._lock:
+                rows = self._conn.execute(query, [*cursor, *params]).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row)
+            cursor = (rows[-1]['ts'], rows[-1]['id'])
+            if len(rows) < chunk_size:
+                return
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
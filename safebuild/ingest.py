@@ -0,0 +1,223 @@
+import hashlib
+import io
+import threading
+from contextlib import contextmanager
+from functools import cached_property
+
+from PIL import Image
+
+# =============================================
+# INGESTA DE IMÁGENES CON MEMORIA ACOTADA
+# =============================================
+# Lado mayor de la copia reducida que comparten la vista previa y el detector.
+# Alcanza para mostrar a ancho completo (Streamlit no la vuelve a redimensionar
+# por debajo de 2 x 730 px) y para modelos de entrada 640-1280.
+DEFAULT_MAX_SIDE = 1440
+DEFAULT_SESSION_MEMORY_BYTES = 256 * 1024 * 1024
+
+
+class IngestLimitError(ValueError):
+    """
+    La imagen no entra en el presupuesto de memoria de la sesión
+    """
+
+
+class BufferReader(io.RawIOBase):
+    """
+    Archivo de solo lectura sobre un memoryview. A diferencia de
+    io.BytesIO(memoryview), no copia el buffer: PIL lee los bloques que
+    necesita directamente de él.
+    """
+
+    def __init__(self, buffer):
+        self._buffer = memoryview(buffer).cast('B')
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._buffer)
+        self._position = max(0, offset)
+        return self._position
+
+    def readinto(self, target):
+        chunk = self._buffer[self._position:self._position + len(target)]
+        target[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+
+def upload_buffer(uploaded_file):
+    """
+    Vista sin copia de los bytes de un UploadedFile de Streamlit.
+
+    UploadedFile es un BytesIO creado a partir de bytes (copy-on-write):
+    getvalue() devuelve ese mismo objeto, mientras que getbuffer() obliga a
+    BytesIO a hacerse una copia privada del archivo entero.
+    """
+    return memoryview(uploaded_file.getvalue())
+
+
+def fit_size(size, max_side):
+    """
+    Tamaño que conserva la proporción con el lado mayor <= max_side
+    """
+    width, height = size
+    scale = min(1.0, max_side / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def decode_downscaled(data, max_side=DEFAULT_MAX_SIDE):
+    """
+    Decodifica la imagen directamente a resolución reducida (modo draft de
+    JPEG: la IDCT escala 1/2, 1/4 u 1/8) y la ajusta para que su lado mayor
+    no supere max_side. Devuelve (imagen RGB, tamaño original).
+    """
+    with Image.open(BufferReader(data)) as image:
+        original_size = image.size
+        image.draft('RGB', fit_size(original_size, max_side))
+        # thumbnail reduce en el lugar; convert solo copia si hace falta
+        image.thumbnail((max_side, max_side), Image.BILINEAR)
+        # Si ya entraba, thumbnail no decodifica: hay que hacerlo antes de cerrar
+        image.load()
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+    return image, original_size
+
+
+def estimate_decode_bytes(data, max_side=DEFAULT_MAX_SIDE):
+    """
+    Memoria que ocupará la decodificación, leyendo solo la cabecera.
+    JPEG se decodifica a la escala draft más cercana a max_side; el resto
+    de los formatos se decodifica a resolución completa.
+    """
+    with Image.open(BufferReader(data)) as image:
+        width, height = image.size
+        if image.format == 'JPEG':
+            target_width, target_height = fit_size(image.size, max_side)
+            scale = 1
+            while scale < 8 and width / (scale * 2) >= target_width and height / (scale * 2) >= target_height:
+                scale *= 2
+            width, height = -(-width // scale), -(-height // scale)
+    return width * height * 3
+
+
+class IngestedImage:
+    """
+    Imagen subida lista para mostrar y analizar: los bytes originales (sin
+    copiar) y una única copia decodificada y reducida que comparten la
+    interfaz y el detector. Tiene la interfaz mínima de UploadedFile
+    (name, size, getvalue).
+    """
+
+    def __init__(self, name, data, max_side=DEFAULT_MAX_SIDE, budget=None):
+        self.name = name
+        self.data = memoryview(data)
+        self.size = self.data.nbytes
+        self.image, self.original_size = decode_downscaled(self.data, max_side)
+        # Presupuesto de la sesión dueña de la imagen: las decodificaciones
+        # adicionales (p. ej. el mosaico a mayor resolución) se descuentan de él
+        self.budget = budget
+
+    @property
+    def scale(self):
+        """
+        Factor de la copia reducida respecto del original (<= 1)
+        """
+        return self.image.width / self.original_size[0]
+
+    @cached_property
+    def digest(self):
+        """
+        Hash del contenido, calculado una vez por imagen
+        """
+        return hashlib.blake2b(self.data, digest_size=20).hexdigest()
+
+    @property
+    def nbytes(self):
+        return self.size + self.image.width * self.image.height * 3
+
+    def getvalue(self):
+        if isinstance(self.data.obj, bytes) and len(self.data.obj) == self.size:
+            return self.data.obj
+        return self.data.tobytes()
+
+
+class SessionMemoryBudget:
+    """
+    Tope de memoria de las imágenes que retiene una sesión. Cada slot
+    (p. ej. 'upload') guarda una imagen; al reemplazarla se libera la
+    anterior, de modo que el consumo por sesión no crece con los reruns.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_SESSION_MEMORY_BYTES):
+        self.max_bytes = max_bytes
+        self._images = {}
+        self._reserved = 0
+        self._lock = threading.Lock()
+
+    @property
+    def used_bytes(self):
+        return sum(image.nbytes for image in self._images.values()) + self._reserved
+
+    def _available(self):
+        return self.max_bytes - self.used_bytes
+
+    def _check(self, needed, available):
+        if needed > available:
+            raise IngestLimitError(
+                f"La imagen necesita {needed / 2**20:.0f} MB y la sesión tiene "
+                f"{available / 2**20:.0f} MB disponibles (tope {self.max_bytes / 2**20:.0f} MB)"
+            )
+
+    @contextmanager
+    def reserve(self, nbytes):
+        """
+        Descuenta del tope una decodificación transitoria mientras dura el
+        bloque (IngestLimitError si no entra)
+        """
+        with self._lock:
+            self._check(nbytes, self._available())
+            self._reserved += nbytes
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._reserved -= nbytes
+
+    def get(self, slot):
+        return self._images.get(slot)
+
+    def release(self, slot):
+        with self._lock:
+            self._images.pop(slot, None)
+
+    def release_missing(self, prefix, keep):
+        """
+        Libera los slots que empiezan con `prefix` y no están en `keep`
+        (p. ej. los archivos que el usuario quitó del uploader)
+        """
+        with self._lock:
+            for slot in [slot for slot in self._images if slot.startswith(prefix) and slot not in keep]:
+                del self._images[slot]
+
+    def ingest(self, slot, name, data, max_side=DEFAULT_MAX_SIDE):
+        """
+        Decodifica y retiene la imagen en `slot`. Antes de decodificar
+        comprueba, con la cabecera, que el pico de memoria entre en el tope.
+        """
+        with self._lock:
+            self._images.pop(slot, None)
+            self._check(memoryview(data).nbytes + estimate_decode_bytes(data, max_side), self._available())
+            image = self._images[slot] = IngestedImage(name, data, max_side, budget=self)
+            return image
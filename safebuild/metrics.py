@@ -0,0 +1,165 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# =============================================
+# MÉTRICAS DE LATENCIA
+# =============================================
+# Buckets exponenciales de 10 µs a ~21 s: registrar una muestra es un
+# bisect + dos sumas, lo bastante barato para dejarlo activo en producción
+DEFAULT_BUCKETS = tuple(0.00001 * 2 ** i for i in range(22))
+
+STAGE_SECONDS = 'safebuild_stage_seconds'
+RULE_SECONDS = 'safebuild_rule_seconds'
+
+HELP = {
+    STAGE_SECONDS: "Duración de cada etapa del análisis",
+    RULE_SECONDS: "Duración de la evaluación de reglas, por regla disparada",
+}
+
+
+def escape_label_value(value):
+    """
+    Escapa un valor de etiqueta como pide el formato de texto de Prometheus
+    (barra invertida, comillas y saltos de línea): las reglas por obra traen
+    nombres arbitrarios
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    """
+    Histograma de buckets fijos (compatible con el formato de Prometheus)
+    con estimación de percentiles por interpolación dentro del bucket
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and cumulative + bucket_count >= target:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (target - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """
+    Conjunto de histogramas identificados por (nombre, etiquetas)
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def time(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def time_stage(self, stage):
+        return self.time(STAGE_SECONDS, stage=stage)
+
+    def summary(self, name):
+        """
+        Filas {etiquetas..., count, mean_ms, p50_ms, p95_ms, p99_ms} de una métrica
+        """
+        with self._lock:
+            items = [(dict(labels), histogram) for (metric, labels), histogram in self._histograms.items()
+                     if metric == name]
+            rows = []
+            for labels, histogram in sorted(items, key=lambda item: sorted(item[0].items())):
+                rows.append({
+                    **labels,
+                    'count': histogram.count,
+                    'mean_ms': histogram.sum / histogram.count * 1000,
+                    'p50_ms': histogram.quantile(0.50) * 1000,
+                    'p95_ms': histogram.quantile(0.95) * 1000,
+                    'p99_ms': histogram.quantile(0.99) * 1000,
+                })
+        return rows
+
+    def render_prometheus(self):
+        """
+        Exporta todos los histogramas en el formato de texto de Prometheus
+        """
+        lines = []
+        with self._lock:
+            by_name = {}
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                by_name.setdefault(name, []).append((labels, histogram))
+
+            for name, series in by_name.items():
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in series:
+                    label_text = ','.join(f'{key}="{escape_label_value(value)}"' for key, value in labels)
+                    prefix = label_text + ',' if label_text else ''
+                    cumulative = 0
+                    for bound, bucket_count in zip(self.buckets, histogram.counts):
+                        cumulative += bucket_count
+                        lines.append(f'{name}_bucket{{{prefix}le="{bound:g}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram.count}')
+                    suffix = f'{{{label_text}}}' if label_text else ''
+                    lines.append(f'{name}_sum{suffix} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{suffix} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+# =============================================
+# ENDPOINT HTTP /metrics
+# =============================================
+def start_metrics_server(registry, port, host='127.0.0.1'):
+    """
+    Sirve registry.render_prometheus() en http://host:port/metrics desde un
+    hilo daemon. Devuelve el servidor (server.shutdown() lo detiene).
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='safebuild-metrics', daemon=True).start()
+    return server
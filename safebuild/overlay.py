@@ -0,0 +1,156 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from safebuild.association import associate_ppe
+from safebuild.boxes import concat_ranges
+from safebuild.detections import CLASS_IDS
+
+# =============================================
+# OVERLAY DE DETECCIONES
+# =============================================
+# Ancho máximo del overlay: hasta 2 x 730 px Streamlit muestra los bytes JPEG
+# tal cual, sin volver a decodificarlos ni redimensionarlos
+MAX_OVERLAY_WIDTH = 1460
+DEFAULT_MAX_CACHE_BYTES = 32 * 1024 * 1024
+
+# Colores por índice (ver box_colors)
+PALETTE = np.array([
+    (148, 163, 184),  # otras clases
+    (37, 99, 235),    # casco
+    (6, 182, 212),    # chaleco
+    (220, 38, 38),    # persona sin casco ni chaleco
+    (217, 119, 6),    # persona con solo uno de los dos
+    (5, 150, 105),    # persona con casco y chaleco
+], dtype=np.uint8)
+OTHER_COLOR, HELMET_COLOR, VEST_COLOR, NON_COMPLIANT_COLOR = 0, 1, 2, 3
+
+HELMET_ID = CLASS_IDS['helmet']
+VEST_ID = CLASS_IDS['safety_vest']
+
+
+def box_colors(detections):
+    """
+    Índice en PALETTE de cada caja; las personas según su cumplimiento de EPP
+    """
+    class_ids = detections.class_ids
+    colors = np.full(len(class_ids), OTHER_COLOR, dtype=np.uint8)
+    colors[class_ids == HELMET_ID] = HELMET_COLOR
+    colors[class_ids == VEST_ID] = VEST_COLOR
+    workers = associate_ppe(detections)
+    colors[workers['person']] = NON_COMPLIANT_COLOR + (workers['helmet'] >= 0).astype(np.uint8) + (workers['vest'] >= 0)
+    return colors
+
+
+def fill_rectangles(canvas, rects, colors):
+    """
+    Pinta rectángulos rellenos [x1, y1, x2, y2) (enteros, ya recortados)
+    sobre el canvas (H, W, 3) con colores RGB (N, 3), sin bucles por caja
+    """
+    widths = rects[:, 2] - rects[:, 0]
+    heights = rects[:, 3] - rects[:, 1]
+    keep = (widths > 0) & (heights > 0)
+    rects, colors, widths, heights = rects[keep], colors[keep], widths[keep], heights[keep]
+    if not len(rects):
+        return
+
+    # Cada rectángulo se parte en tramos horizontales (uno por fila): dentro
+    # de un tramo los píxeles son consecutivos en el índice plano
+    run_rows = np.repeat(rects[:, 1], heights) + concat_ranges(heights)
+    run_starts = run_rows * canvas.shape[1] + np.repeat(rects[:, 0], heights)
+    run_widths = np.repeat(widths, heights)
+    run_offsets = run_starts - (np.cumsum(run_widths) - run_widths)
+    pixels = np.arange(run_widths.sum(), dtype=np.int64) + np.repeat(run_offsets, run_widths)
+    run_colors = np.repeat(colors, heights, axis=0)
+
+    # Un canal por vez: asignaciones de un byte, mucho más rápidas que por fila RGB
+    flat = canvas.reshape(-1)
+    for channel in range(3):
+        flat[pixels * 3 + channel] = np.repeat(run_colors[:, channel], run_widths)
+
+
+def draw_boxes(canvas, boxes, colors, thickness):
+    """
+    Dibuja el contorno de cada caja (cuatro bandas de `thickness` px) con el
+    color PALETTE[colors]
+    """
+    height, width = canvas.shape[:2]
+    boxes = np.round(boxes).astype(np.int64)
+    x1, x2 = np.clip(boxes[:, 0], 0, width), np.clip(boxes[:, 2], 0, width)
+    y1, y2 = np.clip(boxes[:, 1], 0, height), np.clip(boxes[:, 3], 0, height)
+    bands = np.concatenate([
+        np.stack([x1, y1, x2, np.minimum(y1 + thickness, y2)], axis=1),  # arriba
+        np.stack([x1, np.maximum(y2 - thickness, y1), x2, y2], axis=1),  # abajo
+        np.stack([x1, y1, np.minimum(x1 + thickness, x2), y2], axis=1),  # izquierda
+        np.stack([np.maximum(x2 - thickness, x1), y1, x2, y2], axis=1),  # derecha
+    ])
+    fill_rectangles(canvas, bands, np.tile(PALETTE[colors], (4, 1)))
+
+
+def render_overlay(image, detections, scale, quality=85):
+    """
+    Dibuja las detecciones (en píxeles de la imagen original) sobre la copia
+    reducida `image`, cuyo factor respecto del original es `scale`.
+    Devuelve los bytes JPEG.
+    """
+    if image.width > MAX_OVERLAY_WIDTH:
+        factor = MAX_OVERLAY_WIDTH / image.width
+        image = image.resize((MAX_OVERLAY_WIDTH, max(1, round(image.height * factor))), Image.BILINEAR)
+        scale *= factor
+    canvas = np.array(image.convert('RGB'))
+    if len(detections):
+        thickness = max(2, round(max(canvas.shape[:2]) / 400))
+        draw_boxes(canvas, detections.boxes * scale, box_colors(detections), thickness)
+
+    buffer = io.BytesIO()
+    Image.fromarray(canvas).save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def overlay_key(image_digest, detections):
+    """
+    Clave del overlay: imagen + detecciones ya filtradas. Un cambio del
+    umbral de confianza que no altera las detecciones reutiliza el overlay.
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    hasher.update(image_digest.encode('ascii'))
+    hasher.update(np.ascontiguousarray(detections.array).tobytes())
+    return hasher.hexdigest()
+
+
+class OverlayCache:
+    """
+    LRU en memoria de overlays JPEG, acotada por bytes totales
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, image_digest, image, detections, scale):
+        key = overlay_key(image_digest, detections)
+        with self._lock:
+            jpeg = self._entries.get(key)
+            if jpeg is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return jpeg
+            self.misses += 1
+
+        jpeg = render_overlay(image, detections, scale)
+        with self._lock:
+            if key not in self._entries and len(jpeg) <= self.max_bytes:
+                self._entries[key] = jpeg
+                self._bytes += len(jpeg)
+                while self._bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= len(evicted)
+        return jpeg
@@ -0,0 +1,122 @@
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from PIL import Image
+
+from safebuild.detectors import SimulatorDetector
+from safebuild.metrics import RULE_SECONDS, STAGE_SECONDS
+
+# =============================================
+# ETAPAS DEL ANÁLISIS
+# =============================================
+# La decodificación no es una etapa del pipeline: ocurre al subir la imagen
+# (IngestedImage) o dentro del detector
+STAGES = (
+    ('detect', "Detectando EPP"),
+    ('rules', "Evaluando reglas de seguridad"),
+    ('render', "Generando visualización"),
+)
+STAGE_LABELS = dict(STAGES)
+
+
+class AnalysisJob:
+    """
+    Estado de un análisis en curso. El worker avanza las etapas y la interfaz
+    lo consulta (progress, stage_label, wait) sin bloquearse.
+    """
+
+    def __init__(self, image_file, metrics=None):
+        self.image_file = image_file
+        self.metrics = metrics
+        self.current_stage = None
+        self.completed_stages = 0
+        self.timings = {}
+        self.image_size = None
+        self.detections = None
+        self.analysis = None
+        self.error = None
+        self._done = threading.Event()
+
+    @property
+    def progress(self):
+        return self.completed_stages / len(STAGES)
+
+    @property
+    def stage_label(self):
+        if self.current_stage is None:
+            return "En cola..."
+        return STAGE_LABELS[self.current_stage]
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Espera hasta `timeout` segundos a que terminen las etapas del worker
+        """
+        return self._done.wait(timeout)
+
+    @contextmanager
+    def stage(self, name):
+        self.current_stage = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+        self.completed_stages += 1
+        if self.metrics is not None:
+            self.metrics.observe(STAGE_SECONDS, self.timings[name], stage=name)
+
+
+class AnalysisPipeline:
+    """
+    Ejecuta detect -> rules en un pool de hilos en segundo plano.
+    La etapa render la completa la interfaz al mostrar el resultado.
+    """
+
+    def __init__(self, expert_system, detector=None, cache=None, metrics=None, max_workers=2):
+        self.expert_system = expert_system
+        self.detector = detector or SimulatorDetector()
+        self.cache = cache
+        self.metrics = metrics
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='safebuild-analysis')
+
+    def submit(self, image_file, min_confidence=None, cache_key=None, expert_system=None):
+        """
+        Encola el análisis. expert_system reemplaza al del pipeline para este
+        trabajo (p. ej. las reglas de otra obra)
+        """
+        job = AnalysisJob(image_file, metrics=self.metrics)
+        self._executor.submit(self._run, job, min_confidence, cache_key, expert_system or self.expert_system)
+        return job
+
+    def _run(self, job, min_confidence, cache_key, expert_system):
+        try:
+            with job.stage('detect'):
+                job.image_size = getattr(job.image_file, 'original_size', None)
+                if job.image_size is None:
+                    with Image.open(io.BytesIO(job.image_file.getvalue())) as image:
+                        job.image_size = image.size
+                job.detections = self.detector.detect(job.image_file).filter_confidence(min_confidence)
+
+            with job.stage('rules'):
+                job.analysis = expert_system.analyze_detections(job.detections)
+            if self.metrics is not None:
+                self.metrics.observe(RULE_SECONDS, job.timings['rules'], rule=job.analysis['rule'] or 'ninguna')
+
+            # Se guarda desde el worker: si la sesión hace rerun mientras tanto,
+            # el resultado no se pierde
+            if self.cache is not None and cache_key is not None:
+                self.cache.put(cache_key, {'detections': job.detections.to_json(), 'analysis': job.analysis})
+        except Exception as e:
+            job.error = e
+        finally:
+            job._done.set()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
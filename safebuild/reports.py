@@ -0,0 +1,177 @@
+"""
+Exportación de reportes de cumplimiento desde el historial.
+
+Reporte por período (día, semana o mes) y obra, o las filas del historial
+tal cual, en CSV o Parquet. Las filas se leen y se escriben por tramos: la
+memoria no crece con el tamaño del historial.
+
+Uso:
+    python -m safebuild.reports --history safebuild_history.db --period week \\
+        --from 2024-01-01 --to 2024-04-01 [--site obra-norte] [--format parquet] -o reporte.parquet
+"""
+import argparse
+import csv
+import io
+import sys
+from datetime import datetime, timedelta
+from operator import itemgetter
+
+from safebuild.history import ANALYSIS_COLUMNS, PERIODS, REPORT_COLUMNS, HistoryStore
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow es opcional: sin él solo se exporta CSV
+    pa = pq = None
+
+# =============================================
+# FORMATOS
+# =============================================
+FORMATS = ('csv', 'parquet')
+CHUNK_ROWS = 5000
+
+
+class ExportTooLarge(ValueError):
+    """
+    La exportación supera max_rows filas (la interfaz arma el archivo en
+    memoria; para más filas, python -m safebuild.reports)
+    """
+
+# Tipos de las columnas en Parquet (todas admiten nulos)
+COLUMN_TYPES = {
+    'id': 'int64', 'ts': 'float64', 'site': 'string', 'camera': 'string', 'source': 'string',
+    'persons': 'int64', 'helmets': 'int64', 'vests': 'int64', 'compliant': 'int64',
+    'alert_level': 'string', 'alert_message': 'string', 'elapsed_ms': 'float64',
+    'period': 'string', 'analyses': 'int64', 'images_with_persons': 'int64',
+    'compliance': 'float64', 'helmet_ratio': 'float64', 'vest_ratio': 'float64',
+    'alerts_alta': 'int64', 'alerts_media': 'int64', 'alerts_ok': 'int64',
+}
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_csv(rows, columns, chunk_rows=CHUNK_ROWS):
+    """
+    Texto CSV (encabezado incluido) en trozos de chunk_rows filas
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(columns)
+    # Tuplas en el orden de las columnas: más barato que DictWriter
+    values = itemgetter(*columns)
+    for chunk in _chunks(rows, chunk_rows):
+        writer.writerows(map(values, chunk))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def write_csv(rows, columns, out, chunk_rows=CHUNK_ROWS):
+    """
+    Escribe el CSV en un archivo de texto abierto
+    """
+    for text in iter_csv(rows, columns, chunk_rows):
+        out.write(text)
+
+
+def write_parquet(rows, columns, out, chunk_rows=CHUNK_ROWS):
+    """
+    Escribe un Parquet con un grupo de filas por cada chunk_rows filas
+    (out es una ruta o un archivo binario abierto)
+    """
+    if pq is None:
+        raise RuntimeError("Para exportar a Parquet se necesita pyarrow (pip install pyarrow)")
+    schema = pa.schema([(column, COLUMN_TYPES[column]) for column in columns])
+    with pq.ParquetWriter(out, schema) as writer:
+        for chunk in _chunks(rows, chunk_rows):
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+
+
+def export(store, out, kind='report', fmt='csv', period='day', start=None, end=None, site=None,
+           chunk_rows=CHUNK_ROWS, max_rows=None):
+    """
+    Exporta el reporte por período ('report') o las filas del historial
+    ('analyses'). `out` es un archivo de texto para CSV y binario (o una
+    ruta) para Parquet. Devuelve la cantidad de filas escritas. Con max_rows,
+    lanza ExportTooLarge antes de escribir la fila max_rows + 1.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato desconocido: {fmt} (opciones: {', '.join(FORMATS)})")
+    if kind == 'report':
+        rows, columns = store.iter_report(period, start=start, end=end, site=site), REPORT_COLUMNS
+    elif kind == 'analyses':
+        rows, columns = store.iter_analyses(start=start, end=end, site=site, chunk_size=chunk_rows), ANALYSIS_COLUMNS
+    else:
+        raise ValueError(f"Tipo de exportación desconocido: {kind} (opciones: report, analyses)")
+
+    written = 0
+
+    def counted(rows):
+        nonlocal written
+        for row in rows:
+            if max_rows is not None and written >= max_rows:
+                raise ExportTooLarge(f"La exportación supera {max_rows} filas")
+            written += 1
+            yield row
+
+    if fmt == 'csv':
+        write_csv(counted(rows), columns, out, chunk_rows)
+    else:
+        write_parquet(counted(rows), columns, out, chunk_rows)
+    return written
+
+
+def _parse_date(text):
+    return datetime.strptime(text, '%Y-%m-%d')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reportes de cumplimiento desde el historial")
+    parser.add_argument('--history', required=True, help="Base SQLite del historial")
+    parser.add_argument('--output', '-o', default='-', help="Archivo de salida (- para la salida estándar, solo CSV)")
+    parser.add_argument('--format', '-f', default=None, choices=FORMATS,
+                        help="Formato (por defecto, según la extensión de la salida)")
+    parser.add_argument('--period', '-p', default='day', choices=sorted(PERIODS), help="Período del reporte")
+    parser.add_argument('--rows', action='store_true', help="Exporta las filas del historial en lugar del reporte")
+    parser.add_argument('--site', help="Solo esta obra")
+    parser.add_argument('--from', dest='start', type=_parse_date, help="Fecha inicial AAAA-MM-DD (incluida)")
+    parser.add_argument('--to', dest='end', type=_parse_date, help="Fecha final AAAA-MM-DD (incluida)")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('parquet' if args.output.lower().endswith('.parquet') else 'csv')
+    if fmt == 'parquet' and pq is None:
+        parser.error("para exportar a Parquet se necesita pyarrow (pip install pyarrow)")
+    if fmt == 'parquet' and args.output == '-':
+        parser.error("Parquet necesita un archivo de salida (--output)")
+
+    store = HistoryStore(args.history)
+    options = {
+        'kind': 'analyses' if args.rows else 'report', 'fmt': fmt, 'period': args.period, 'site': args.site,
+        'start': args.start, 'end': args.end + timedelta(days=1) if args.end else None,
+    }
+    try:
+        if fmt == 'parquet':
+            written = export(store, args.output, **options)
+        elif args.output == '-':
+            written = export(store, sys.stdout, **options)
+        else:
+            with open(args.output, 'w', encoding='utf-8', newline='') as out:
+                written = export(store, out, **options)
+    finally:
+        store.close()
+    print(f"Filas exportadas: {written}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import yaml
+    PARSE_ERRORS = (ValueError, yaml.YAMLError)
+except ImportError:  # PyYAML es opcional: sin él solo se aceptan reglas en JSON
+    yaml = None
+    PARSE_ERRORS = (ValueError,)
+
+# =============================================
+# REGLAS DECLARATIVAS
+# =============================================
+# Un archivo de reglas (YAML o JSON) tiene la forma:
+#
+#   all_matches: false          # true: informar todas las reglas que se cumplen
+#   rules:
+#     - name: no_helmet_partial
+#       level: ALTA             # OK | MEDIA | ALTA
+#       message: "..."
+#       action: "..."
+#       when: {persons: {gt: 0}, non_compliance_ratio: {gt: 0.1}}
+#
+# `when` es un mapa de condiciones que deben cumplirse todas, o una lista de
+# mapas (basta con que se cumpla uno). Cada condición compara una métrica con
+# un número o con otra métrica. Las reglas se evalúan en orden.
+#
+# Cada regla se compila una sola vez a una expresión con & / | que funciona
+# igual con enteros (un frame) y con columnas de NumPy (lote): la tabla de
+# decisión es la matriz reglas x frames de match_rules_batch.
+
+# Métrica -> expresión sobre las estadísticas del frame
+METRIC_EXPRESSIONS = {
+    'persons': "s['persons']",
+    'helmets': "s['helmets']",
+    'vests': "s['vests']",
+    'compliant': "s['compliant']",
+    'missing_helmets': "(s['persons'] - s['helmets'])",
+    'missing_vests': "(s['persons'] - s['vests'])",
+    'non_compliant': "(s['persons'] - s['compliant'])",
+}
+# Proporciones sobre el total de personas. Se comparan sin dividir
+# (num op k * personas), así que sin personas valen como 0 <= k
+RATIO_METRICS = {
+    'helmet_ratio': 'helmets',
+    'vest_ratio': 'vests',
+    'compliance_ratio': 'compliant',
+    'non_compliance_ratio': 'non_compliant',
+}
+OPERATORS = {'eq': '==', 'ne': '!=', 'lt': '<', 'le': '<=', 'gt': '>', 'ge': '>='}
+LEVELS = ("OK", "MEDIA", "ALTA")
+RULE_EXTENSIONS = ('.yaml', '.yml', '.json')
+# Obras cuya búsqueda de archivo se recuerda (las menos consultadas se olvidan)
+DEFAULT_MAX_SITES = 1024
+
+DEFAULT_RULES = {
+    'all_matches': False,
+    'rules': [
+        {
+            'name': 'no_helmet_critical',
+            'when': {'persons': {'gt': 0}, 'helmets': {'eq': 0}},
+            'message': "CRÍTICO: Ningún trabajador usa casco de seguridad",
+            'level': "ALTA",
+            'action': "DETENER actividades inmediatamente y notificar al supervisor de seguridad",
+        },
+        {
+            'name': 'no_helmet_partial',
+            'when': {'persons': {'gt': 0}, 'helmets': {'lt': 'persons'}},
+            'message': "ALTA: Trabajadores detectados sin casco de seguridad",
+            'level': "ALTA",
+            'action': "Aislar el área y proveer EPP inmediatamente",
+        },
+        {
+            'name': 'no_vest_critical',
+            'when': {'persons': {'gt': 0}, 'vests': {'eq': 0}},
+            'message': "MEDIA: Ningún trabajador usa chaleco reflectante",
+            'level': "MEDIA",
+            'action': "Notificar al supervisor y proveer chalecos de seguridad",
+        },
+        {
+            'name': 'no_vest_partial',
+            'when': {'persons': {'gt': 0}, 'vests': {'lt': 'persons'}},
+            'message': "MEDIA: Trabajadores detectados sin chaleco reflectante",
+            'level': "MEDIA",
+            'action': "Recordar uso obligatorio de chaleco en reunión de seguridad",
+        },
+        {
+            'name': 'proper_equipment',
+            'when': {'persons': {'gt': 0}, 'helmets': {'ge': 'persons'}, 'vests': {'ge': 'persons'}},
+            'message': "OK: Todo el personal cuenta con Equipo de Protección Personal completo",
+            'level': "OK",
+            'action': "Continuar monitoreo y mantener los estándares de seguridad",
+        },
+        {
+            'name': 'no_persons',
+            'when': {'persons': {'eq': 0}},
+            'message': "OK: No se detectaron trabajadores en el área analizada",
+            'level': "OK",
+            'action': "Continuar con el monitoreo rutinario del área",
+        },
+    ],
+}
+
+
+class RuleFileError(ValueError):
+    """
+    Archivo de reglas ilegible o con una regla inválida
+    """
+
+
+class RuleSet:
+    """
+    Reglas compiladas: {nombre: {'condition', 'message', 'level', 'action'}}
+    en orden de evaluación, más el modo de coincidencia
+    """
+
+    def __init__(self, rules, all_matches=False, source=None, fingerprint=None):
+        self.rules = rules
+        self.all_matches = all_matches
+        self.source = source
+        self.fingerprint = fingerprint
+
+
+def _compile_comparison(rule_name, metric, comparison):
+    if not isinstance(comparison, dict) or not comparison:
+        raise RuleFileError(f"Regla '{rule_name}': la condición de '{metric}' debe ser un mapa operador: valor")
+    terms = []
+    for operator, value in comparison.items():
+        if operator not in OPERATORS:
+            raise RuleFileError(f"Regla '{rule_name}': operador desconocido '{operator}' "
+                                f"(opciones: {', '.join(OPERATORS)})")
+        if isinstance(value, str):
+            if value not in METRIC_EXPRESSIONS:
+                raise RuleFileError(f"Regla '{rule_name}': métrica desconocida '{value}'")
+            right = METRIC_EXPRESSIONS[value]
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+            right = repr(value)
+        else:
+            raise RuleFileError(f"Regla '{rule_name}': '{metric}' se compara con un número o una métrica")
+
+        if metric in RATIO_METRICS:
+            if isinstance(value, str):
+                raise RuleFileError(f"Regla '{rule_name}': '{metric}' solo se compara con números")
+            left = METRIC_EXPRESSIONS[RATIO_METRICS[metric]]
+            right = f"{right} * s['persons']"
+        elif metric in METRIC_EXPRESSIONS:
+            left = METRIC_EXPRESSIONS[metric]
+        else:
+            known = ', '.join(list(METRIC_EXPRESSIONS) + list(RATIO_METRICS))
+            raise RuleFileError(f"Regla '{rule_name}': métrica desconocida '{metric}' (opciones: {known})")
+        terms.append(f"({left} {OPERATORS[operator]} {right})")
+    return terms
+
+
+def _compile_condition(rule_name, when):
+    """
+    Expresión Python de la condición (solo métricas, operadores y números
+    validados: nunca se evalúa texto del archivo)
+    """
+    alternatives = when if isinstance(when, list) else [when]
+    if not alternatives:
+        raise RuleFileError(f"Regla '{rule_name}': 'when' no puede estar vacío")
+    clauses = []
+    for alternative in alternatives:
+        if not isinstance(alternative, dict) or not alternative:
+            raise RuleFileError(f"Regla '{rule_name}': cada alternativa de 'when' es un mapa de condiciones")
+        terms = [term for metric, comparison in alternative.items()
+                 for term in _compile_comparison(rule_name, metric, comparison)]
+        clauses.append('(' + ' & '.join(terms) + ')')
+    return ' | '.join(clauses)
+
+
+def compile_rules(spec, source=None):
+    """
+    Valida y compila una especificación de reglas (el contenido del archivo)
+    """
+    if not isinstance(spec, dict) or not isinstance(spec.get('rules'), list) or not spec['rules']:
+        raise RuleFileError("El archivo de reglas debe tener una lista 'rules' no vacía")
+
+    rules = {}
+    for position, rule in enumerate(spec['rules'], start=1):
+        if not isinstance(rule, dict):
+            raise RuleFileError(f"La regla {position} debe ser un mapa")
+        name = rule.get('name') or f"regla_{position}"
+        if name in rules:
+            raise RuleFileError(f"Regla duplicada: '{name}'")
+        level = rule.get('level', "OK")
+        if level not in LEVELS:
+            raise RuleFileError(f"Regla '{name}': nivel desconocido '{level}' (opciones: {', '.join(LEVELS)})")
+        if 'when' not in rule:
+            raise RuleFileError(f"Regla '{name}': falta 'when'")
+
+        expression = _compile_condition(name, rule['when'])
+        rules[name] = {
+            'condition': eval(f"lambda s: {expression}", {'__builtins__': {}}),
+            'message': str(rule.get('message', name)),
+            'level': level,
+            'action': str(rule.get('action', "")),
+            'expression': expression,
+        }
+
+    canonical = json.dumps(spec, sort_keys=True, ensure_ascii=False, default=str)
+    fingerprint = hashlib.blake2b(canonical.encode('utf-8'), digest_size=8).hexdigest()
+    return RuleSet(rules, all_matches=bool(spec.get('all_matches', False)), source=source, fingerprint=fingerprint)
+
+
+# Reglas de fábrica compiladas una sola vez
+BUILTIN_RULES = compile_rules(DEFAULT_RULES)
+
+
+def load_rule_file(path):
+    """
+    Lee y compila un archivo de reglas (.yaml / .yml requieren PyYAML)
+    """
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    try:
+        if path.lower().endswith('.json'):
+            spec = json.loads(text)
+        elif yaml is None:
+            raise RuleFileError(f"Para leer {os.path.basename(path)} hace falta PyYAML (pip install pyyaml)")
+        else:
+            spec = yaml.safe_load(text)
+    except RuleFileError:
+        raise
+    except PARSE_ERRORS as e:
+        raise RuleFileError(f"{os.path.basename(path)}: {e}") from e
+    return compile_rules(spec, source=path)
+
+
+# =============================================
+# RECARGA EN CALIENTE
+# =============================================
+class RuleBook:
+    """
+    Reglas de un archivo que se recompilan cuando cambia (mtime / tamaño).
+    El archivo se consulta a lo sumo una vez cada check_interval segundos;
+    si la nueva versión es inválida se conservan las reglas anteriores y el
+    problema queda en `error`.
+    """
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.error = None
+        self._stamp = None
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+        self._ruleset = BUILTIN_RULES
+        self._reload()
+
+    def _reload(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError as e:
+            self.error = f"No se pudo leer {self.path}: {e}"
+            return
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return
+        self._stamp = stamp
+        try:
+            self._ruleset = load_rule_file(self.path)
+            self.error = None
+        except (OSError, RuleFileError) as e:
+            self.error = str(e)
+
+    def current(self):
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            with self._lock:
+                if now - self._checked_at >= self.check_interval:
+                    self._checked_at = now
+                    self._reload()
+        return self._ruleset
+
+
+class RuleRegistry:
+    """
+    Reglas por obra desde un directorio: <obra>.yaml|.yml|.json y, para las
+    obras sin archivo propio, default.*; sin ninguno, las reglas de fábrica.
+    Buscar las reglas de una obra es un acceso a diccionario más, a lo sumo
+    cada check_interval segundos, un stat: el costo no depende de cuántas
+    obras haya cargadas. Las obras que comparten default.* comparten RuleBook.
+
+    El nombre de la obra llega de afuera (la interfaz, la URL del servicio):
+    si no es un nombre de archivo válido dentro del directorio (separadores,
+    '..') no se busca su archivo y la obra usa default.*.
+    """
+
+    def __init__(self, directory=None, check_interval=1.0, max_sites=DEFAULT_MAX_SITES):
+        self.directory = directory
+        self.check_interval = check_interval
+        self.max_sites = max_sites
+        # obra -> (archivo o None, momento de la búsqueda), de la búsqueda más vieja a la más reciente
+        self._paths = OrderedDict()
+        # archivo -> RuleBook
+        self._books = {}
+        self._lock = threading.Lock()
+
+    def _site_file(self, site, extension):
+        """
+        Ruta del archivo de la obra, o None si el nombre saldría del directorio
+        """
+        if not site or site in ('.', '..') or '\0' in site or any(
+                separator and separator in site for separator in (os.sep, os.altsep)):
+            return None
+        return os.path.join(self.directory, f"{site}{extension}")
+
+    def _find_file(self, site):
+        if not self.directory:
+            return None
+        for name in (site, 'default'):
+            for extension in RULE_EXTENSIONS:
+                path = self._site_file(name, extension)
+                if path is not None and os.path.isfile(path):
+                    return path
+        return None
+
+    def book(self, site):
+        """
+        RuleBook de la obra (None si usa las reglas de fábrica). Los archivos
+        que aparecen o desaparecen se detectan con el mismo intervalo.
+        """
+        now = time.monotonic()
+        entry = self._paths.get(site)
+        if entry is None or now - entry[1] >= self.check_interval:
+            with self._lock:
+                path = self._find_file(site)
+                if path is not None and path not in self._books:
+                    self._books[path] = RuleBook(path, self.check_interval)
+                # Cada obra activa se vuelve a buscar cada check_interval: así
+                # queda al final y se descartan las que ya no se consultan
+                entry = self._paths[site] = (path, now)
+                self._paths.move_to_end(site)
+                while len(self._paths) > self.max_sites:
+                    self._paths.popitem(last=False)
+        return self._books[entry[0]] if entry[0] is not None else None
+
+    def rules_for(self, site):
+        book = self.book(site)
+        return BUILTIN_RULES if book is None else book.current()
@@ -0,0 +1,625 @@
+"""
+Servicio de ingesta de frames, independiente de la interfaz Streamlit.
+
+Las cámaras envían cada frame por HTTP; el servicio los reparte entre varios
+procesos de análisis y registra los resultados en el historial. El tablero
+solo lee su estado (/status) y el historial compartido.
+
+    POST /frames?site=OBRA&camera=CAMARA[&source=...&ts=...]   (cuerpo: JPEG/PNG)
+        202 aceptado · 429 sobrecargado (reintentar tras Retry-After) · 413 frame demasiado grande
+        411 falta Content-Length · 503 el proceso de la cámara se detuvo tras demasiados reinicios
+    GET  /status    estado de procesos, colas y cámaras (JSON)
+    GET  /metrics   latencias por etapa en formato Prometheus
+
+Uso:
+    python -m safebuild.service --workers 4 --history safebuild_history.db [--port 8500]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from safebuild.alerts import AlertDispatcher, create_sinks
+from safebuild.cli import add_detector_arguments, detector_options
+from safebuild.detection import MemoryImageFile
+from safebuild.detectors import create_detector
+from safebuild.expert_system import SafetyExpertSystem
+from safebuild.history import HistoryStore, compliant_count
+from safebuild.metrics import RULE_SECONDS, STAGE_SECONDS, MetricsRegistry
+from safebuild.rules import BUILTIN_RULES, RuleBook, RuleRegistry
+from safebuild.tracking import WorkerTracker
+from safebuild.video import AlertDebouncer
+
+# =============================================
+# CONFIGURACIÓN
+# =============================================
+DEFAULT_PORT = 8500
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_MAX_INFLIGHT = 8
+DEFAULT_MAX_FRAME_BYTES = 16 * 1024 * 1024
+# Un frame rechazado se descarta del socket en trozos de este tamaño (nunca entero en memoria)
+DISCARD_CHUNK_BYTES = 64 * 1024
+# El historial se escribe en lotes: como mucho cada tantos segundos o registros
+HISTORY_FLUSH_S = 1.0
+HISTORY_FLUSH_ROWS = 256
+RETRY_AFTER_S = 1
+# Un proceso que muere se reinicia con espera exponencial (0.5, 1, 2... hasta 30 s);
+# tras DEFAULT_MAX_RESTARTS reinicios se da por perdido y sus cámaras reciben 503
+RESTART_BACKOFF_S = 0.5
+RESTART_BACKOFF_MAX_S = 30.0
+DEFAULT_MAX_RESTARTS = 5
+
+
+class ServiceOverloaded(RuntimeError):
+    """
+    El servicio rechazó el frame por sobrecarga: la cola del proceso está
+    llena o la cámara ya tiene demasiados frames en vuelo
+    """
+
+    def __init__(self, message, retry_after=RETRY_AFTER_S):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class WorkerUnavailable(RuntimeError):
+    """
+    El proceso que atiende a la cámara se detuvo tras agotar sus reinicios:
+    reintentar no sirve hasta reiniciar el servicio (HTTP 503)
+    """
+
+
+def camera_partition(site, camera, workers):
+    """
+    Proceso que atiende a la cámara. Es estable (no depende de PYTHONHASHSEED):
+    todos los frames de una cámara llegan en orden al mismo proceso, que
+    guarda su antirrebote y su seguimiento de trabajadores.
+    """
+    return zlib.crc32(f"{site}/{camera}".encode('utf-8')) % workers
+
+
+# =============================================
+# PROCESOS DE ANÁLISIS
+# =============================================
+def _rules_source(rules_path):
+    """
+    rules_for(obra) según --rules: directorio por obra, archivo único
+    (ambos con recarga en caliente) o las reglas de fábrica
+    """
+    if rules_path is None:
+        return lambda site: BUILTIN_RULES
+    if os.path.isdir(rules_path):
+        return RuleRegistry(rules_path).rules_for
+    book = RuleBook(rules_path)
+    return lambda site: book.current()
+
+
+def _worker_main(index, tasks, results, detector_options, rules_path, min_confidence):
+    # El modelo se carga una sola vez por proceso
+    detector = create_detector(**detector_options)
+    rules_for = _rules_source(rules_path)
+    expert_systems = {}
+    cameras = {}
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        site, camera, source, timestamp, data = task
+        start = time.perf_counter()
+        try:
+            ruleset = rules_for(site)
+            expert_system = expert_systems.get(id(ruleset))
+            if expert_system is None or expert_system.ruleset is not ruleset:
+                expert_system = expert_systems[id(ruleset)] = SafetyExpertSystem(ruleset)
+            detections = detector.detect(MemoryImageFile(source, data)).filter_confidence(min_confidence)
+            rules_start = time.perf_counter()
+            analysis = expert_system.analyze_detections(detections)
+        except Exception as e:  # un frame ilegible no debe tumbar el proceso
+            results.put({'worker': index, 'site': site, 'camera': camera, 'source': source,
+                         'timestamp': timestamp, 'error': f"{type(e).__name__}: {e}"})
+            continue
+        rules_end = time.perf_counter()
+
+        state = cameras.get((site, camera))
+        if state is None:
+            state = cameras[(site, camera)] = (AlertDebouncer(), WorkerTracker())
+        debouncer, tracker = state
+        event = debouncer.update(analysis, timestamp)
+        worker_events = tracker.update(analysis['workers'], timestamp)
+
+        results.put({
+            'worker': index,
+            'site': site,
+            'camera': camera,
+            'source': source,
+            'timestamp': timestamp,
+            'analysis': analysis,
+            'confirmed_level': debouncer.level,
+            'event': event,
+            'worker_events': worker_events,
+            'tracks': len(tracker.active_tracks()),
+            'open_episodes': sum(len(track.episodes) for track in tracker.tracks),
+            'detect_s': rules_start - start,
+            'rules_s': rules_end - rules_start,
+            'elapsed_ms': round((rules_end - start) * 1000, 3),
+        })
+
+
+# =============================================
+# SERVICIO
+# =============================================
+class IngestService:
+    """
+    Reparte los frames entre `workers` procesos, uno por partición de
+    cámaras (camera_partition), cada uno con su cola acotada. Encolar nunca
+    bloquea: si la cola del proceso está llena o la cámara tiene
+    max_inflight_per_camera frames sin terminar, submit lanza
+    ServiceOverloaded y la cámara debe reintentar más tarde (HTTP 429).
+    Un hilo recolector toma los resultados, actualiza el estado por cámara,
+    escribe el historial en lotes, despacha las alertas confirmadas y
+    reinicia los procesos que mueran.
+    """
+
+    def __init__(self, workers=None, queue_size=DEFAULT_QUEUE_SIZE, max_inflight_per_camera=DEFAULT_MAX_INFLIGHT,
+                 detector_options=None, rules_path=None, min_confidence=None, history=None,
+                 alert_dispatcher=None, metrics=None, max_restarts=DEFAULT_MAX_RESTARTS):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.max_inflight_per_camera = max_inflight_per_camera
+        self.detector_options = detector_options or {}
+        self.rules_path = rules_path
+        self.min_confidence = min_confidence
+        self.history = history
+        self.alert_dispatcher = alert_dispatcher
+        self.metrics = metrics or MetricsRegistry()
+        self.max_restarts = max_restarts
+        self.stats = {'accepted': 0, 'rejected': 0, 'processed': 0, 'errors': 0, 'restarts': 0}
+        self.started_at = time.time()
+        # spawn: los procesos no heredan los hilos (HTTP, alertas) ni la conexión SQLite
+        self._context = multiprocessing.get_context('spawn')
+        self._results = self._context.Queue()
+        self._tasks = [self._context.Queue(maxsize=queue_size) for _ in range(self.workers)]
+        self._processes = [None] * self.workers
+        self._inflight = [0] * self.workers
+        # Reinicios por proceso, momento del próximo reinicio (None: no hay uno
+        # pendiente) y procesos abandonados tras max_restarts
+        self._restarts = [0] * self.workers
+        self._restart_at = [None] * self.workers
+        self._failed = [False] * self.workers
+        self._cameras = {}
+        self._lock = threading.Lock()
+        self._closing = False
+        self._history_rows = []
+        self._history_flushed_at = time.monotonic()
+        for index in range(self.workers):
+            self._start_worker(index)
+        self._collector = threading.Thread(target=self._collect, name='safebuild-ingest', daemon=True)
+        self._collector.start()
+
+    def _start_worker(self, index):
+        process = self._context.Process(
+            target=_worker_main, name=f'safebuild-worker-{index}', daemon=True,
+            args=(index, self._tasks[index], self._results, self.detector_options, self.rules_path,
+                  self.min_confidence)
+        )
+        process.start()
+        self._processes[index] = process
+
+    def _camera(self, site, camera):
+        state = self._cameras.get((site, camera))
+        if state is None:
+            state = self._cameras[(site, camera)] = {
+                'site': site, 'camera': camera, 'worker': camera_partition(site, camera, self.workers),
+                'frames': 0, 'errors': 0, 'rejected': 0, 'inflight': 0, 'last_ts': None,
+                'alert_level': None, 'confirmed_level': "OK", 'persons': 0, 'compliant': 0,
+                'tracks': 0, 'open_episodes': 0, 'last_error': None,
+            }
+        return state
+
+    def _admit(self, site, camera):
+        # Con self._lock tomado: rechaza el frame si no hay capacidad para la cámara
+        if self._closing:
+            raise ServiceOverloaded("El servicio se está deteniendo")
+        state = self._camera(site, camera)
+        index = state['worker']
+        if state['inflight'] >= self.max_inflight_per_camera:
+            error = ServiceOverloaded(f"La cámara {site}/{camera} tiene {state['inflight']} frames en vuelo")
+        elif self._failed[index]:
+            error = WorkerUnavailable(f"El proceso {index} se detuvo tras {self._restarts[index]} reinicios")
+        elif self._tasks[index].full():
+            error = ServiceOverloaded(f"La cola del proceso {index} está llena")
+        else:
+            return state, index
+        state['rejected'] += 1
+        self.stats['rejected'] += 1
+        raise error
+
+    def check_capacity(self, site, camera):
+        """
+        Lanza ServiceOverloaded o WorkerUnavailable si submit rechazaría ahora
+        un frame de la cámara. El endpoint HTTP lo consulta antes de leer el
+        cuerpo: un servicio sobrecargado no recibe frames que va a descartar.
+        """
+        with self._lock:
+            self._admit(site, camera)
+
+    def submit(self, site, camera, data, source=None, timestamp=None):
+        """
+        Encola un frame sin bloquear. Devuelve el proceso que lo atenderá.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            state, index = self._admit(site, camera)
+            try:
+                self._tasks[index].put_nowait((site, camera, source or f"{camera}@{timestamp:.3f}", timestamp, data))
+            except queue.Full:
+                state['rejected'] += 1
+                self.stats['rejected'] += 1
+                raise ServiceOverloaded(f"La cola del proceso {index} está llena") from None
+            state['inflight'] += 1
+            self._inflight[index] += 1
+            self.stats['accepted'] += 1
+        return index
+
+    def _collect(self):
+        while True:
+            try:
+                result = self._results.get(timeout=0.5)
+            except queue.Empty:
+                result = None
+            if result is not None:
+                self._record(result)
+            # Con carga se escribe en lotes; sin resultados pendientes, enseguida
+            if self._history_rows and (result is None or len(self._history_rows) >= HISTORY_FLUSH_ROWS
+                                       or time.monotonic() - self._history_flushed_at >= HISTORY_FLUSH_S):
+                self._flush_history()
+            if result is None:
+                if self._closing and not any(self._inflight):
+                    return
+                self._check_workers()
+
+    def _record(self, result):
+        with self._lock:
+            state = self._camera(result['site'], result['camera'])
+            state['inflight'] = max(state['inflight'] - 1, 0)
+            self._inflight[result['worker']] = max(self._inflight[result['worker']] - 1, 0)
+            if 'error' in result:
+                state['errors'] += 1
+                state['last_error'] = result['error']
+                self.stats['errors'] += 1
+                return
+            analysis = result['analysis']
+            statistics = analysis['statistics']
+            state.update({
+                'frames': state['frames'] + 1,
+                'last_ts': result['timestamp'],
+                'alert_level': analysis['alert_level'],
+                'confirmed_level': result['confirmed_level'],
+                'persons': statistics['persons'],
+                'compliant': compliant_count(statistics),
+                'tracks': result['tracks'],
+                'open_episodes': result['open_episodes'],
+            })
+            self.stats['processed'] += 1
+
+        self.metrics.observe(STAGE_SECONDS, result['detect_s'], stage='detect')
+        self.metrics.observe(STAGE_SECONDS, result['rules_s'], stage='rules')
+        self.metrics.observe(RULE_SECONDS, result['rules_s'], rule=analysis['rule'] or 'ninguna')
+        if self.history is not None:
+            self._history_rows.append({
+                'analysis': analysis, 'site': result['site'], 'camera': result['camera'],
+                'source': result['source'], 'elapsed_ms': result['elapsed_ms'], 'timestamp': result['timestamp'],
+            })
+        if self.alert_dispatcher is not None:
+            site, camera, source = result['site'], result['camera'], result['source']
+            # Igual que en el modo video: solo los cambios confirmados y el inicio de cada episodio
+            if result['event'] is not None:
+                self.alert_dispatcher.submit_analysis({**result['event'], 'rule': analysis['rule']},
+                                                      site, camera, source=source, timestamp=result['timestamp'])
+            for worker_event in result['worker_events']:
+                if worker_event['kind'] == 'start':
+                    self.alert_dispatcher.submit_analysis(
+                        {**worker_event, 'rule': f"trabajador-{worker_event['track_id']}-{worker_event['item']}"},
+                        site, camera, source=source, timestamp=result['timestamp']
+                    )
+
+    def _flush_history(self):
+        rows, self._history_rows = self._history_rows, []
+        self._history_flushed_at = time.monotonic()
+        self.history.record_many(rows)
+
+    def _check_workers(self):
+        now = time.monotonic()
+        for index, process in enumerate(self._processes):
+            if self._closing or self._failed[index] or process.is_alive():
+                continue
+            if self._restart_at[index] is None:
+                # Recién muerto: los frames que tenía en vuelo se pierden y sus cámaras
+                # vuelven a aceptar. La cola se reemplaza: un proceso que muere dentro
+                # de get() la deja bloqueada. Lo que llegue durante la espera se
+                # atiende al reiniciar.
+                with self._lock:
+                    self._tasks[index] = self._context.Queue(maxsize=self.queue_size)
+                    self._inflight[index] = 0
+                    for state in self._cameras.values():
+                        if state['worker'] == index:
+                            state['inflight'] = 0
+                    if self._restarts[index] >= self.max_restarts:
+                        self._failed[index] = True
+                        continue
+                    delay = min(RESTART_BACKOFF_S * 2 ** self._restarts[index], RESTART_BACKOFF_MAX_S)
+                    self._restart_at[index] = now + delay
+            if now < self._restart_at[index]:
+                continue
+            with self._lock:
+                self._restart_at[index] = None
+                self._restarts[index] += 1
+                self.stats['restarts'] += 1
+            self._start_worker(index)
+
+    def status(self):
+        """
+        Estado serializable: totales, procesos y cámaras
+        """
+        with self._lock:
+            return {
+                **self.stats,
+                'uptime_s': round(time.time() - self.started_at, 1),
+                'queue_size': self.queue_size,
+                'max_inflight_per_camera': self.max_inflight_per_camera,
+                'workers': [
+                    {'index': index, 'pid': process.pid, 'alive': process.is_alive(), 'inflight': inflight,
+                     'restarts': self._restarts[index], 'failed': self._failed[index]}
+                    for index, (process, inflight) in enumerate(zip(self._processes, self._inflight))
+                ],
+                'cameras': sorted((dict(state) for state in self._cameras.values()),
+                                  key=lambda state: (state['site'], state['camera'])),
+            }
+
+    def close(self, timeout=30.0):
+        """
+        Deja de aceptar frames, termina los encolados y detiene los procesos
+        """
+        with self._lock:
+            self._closing = True
+        for tasks, process in zip(self._tasks, self._processes):
+            try:
+                tasks.put(None, timeout=timeout)
+            except queue.Full:
+                # Cola llena y el proceso no la vacía (muerto o colgado): no hay cómo avisarle
+                process.terminate()
+        self._collector.join(timeout)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        if self._collector.is_alive():
+            # Los frames de los procesos terminados no llegarán: el recolector
+            # vacía lo que quede en la cola de resultados y termina
+            with self._lock:
+                self._inflight = [0] * self.workers
+            self._collector.join(timeout)
+        # El historial lo escribe el recolector; solo si ya terminó se escribe aquí
+        if not self._collector.is_alive() and self._history_rows:
+            self._flush_history()
+
+
+# =============================================
+# ENDPOINT HTTP
+# =============================================
+def start_ingest_server(service, port=DEFAULT_PORT, host='127.0.0.1', max_frame_bytes=DEFAULT_MAX_FRAME_BYTES):
+    """
+    Sirve el servicio por HTTP (ver el encabezado del módulo). Devuelve el
+    servidor; serve_forever() queda a cargo de quien lo llama.
+    """
+
+    class IngestHandler(BaseHTTPRequestHandler):
+        # HTTP/1.1 para atender Expect: 100-continue (ver handle_expect_100)
+        protocol_version = 'HTTP/1.1'
+
+        def _send_json(self, status, payload, headers=()):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split('?')[0]
+            if path == '/status':
+                self._send_json(200, service.status())
+            elif path == '/metrics':
+                body = service.metrics.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                self.send_error(404)
+
+        def _reject_without_capacity(self, params, length=0):
+            # Responde 429 / 503 sin guardar el cuerpo si el servicio no puede aceptar el frame
+            try:
+                service.check_capacity(params['site'], params['camera'])
+            except ServiceOverloaded as e:
+                self.close_connection = True
+                self._send_json(429, {'error': str(e)}, headers=[('Retry-After', str(e.retry_after))])
+            except WorkerUnavailable as e:
+                self.close_connection = True
+                self._send_json(503, {'error': str(e)})
+            else:
+                return False
+            # La respuesta ya salió; el cuerpo se descarta en trozos para que el cliente
+            # termine de enviarlo y la lea (cerrar con datos sin leer la perdería)
+            while length > 0:
+                chunk = self.rfile.read(min(length, DISCARD_CHUNK_BYTES))
+                if not chunk:
+                    break
+                length -= len(chunk)
+            return True
+
+        def handle_expect_100(self):
+            # Las cámaras que piden 100-continue ni siquiera envían un frame que se va a rechazar
+            params = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query))
+            if (self.command == 'POST' and params.get('site') and params.get('camera')
+                    and self._reject_without_capacity(params)):
+                return False
+            return super().handle_expect_100()
+
+        def do_POST(self):
+            url = urllib.parse.urlsplit(self.path)
+            if url.path != '/frames':
+                self.send_error(404)
+                return
+            params = dict(urllib.parse.parse_qsl(url.query))
+            if self.headers.get('Content-Length') is None:
+                self.close_connection = True
+                self._send_json(411, {'error': "Se requiere Content-Length"})
+                return
+            try:
+                length = int(self.headers['Content-Length'])
+            except ValueError:
+                length = -1
+            if length < 0:
+                self.close_connection = True
+                self._send_json(400, {'error': "Content-Length inválido"})
+                return
+            if length > max_frame_bytes:
+                self.close_connection = True
+                self._send_json(413, {'error': f"El frame supera {max_frame_bytes / (1024 * 1024):g} MB"})
+                return
+            if length == 0 or not params.get('site') or not params.get('camera'):
+                self.close_connection = True
+                self._send_json(400, {'error': "Se requieren site, camera y la imagen en el cuerpo"})
+                return
+            try:
+                timestamp = float(params['ts']) if params.get('ts') else None
+            except ValueError:
+                self.close_connection = True
+                self._send_json(400, {'error': "ts debe ser un número (segundos)"})
+                return
+            # Sin capacidad se responde antes de leer el cuerpo, que no llega a guardarse
+            if self._reject_without_capacity(params, length):
+                return
+            try:
+                worker = service.submit(params['site'], params['camera'], self.rfile.read(length),
+                                        source=params.get('source'), timestamp=timestamp)
+            except ServiceOverloaded as e:
+                self.close_connection = True
+                self._send_json(429, {'error': str(e)}, headers=[('Retry-After', str(e.retry_after))])
+            except WorkerUnavailable as e:
+                self.close_connection = True
+                self._send_json(503, {'error': str(e)})
+            else:
+                self._send_json(202, {'accepted': True, 'worker': worker})
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), IngestHandler)
+    server.daemon_threads = True
+    return server
+
+
+class ServiceClient:
+    """
+    Cliente del servicio: lo usan las cámaras para enviar frames y el
+    tablero para leer el estado
+    """
+
+    def __init__(self, url, timeout=5.0):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def status(self):
+        with urllib.request.urlopen(f"{self.url}/status", timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def submit(self, site, camera, data, source=None, timestamp=None):
+        """
+        Envía un frame. Lanza ServiceOverloaded si el servicio pide reintentar
+        y WorkerUnavailable si el proceso de la cámara ya no se reinicia.
+        """
+        params = {'site': site, 'camera': camera}
+        if source is not None:
+            params['source'] = source
+        if timestamp is not None:
+            params['ts'] = repr(timestamp)
+        request = urllib.request.Request(
+            f"{self.url}/frames?{urllib.parse.urlencode(params)}", data=data,
+            headers={'Content-Type': 'application/octet-stream'}, method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            if e.code == 429:
+                raise ServiceOverloaded(json.loads(e.read()).get('error', "Servicio sobrecargado"),
+                                        retry_after=int(e.headers.get('Retry-After') or RETRY_AFTER_S)) from None
+            if e.code == 503:
+                raise WorkerUnavailable(json.loads(e.read()).get('error', "Proceso no disponible")) from None
+            raise
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio de ingesta de frames de cámaras")
+    parser.add_argument('--host', default='127.0.0.1', help="Dirección donde escuchar")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Puerto HTTP")
+    parser.add_argument('--workers', '-w', type=int, default=None,
+                        help="Procesos de análisis (por defecto, núcleos de CPU)")
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="Frames en cola por proceso antes de responder 429")
+    parser.add_argument('--max-inflight', type=int, default=DEFAULT_MAX_INFLIGHT,
+                        help="Frames sin terminar por cámara antes de responder 429")
+    parser.add_argument('--max-restarts', type=int, default=DEFAULT_MAX_RESTARTS,
+                        help="Reinicios por proceso antes de abandonarlo (sus cámaras reciben 503)")
+    parser.add_argument('--max-frame-mb', type=float, default=DEFAULT_MAX_FRAME_BYTES / (1024 * 1024),
+                        help="Tamaño máximo de un frame")
+    add_detector_arguments(parser)
+    parser.add_argument('--history', help="Base SQLite del historial (la misma que lee el tablero)")
+    parser.add_argument('--alert-sinks', help="Destinos de alertas, p. ej. stdout,file:alertas.jsonl")
+    args = parser.parse_args(argv)
+
+    try:
+        sinks = create_sinks(args.alert_sinks)
+    except ValueError as e:
+        parser.error(str(e))
+    history = HistoryStore(args.history) if args.history else None
+    dispatcher = AlertDispatcher(sinks) if sinks else None
+    service = IngestService(
+        workers=args.workers, queue_size=args.queue_size, max_inflight_per_camera=args.max_inflight,
+        detector_options=detector_options(args),
+        rules_path=args.rules, min_confidence=args.min_confidence, history=history, alert_dispatcher=dispatcher,
+        max_restarts=args.max_restarts,
+    )
+    server = start_ingest_server(service, port=args.port, host=args.host,
+                                 max_frame_bytes=int(args.max_frame_mb * 1024 * 1024))
+    print(f"Servicio de ingesta en http://{args.host}:{server.server_address[1]} "
+          f"({service.workers} procesos)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if dispatcher is not None:
+            dispatcher.close()
+        if history is not None:
+            history.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+import numpy as np
+
+from safebuild.boxes import pairwise_iou
+
+# =============================================
+# SEGUIMIENTO DE TRABAJADORES (ESTILO SORT)
+# =============================================
+# Filtro de Kalman de velocidad constante sobre [cx, cy, área, proporción]
+# con las mismas covarianzas que SORT. Los estados de todas las pistas se
+# guardan en arrays (N, 7) y (N, 7, 7): predecir y corregir son unas pocas
+# operaciones de NumPy por frame, no un filtro por persona.
+STATE_SIZE = 7
+MEASUREMENT_SIZE = 4
+
+TRANSITION = np.eye(STATE_SIZE)
+TRANSITION[0, 4] = TRANSITION[1, 5] = TRANSITION[2, 6] = 1
+OBSERVATION = np.eye(MEASUREMENT_SIZE, STATE_SIZE)
+PROCESS_NOISE = np.diag([1, 1, 1, 1, 0.01, 0.01, 0.0001])
+MEASUREMENT_NOISE = np.diag([1, 1, 10, 10])
+INITIAL_COVARIANCE = np.diag([10, 10, 10, 10, 10000, 10000, 10000])
+
+# Elemento de EPP -> (nivel, texto) de la alerta de un trabajador
+VIOLATIONS = {
+    'helmet': ("ALTA", "sin casco"),
+    'vest': ("MEDIA", "sin chaleco"),
+}
+
+
+def boxes_to_measurements(boxes):
+    """
+    [x1, y1, x2, y2] -> [cx, cy, área, proporción]
+    """
+    widths = boxes[:, 2] - boxes[:, 0]
+    heights = boxes[:, 3] - boxes[:, 1]
+    return np.stack([
+        boxes[:, 0] + widths / 2,
+        boxes[:, 1] + heights / 2,
+        widths * heights,
+        widths / np.maximum(heights, 1e-6),
+    ], axis=1)
+
+
+def states_to_boxes(states):
+    """
+    Estados del filtro -> [x1, y1, x2, y2]
+    """
+    area = np.maximum(states[:, 2], 0)
+    widths = np.sqrt(area * np.maximum(states[:, 3], 0))
+    heights = area / np.maximum(widths, 1e-6)
+    return np.stack([
+        states[:, 0] - widths / 2,
+        states[:, 1] - heights / 2,
+        states[:, 0] + widths / 2,
+        states[:, 1] + heights / 2,
+    ], axis=1)
+
+
+def greedy_match(ious, iou_threshold):
+    """
+    Empareja filas y columnas por IoU descendente (sin scipy: con pocas
+    personas por frame da el mismo resultado que el método húngaro en la
+    práctica). Devuelve dos arrays de índices emparejados.
+    """
+    rows, columns = np.nonzero(ious >= iou_threshold)
+    order = np.argsort(-ious[rows, columns], kind='stable')
+    used_rows, used_columns = set(), set()
+    matched_rows, matched_columns = [], []
+    for row, column in zip(rows[order].tolist(), columns[order].tolist()):
+        if row in used_rows or column in used_columns:
+            continue
+        used_rows.add(row)
+        used_columns.add(column)
+        matched_rows.append(row)
+        matched_columns.append(column)
+    return np.array(matched_rows, dtype=np.int64), np.array(matched_columns, dtype=np.int64)
+
+
+class Track:
+    """
+    Datos de una pista que no forman parte del filtro: identidad, contadores
+    y, por elemento de EPP, rachas y episodio de incumplimiento en curso
+    """
+    __slots__ = ('track_id', 'hits', 'misses', 'first_seen', 'last_seen', 'bbox', 'ppe',
+                 'violation_streak', 'violation_since', 'ok_streak', 'episodes')
+
+    def __init__(self, track_id, timestamp, bbox, ppe):
+        self.track_id = track_id
+        self.hits = 1
+        self.misses = 0
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.bbox = bbox
+        self.ppe = ppe
+        self.violation_streak = dict.fromkeys(VIOLATIONS, 0)
+        self.violation_since = dict.fromkeys(VIOLATIONS)
+        self.ok_streak = dict.fromkeys(VIOLATIONS, 0)
+        # Elemento -> [inicio, último frame en incumplimiento] del episodio abierto
+        self.episodes = {}
+
+
+class WorkerTracker:
+    """
+    Asigna identificadores persistentes a los trabajadores (los registros
+    'workers' del análisis: caja de la persona y su casco / chaleco) y
+    convierte el incumplimiento por frame en episodios por trabajador.
+
+    - Una pista se confirma tras min_hits apariciones y se descarta tras
+      max_age frames analizados sin verla.
+    - Un episodio empieza cuando a un trabajador confirmado le falta un
+      elemento durante raise_after observaciones seguidas y termina cuando
+      lo usa durante clear_after observaciones o cuando se pierde la pista.
+
+    update devuelve un evento al abrir cada episodio (la alerta, una sola vez
+    por trabajador y elemento) y otro al cerrarlo, con la duración.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_age=5, min_hits=3, raise_after=3, clear_after=5):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.raise_after = raise_after
+        self.clear_after = clear_after
+        self.tracks = []
+        self._states = np.empty((0, STATE_SIZE))
+        self._covariances = np.empty((0, STATE_SIZE, STATE_SIZE))
+        self._next_id = 1
+
+    def _predict(self):
+        # Un área que se volvería negativa congela su velocidad (igual que SORT)
+        shrinking = self._states[:, 2] + self._states[:, 6] <= 0
+        self._states[shrinking, 6] = 0
+        self._states = self._states @ TRANSITION.T
+        self._covariances = TRANSITION @ self._covariances @ TRANSITION.T + PROCESS_NOISE
+        return states_to_boxes(self._states)
+
+    def _correct(self, indices, measurements):
+        states, covariances = self._states[indices], self._covariances[indices]
+        residuals = measurements - states @ OBSERVATION.T
+        innovation = OBSERVATION @ covariances @ OBSERVATION.T + MEASUREMENT_NOISE
+        gains = covariances @ OBSERVATION.T @ np.linalg.inv(innovation)
+        self._states[indices] = states + (gains @ residuals[:, :, None])[:, :, 0]
+        self._covariances[indices] = (np.eye(STATE_SIZE) - gains @ OBSERVATION) @ covariances
+
+    def update(self, workers, timestamp):
+        """
+        Incorpora los trabajadores de un frame analizado. Devuelve la lista
+        de eventos {'kind': 'start' | 'end', 'track_id', 'item', 'alert_level',
+        'alert_message', 'started_at', 'timestamp', 'duration_s'}.
+        """
+        boxes = np.array([worker['bbox'] for worker in workers], dtype=np.float64).reshape(-1, 4)
+        predicted = self._predict()
+
+        track_rows, worker_rows = greedy_match(pairwise_iou(predicted, boxes), self.iou_threshold)
+        if len(track_rows):
+            self._correct(track_rows, boxes_to_measurements(boxes[worker_rows]))
+
+        events = []
+        matched = set(track_rows.tolist())
+        for row, track in enumerate(self.tracks):
+            if row not in matched:
+                track.misses += 1
+                track.ppe = None
+        for row, column in zip(track_rows.tolist(), worker_rows.tolist()):
+            track = self.tracks[row]
+            track.hits += 1
+            track.misses = 0
+            track.last_seen = timestamp
+            track.bbox = workers[column]['bbox']
+            track.ppe = workers[column]
+            if track.hits >= self.min_hits:
+                events.extend(self._update_episodes(track, timestamp))
+
+        # Pistas perdidas: se cierran sus episodios y se descartan
+        alive = np.array([track.misses <= self.max_age for track in self.tracks], dtype=bool)
+        for track in (track for track, keep in zip(self.tracks, alive) if not keep):
+            for item in list(track.episodes):
+                events.append(self._close_episode(track, item))
+        self.tracks = [track for track, keep in zip(self.tracks, alive) if keep]
+        self._states, self._covariances = self._states[alive], self._covariances[alive]
+
+        # Trabajadores sin pista: pistas nuevas
+        new = np.setdiff1d(np.arange(len(workers)), worker_rows)
+        if len(new):
+            for column in new.tolist():
+                self.tracks.append(Track(self._next_id, timestamp, workers[column]['bbox'], workers[column]))
+                self._next_id += 1
+            states = np.zeros((len(new), STATE_SIZE))
+            states[:, :MEASUREMENT_SIZE] = boxes_to_measurements(boxes[new])
+            self._states = np.concatenate([self._states, states])
+            self._covariances = np.concatenate([
+                self._covariances, np.broadcast_to(INITIAL_COVARIANCE, (len(new), STATE_SIZE, STATE_SIZE))
+            ])
+        return events
+
+    def _update_episodes(self, track, timestamp):
+        events = []
+        for item, (level, text) in VIOLATIONS.items():
+            if track.ppe[item]:
+                track.violation_streak[item] = 0
+                track.ok_streak[item] += 1
+                if item in track.episodes and track.ok_streak[item] >= self.clear_after:
+                    events.append(self._close_episode(track, item))
+                continue
+
+            track.ok_streak[item] = 0
+            if track.violation_streak[item] == 0:
+                track.violation_since[item] = timestamp
+            track.violation_streak[item] += 1
+            episode = track.episodes.get(item)
+            if episode is not None:
+                episode[1] = timestamp
+            elif track.violation_streak[item] >= self.raise_after:
+                # El episodio empieza en la primera observación de la racha
+                started_at = track.violation_since[item]
+                track.episodes[item] = [started_at, timestamp]
+                events.append({
+                    'kind': 'start',
+                    'track_id': track.track_id,
+                    'item': item,
+                    'alert_level': level,
+                    'alert_message': f"Trabajador #{track.track_id} {text}",
+                    'started_at': started_at,
+                    'timestamp': timestamp,
+                    'duration_s': timestamp - started_at,
+                })
+        return events
+
+    def _close_episode(self, track, item):
+        started_at, last_violation = track.episodes.pop(item)
+        level, text = VIOLATIONS[item]
+        return {
+            'kind': 'end',
+            'track_id': track.track_id,
+            'item': item,
+            'alert_level': level,
+            'alert_message': f"Trabajador #{track.track_id} {text}: episodio cerrado",
+            'started_at': started_at,
+            'timestamp': last_violation,
+            'duration_s': last_violation - started_at,
+        }
+
+    def close(self):
+        """
+        Cierra los episodios abiertos (fin de la secuencia)
+        """
+        return [self._close_episode(track, item) for track in self.tracks for item in list(track.episodes)]
+
+    def active_tracks(self):
+        """
+        Pistas confirmadas vistas en el último frame: {'track_id', 'bbox', 'helmet', 'vest', 'violations'}
+        """
+        return [
+            {
+                'track_id': track.track_id,
+                'bbox': track.bbox,
+                'helmet': track.ppe['helmet'],
+                'vest': track.ppe['vest'],
+                'violations': sorted(track.episodes),
+            }
+            for track in self.tracks
+            if track.misses == 0 and track.hits >= self.min_hits
+        ]
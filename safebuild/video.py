@@ -0,0 +1,231 @@
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from safebuild.detection import LocalImageFile, MemoryImageFile
+from safebuild.detectors import SimulatorDetector
+from safebuild.metrics import RULE_SECONDS, STAGE_SECONDS
+
+try:
+    import cv2
+except ImportError:  # OpenCV es opcional: sin él solo se aceptan directorios de frames
+    cv2 = None
+
+# =============================================
+# FUENTES DE FRAMES
+# =============================================
+FRAME_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+SIGNATURE_SIZE = (64, 36)
+LEVEL_SEVERITY = {"OK": 0, "MEDIA": 1, "ALTA": 2}
+
+
+class Frame:
+    __slots__ = ('index', 'timestamp', 'image_file', 'signature')
+
+    def __init__(self, index, timestamp, image_file, signature):
+        self.index = index
+        self.timestamp = timestamp
+        self.image_file = image_file
+        self.signature = signature
+
+
+def _signature_from_file(path):
+    """
+    Miniatura en escala de grises para detectar cambios. Con JPEG se usa el
+    modo draft, que decodifica directamente a baja resolución.
+    """
+    with Image.open(path) as image:
+        image.draft('L', SIGNATURE_SIZE)
+        return np.asarray(image.convert('L').resize(SIGNATURE_SIZE), dtype=np.float32)
+
+
+def iter_frame_directory(directory, fps=1.0):
+    names = sorted(n for n in os.listdir(directory) if n.lower().endswith(FRAME_EXTENSIONS))
+    for index, name in enumerate(names):
+        path = os.path.join(directory, name)
+        yield Frame(index, index / fps, LocalImageFile(path), _signature_from_file(path))
+
+
+def iter_video_file(path):
+    if cv2 is None:
+        raise RuntimeError("Para leer archivos de video se necesita OpenCV (pip install opencv-python-headless)")
+
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise RuntimeError(f"No se pudo abrir el video: {path}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    name = os.path.basename(path)
+    try:
+        index = 0
+        while True:
+            ok, bgr = capture.read()
+            if not ok:
+                break
+            gray = cv2.cvtColor(cv2.resize(bgr, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+            # Los bytes del frame solo se codifican si el muestreador lo elige (ver encode_frame)
+            yield Frame(index, index / fps, (name, bgr), gray.astype(np.float32))
+            index += 1
+    finally:
+        capture.release()
+
+
+def iter_frames(source, fps=1.0):
+    """
+    Devuelve los frames de un video local o de un directorio de imágenes
+    """
+    if os.path.isdir(source):
+        return iter_frame_directory(source, fps=fps)
+    return iter_video_file(source)
+
+
+def encode_frame(frame):
+    """
+    Convierte el frame elegido en un archivo de imagen para el detector
+    """
+    if not isinstance(frame.image_file, tuple):
+        return frame.image_file
+    name, bgr = frame.image_file
+    ok, encoded = cv2.imencode('.jpg', bgr)
+    return MemoryImageFile(f"{name}#frame{frame.index:06d}.jpg", encoded.tobytes())
+
+
+# =============================================
+# MUESTREO ADAPTATIVO
+# =============================================
+class AdaptiveSampler:
+    """
+    Decide qué frames analizar:
+    - Si la escena cambia (diferencia media de la miniatura > change_threshold) se analiza
+    - Si hay personas a la vista se analiza cada min_stride frames
+    - Si no las hay, el intervalo se duplica hasta max_stride
+    """
+
+    def __init__(self, min_stride=1, max_stride=30, change_threshold=8.0):
+        self.min_stride = min_stride
+        self.max_stride = max_stride
+        self.change_threshold = change_threshold
+        self.stride = min_stride
+        self._last_signature = None
+        self._last_index = None
+
+    def should_sample(self, frame):
+        if self._last_signature is None:
+            return True
+        if frame.index - self._last_index >= self.stride:
+            return True
+        change = float(np.abs(frame.signature - self._last_signature).mean())
+        return change > self.change_threshold
+
+    def update(self, frame, persons):
+        self._last_signature = frame.signature
+        self._last_index = frame.index
+        if persons > 0:
+            self.stride = self.min_stride
+        else:
+            self.stride = min(self.stride * 2, self.max_stride)
+
+
+# =============================================
+# ANTIRREBOTE DE ALERTAS
+# =============================================
+class AlertDebouncer:
+    """
+    Confirma un cambio de nivel de alerta solo si se mantiene durante varios
+    frames muestreados seguidos. Subir de nivel requiere raise_after frames y
+    bajar requiere clear_after, así un casco que no se detecta en un frame
+    aislado no dispara una alerta.
+    """
+
+    def __init__(self, raise_after=3, clear_after=5):
+        self.raise_after = raise_after
+        self.clear_after = clear_after
+        self.level = "OK"
+        self.since = None
+        self._candidate = None
+        self._candidate_count = 0
+        self._candidate_since = None
+
+    def update(self, analysis, timestamp):
+        """
+        Devuelve un evento (dict) cuando el nivel confirmado cambia, o None
+        """
+        level = analysis['alert_level']
+        if level == self.level:
+            self._candidate = None
+            self._candidate_count = 0
+            return None
+
+        if level != self._candidate:
+            self._candidate = level
+            self._candidate_count = 0
+            self._candidate_since = timestamp
+        self._candidate_count += 1
+
+        raising = LEVEL_SEVERITY[level] > LEVEL_SEVERITY[self.level]
+        needed = self.raise_after if raising else self.clear_after
+        if self._candidate_count < needed:
+            return None
+
+        event = {
+            'previous_level': self.level,
+            'alert_level': level,
+            'alert_message': analysis['alert_message'],
+            'recommended_action': analysis['recommended_action'],
+            'timestamp': self._candidate_since,
+        }
+        self.level = level
+        self.since = self._candidate_since
+        self._candidate = None
+        self._candidate_count = 0
+        return event
+
+
+# =============================================
+# ANÁLISIS DE LA SECUENCIA
+# =============================================
+def analyze_stream(frames, expert_system, sampler=None, debouncer=None, detector=None, min_confidence=None,
+                   metrics=None, tracker=None):
+    """
+    Recorre la secuencia y produce un resultado por cada frame muestreado:
+    {'frame_index', 'timestamp', 'analysis', 'confirmed_level', 'event', 'frames_seen', 'elapsed_s'}.
+    Con un WorkerTracker agrega 'worker_events' (episodios por trabajador que
+    empiezan o terminan en el frame) y 'tracks' (trabajadores seguidos).
+    """
+    detector = detector or SimulatorDetector()
+    sampler = sampler or AdaptiveSampler()
+    debouncer = debouncer or AlertDebouncer()
+    start = time.perf_counter()
+    frames_seen = 0
+
+    for frame in frames:
+        frames_seen += 1
+        if not sampler.should_sample(frame):
+            continue
+
+        detect_start = time.perf_counter()
+        detections = detector.detect(encode_frame(frame)).filter_confidence(min_confidence)
+        rules_start = time.perf_counter()
+        analysis = expert_system.analyze_detections(detections)
+        if metrics is not None:
+            rules_end = time.perf_counter()
+            metrics.observe(STAGE_SECONDS, rules_start - detect_start, stage='detect')
+            metrics.observe(STAGE_SECONDS, rules_end - rules_start, stage='rules')
+            metrics.observe(RULE_SECONDS, rules_end - rules_start, rule=analysis['rule'] or 'ninguna')
+        sampler.update(frame, analysis['statistics']['persons'])
+        event = debouncer.update(analysis, frame.timestamp)
+
+        result = {
+            'frame_index': frame.index,
+            'timestamp': frame.timestamp,
+            'analysis': analysis,
+            'confirmed_level': debouncer.level,
+            'event': event,
+            'frames_seen': frames_seen,
+            'elapsed_s': time.perf_counter() - start,
+        }
+        if tracker is not None:
+            result['worker_events'] = tracker.update(analysis['workers'], frame.timestamp)
+            result['tracks'] = tracker.active_tracks()
+        yield result
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from safebuild.detections import Detections
+
+
+def random_frame(rng, max_groups=4):
+    """
+    Frame sintético: grupos de persona (+ casco / chaleco al azar) y alguna
+    caja suelta de otra clase
+    """
+    class_ids, boxes = [], []
+    for _ in range(int(rng.integers(0, max_groups + 1))):
+        x, y = rng.uniform(0, 1500), rng.uniform(0, 800)
+        class_ids.append(0)
+        boxes.append([x, y, x + 80, y + 150])
+        if rng.random() < 0.6:
+            class_ids.append(1)
+            boxes.append([x + 10, y - 10, x + 40, y + 20])
+        if rng.random() < 0.6:
+            class_ids.append(2)
+            boxes.append([x, y + 20, x + 80, y + 70])
+    if rng.random() < 0.2:
+        class_ids.append(3)
+        boxes.append([0, 0, 10, 10])
+    return Detections.from_arrays(class_ids, rng.uniform(0.3, 1.0, len(class_ids)), boxes)
+
+
+def analysis(level, persons, helmets, vests, compliant=None):
+    """
+    Resultado mínimo de analyze_detections, como lo guarda el historial
+    (sin 'compliant' simula un resultado anterior a la asociación persona-EPP)
+    """
+    statistics = {'persons': persons, 'helmets': helmets, 'vests': vests}
+    if compliant is not None:
+        statistics['compliant'] = compliant
+    return {'alert_level': level, 'alert_message': level, 'statistics': statistics}
+
+
+def wait_for(condition, timeout=5.0):
+    """
+    Espera a que condition() sea verdadera (hilos y procesos en segundo plano)
+    """
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timeout"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def frames():
+    rng = np.random.default_rng(0)
+    return [random_frame(rng) for _ in range(300)]
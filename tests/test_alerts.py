@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+from conftest import wait_for
+
+from safebuild.alerts import AlertChannel, AlertDispatcher, AlertSink, FileSink, StdoutSink, create_sinks, make_alert
+
+
+class ListSink(AlertSink):
+    """
+    Guarda los mensajes; falla las primeras `failures` veces
+    """
+    name = 'lista'
+
+    def __init__(self, failures=0):
+        self.messages = []
+        self.failures = failures
+        self.delivered = threading.Event()
+
+    def send(self, message):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("destino caído")
+        self.messages.append(message)
+        self.delivered.set()
+
+
+def alert(camera='grua-1', rule='no_helmet_critical', timestamp=0.0):
+    analysis = {'rule': rule, 'alert_level': "ALTA", 'alert_message': rule}
+    return make_alert(analysis, 'norte', camera, timestamp=timestamp)
+
+
+def test_create_sinks(tmp_path):
+    sinks = create_sinks(f"stdout, file:{tmp_path / 'a.jsonl'}")
+    assert isinstance(sinks[0], StdoutSink) and isinstance(sinks[1], FileSink)
+    with pytest.raises(ValueError):
+        create_sinks("sms:123")
+    with pytest.raises(ValueError):
+        create_sinks("webhook")
+
+
+def test_dedupe_and_batching():
+    sink = ListSink()
+    dispatcher = AlertDispatcher([sink], dedupe_window_s=60, batch_window_s=0.05)
+    assert not dispatcher.submit_analysis({'alert_level': "OK", 'alert_message': "ok"}, 'norte', 'grua-1')
+    for timestamp in (0.0, 1.0):
+        dispatcher.submit(alert(timestamp=timestamp))
+    dispatcher.submit(alert(camera='grua-2'))
+    wait_for(lambda: dispatcher.stats['batches'] == 1)
+    # Dentro de la ventana: se cuenta pero no se reenvía
+    dispatcher.submit(alert(timestamp=30.0))
+    dispatcher.submit(alert(timestamp=61.0))
+    dispatcher.close()
+
+    first, second = [message['alerts'] for message in sink.messages]
+    assert [(a['camera'], a['count']) for a in first] == [('grua-1', 2), ('grua-2', 1)]
+    assert [(a['camera'], a['count'], a['timestamp']) for a in second] == [('grua-1', 2, 61.0)]
+    summary = dispatcher.summary()
+    assert summary['deduplicated'] == 1 and summary['channels'][0]['sent_alerts'] == 3
+
+
+def test_channel_rate_limit_merges_pending_batches():
+    sink = ListSink()
+    channel = AlertChannel(sink, rate_per_minute=60, burst=1)
+    channel.offer([alert()])
+    sink.delivered.wait(5)
+    # Sin turnos disponibles: los dos lotes siguientes salen en un solo mensaje
+    channel.offer([alert(camera='grua-2')])
+    channel.offer([alert(camera='grua-3')])
+    wait_for(lambda: len(sink.messages) == 2)
+    channel.close()
+    assert [len(message['alerts']) for message in sink.messages] == [1, 2]
+
+
+def test_zero_rate_means_no_limit():
+    sink = ListSink()
+    channel = AlertChannel(sink, rate_per_minute=0, burst=1)
+    for camera in ('grua-1', 'grua-2', 'grua-3'):
+        channel.offer([alert(camera=camera)])
+        sink.delivered.wait(5)
+        sink.delivered.clear()
+    # Con burst=1 los envíos 2 y 3 no tienen turno: sin límite, igual salen
+    wait_for(lambda: channel.summary()['sent_alerts'] == 3)
+    channel.close()
+    with pytest.raises(ValueError):
+        AlertChannel(ListSink(), rate_per_minute=-1)
+
+
+def test_last_error_is_cleared_after_a_successful_send():
+    sink = ListSink(failures=1)
+    channel = AlertChannel(sink, max_retries=2, retry_delay_s=0.0)
+    channel.offer([alert()])
+    wait_for(lambda: channel.summary()['sent_messages'] == 1)
+    summary = channel.summary()
+    assert summary['last_error'] is None and summary['failed_alerts'] == 0
+
+    failing = AlertChannel(ListSink(failures=10), max_retries=1, retry_delay_s=0.0)
+    failing.offer([alert()])
+    wait_for(lambda: failing.summary()['failed_alerts'] == 1)
+    assert failing.summary()['last_error'] == "ConnectionError: destino caído"
+
+
+def test_close_does_not_block_on_a_full_queue():
+    class SlowDispatcher(AlertDispatcher):
+        def _accept(self, alert, batch):
+            time.sleep(0.3)
+            super()._accept(alert, batch)
+
+    dispatcher = SlowDispatcher([ListSink()], batch_window_s=10, max_queue=1)
+    dispatcher.submit(alert())
+    wait_for(dispatcher._queue.empty)
+    assert dispatcher.submit(alert(camera='grua-2'))
+    assert not dispatcher.submit(alert(camera='grua-3'))
+
+    start = time.monotonic()
+    dispatcher.close(timeout=0.05)
+    assert time.monotonic() - start < 0.25
+    assert not dispatcher.submit(alert(camera='grua-4'))
+    # Sin lugar para _STOP, el coordinador termina igual al vaciar la cola
+    wait_for(lambda: not dispatcher._thread.is_alive())
+    assert dispatcher.summary()['dropped'] == 1
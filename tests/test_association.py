@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from safebuild import association
+from safebuild.association import (_associate_small, associate_batch, associate_dicts, associate_ppe,
+                                   match_points_to_regions, worker_records)
+from safebuild.detections import Detections
+
+
+def crowd(n_persons, rng):
+    """
+    Muchas personas con casco y chaleco en un frame; una parte de las cajas
+    con las esquinas invertidas y otra con coordenadas no finitas
+    """
+    class_ids, boxes = [], []
+    for _ in range(n_persons):
+        x, y = rng.uniform(0, 3000), rng.uniform(0, 2000)
+        class_ids += [0, 1, 2]
+        boxes += [[x, y, x + 60, y + 120], [x + 10, y - 8, x + 40, y + 20], [x, y + 25, x + 60, y + 70]]
+    boxes = np.array(boxes, dtype=np.float64)
+    inverted = rng.random(len(boxes)) < 0.2
+    boxes[inverted] = boxes[inverted][:, [2, 3, 0, 1]]
+    broken = rng.choice(len(boxes), size=len(boxes) // 20, replace=False)
+    boxes[broken[::2], 0] = np.nan
+    boxes[broken[1::2], 3] = np.inf
+    return np.array(class_ids), boxes
+
+
+@pytest.mark.parametrize('n_persons', [5, 80])
+def test_paths_agree_on_inverted_and_non_finite_boxes(n_persons, monkeypatch):
+    class_ids, boxes = crowd(n_persons, np.random.default_rng(n_persons))
+    frame_ids = np.zeros(len(class_ids), dtype=np.int64)
+    expected = _associate_small(class_ids.tolist(), boxes.tolist())
+
+    # Con 80 personas associate_batch usa la grilla; con 5, la matriz densa
+    assert np.array_equal(associate_batch(class_ids, boxes, frame_ids), expected)
+    monkeypatch.setattr(association, 'BRUTE_FORCE_PAIRS', 10 ** 9)
+    assert np.array_equal(associate_batch(class_ids, boxes, frame_ids), expected)
+
+    # Las cajas invertidas se asocian igual que las normales
+    clean = np.isfinite(boxes).all(axis=1)
+    for person in expected[clean[expected['person']]]:
+        base = person['person']
+        assert person['helmet'] in (base + 1, -1) and person['vest'] in (base + 2, -1)
+    assert (expected['helmet'] == expected['person'] + 1).sum() > 0.7 * n_persons
+
+
+def test_non_finite_boxes_are_never_matched():
+    class_ids = [0, 1, 0, 1]
+    boxes = [[0, 0, 60, 120], [np.nan, 0, 30, 20], [200, 0, np.inf, 120], [210, -8, 240, 20]]
+    workers = associate_ppe(Detections.from_arrays(class_ids, [0.9] * 4, boxes))
+    assert workers['helmet'].tolist() == [-1, -1]
+
+
+def test_grid_ignores_inverted_regions():
+    points = np.array([[5.0, 5.0]] * 70)
+    regions = np.array([[10.0, 10.0, 0.0, 0.0]] * 60 + [[0.0, 0.0, 10.0, 10.0]])
+    matches = match_points_to_regions(points, np.zeros(70, np.int64), regions, np.zeros(61, np.int64))
+    assert (matches == 60).all()
+
+
+def test_batch_matches_per_frame(frames):
+    class_ids = np.concatenate([frame.class_ids for frame in frames])
+    boxes = np.concatenate([frame.boxes for frame in frames])
+    frame_ids = np.repeat(np.arange(len(frames)), [len(frame) for frame in frames])
+    workers = associate_batch(class_ids, boxes, frame_ids)
+    offsets = np.cumsum([0] + [len(frame) for frame in frames])
+    for index, frame in enumerate(frames):
+        expected = associate_ppe(frame)
+        got = workers[workers['frame'] == index]
+        for field in ('person', 'helmet', 'vest'):
+            shifted = np.where(got[field] >= 0, got[field] - offsets[index], -1)
+            assert shifted.tolist() == expected[field].tolist()
+
+
+def test_dict_frames_match_detections_path():
+    class_ids, boxes = crowd(8, np.random.default_rng(3))
+    names = ['person', 'helmet', 'safety_vest']
+    dicts = [{'class_name': names[c], 'confidence': 0.9, 'bbox': box} for c, box in zip(class_ids, boxes.tolist())]
+    detections = Detections.from_dicts(dicts)
+    records = worker_records(associate_ppe(detections), detections.boxes)
+    # NaN != NaN: se compara la representación
+    assert repr(associate_dicts(dicts)) == repr(records)
@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks')
+
+
+@pytest.fixture
+def run_suite(monkeypatch):
+    monkeypatch.syspath_prepend(BENCHMARKS_DIR)
+    import run_suite
+    return run_suite
+
+
+def results(**medians):
+    return {'results': {name.replace('_', '/'): {'median_s': median} for name, median in medians.items()}}
+
+
+def test_compare_flags_only_regressions_over_threshold(run_suite, capsys):
+    baseline = results(rules_a=0.010, rules_b=0.010, rules_c=0.010)
+    current = results(rules_a=0.0114, rules_b=0.0116, rules_c=0.005, rules_nuevo=1.0)
+    assert run_suite.compare(current, baseline, 0.15) == ['rules/b']
+    assert 'nuevo' in capsys.readouterr().out
+
+
+def test_measure_summarizes_samples(run_suite):
+    calls = []
+    summary = run_suite.measure(lambda: calls.append(1), repeat=5, warmup=2, items=10)
+    assert len(calls) == 7
+    assert summary['repeat'] == 5 and summary['items'] == 10
+    assert summary['min_s'] <= summary['median_s'] <= summary['p95_s'] <= summary['max_s']
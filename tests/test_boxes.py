@@ -0,0 +1,54 @@
+import numpy as np
+
+from safebuild.boxes import concat_ranges, fast_nms, nms, normalize_boxes, pairwise_iou
+
+
+def clusters(rng, n_clusters=40, per_cluster=5):
+    """
+    Grupos de cajas casi iguales, bien separados entre sí
+    """
+    centers = np.stack([np.arange(n_clusters) * 200.0, rng.uniform(0, 500, n_clusters)], axis=1)
+    jitter = rng.normal(0, 2, size=(n_clusters * per_cluster, 2))
+    corners = np.repeat(centers, per_cluster, axis=0) + jitter
+    return np.concatenate([corners, corners + 60], axis=1), rng.random(n_clusters * per_cluster)
+
+
+def test_concat_ranges():
+    assert concat_ranges(np.array([2, 0, 3])).tolist() == [0, 1, 0, 1, 2]
+
+
+def test_normalize_boxes():
+    assert normalize_boxes(np.array([[10.0, 20, 0, 5]])).tolist() == [[0, 5, 10, 20]]
+
+
+def test_pairwise_iou():
+    boxes = np.array([[0.0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 20, 30]])
+    iou = pairwise_iou(boxes, boxes)
+    assert np.allclose(np.diag(iou)[:2], 1) and iou[2, 2] == 0
+    assert np.isclose(iou[0, 1], 50 / 150) and iou[0, 2] == 0
+
+
+def test_fast_nms_matches_nms_on_separated_clusters():
+    boxes, scores = clusters(np.random.default_rng(0))
+    expected = nms(boxes, scores, 0.5)
+    assert len(expected) == 40
+    assert fast_nms(boxes, scores, 0.5).tolist() == expected.tolist()
+
+
+def test_nms_per_class():
+    boxes = np.array([[0.0, 0, 10, 10], [0, 0, 10, 10], [1, 1, 10, 10]])
+    scores = np.array([0.9, 0.8, 0.7])
+    class_ids = np.array([0, 1, 0])
+    for suppress in (nms, fast_nms):
+        assert suppress(boxes, scores, 0.5, class_ids=class_ids).tolist() == [0, 1]
+        assert suppress(boxes, scores, 0.5).tolist() == [0]
+    assert fast_nms(np.empty((0, 4)), np.empty(0)).tolist() == []
+
+
+def test_nms_per_class_with_negative_coordinates():
+    # Cajas sin recortar al borde de la imagen: el desplazamiento por clase debe separarlas igual
+    boxes = np.array([[-100.0, -100, -10, -10], [-90, -90, -5, -5]])
+    scores = np.array([0.9, 0.8])
+    for suppress in (nms, fast_nms):
+        assert suppress(boxes, scores, 0.5, class_ids=np.array([0, 1])).tolist() == [0, 1]
+        assert suppress(boxes, scores, 0.5, class_ids=np.array([0, 0])).tolist() == [0]
@@ -0,0 +1,65 @@
+import json
+import os
+
+from safebuild.cache import AnalysisCache, make_cache_key
+
+
+def test_cache_key_depends_on_content_and_config():
+    key = make_cache_key(b'imagen', {'backend': 'simulador', 'min_confidence': 0.5})
+    assert key == make_cache_key(memoryview(b'imagen'), {'min_confidence': 0.5, 'backend': 'simulador'})
+    assert key != make_cache_key(b'imagen2', {'backend': 'simulador', 'min_confidence': 0.5})
+    assert key != make_cache_key(b'imagen', {'backend': 'simulador', 'min_confidence': 0.6})
+
+
+def test_memory_lru_evicts_by_size():
+    value = {'x': 'a' * 100}
+    size = len(json.dumps(value).encode('utf-8'))
+    cache = AnalysisCache(max_memory_bytes=size * 2)
+    cache.put('a', value)
+    cache.put('b', value)
+    assert cache.get('a') == value  # 'a' pasa a ser la más reciente
+    cache.put('c', value)
+    assert cache.get('b') is None
+    assert cache.get('a') == value and cache.get('c') == value
+    stats = cache.stats()
+    assert stats['entries'] == 2 and stats['memory_bytes'] == size * 2
+    assert stats['hits'] == 3 and stats['misses'] == 1
+
+
+def test_oversized_value_is_not_kept_in_memory():
+    cache = AnalysisCache(max_memory_bytes=10)
+    cache.put('a', {'x': 'a' * 100})
+    assert cache.get('a') is None
+
+
+def test_disk_level_survives_a_new_cache(tmp_path):
+    AnalysisCache(disk_dir=str(tmp_path)).put('k', {'alert_level': "ALTA"})
+    cache = AnalysisCache(disk_dir=str(tmp_path))
+    assert cache.get('k') == {'alert_level': "ALTA"}
+    assert cache.get('k') == {'alert_level': "ALTA"}
+    stats = cache.stats()
+    assert stats['disk_hits'] == 1 and stats['hits'] == 1
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_corrupt_disk_entry_is_a_miss_and_removed(tmp_path):
+    (tmp_path / 'k.json').write_bytes(b'{"alert_level": "AL')
+    cache = AnalysisCache(disk_dir=str(tmp_path))
+    assert cache.get('k') is None
+    assert cache.stats()['misses'] == 1
+    assert not (tmp_path / 'k.json').exists()
+
+
+def test_disk_level_is_bounded(tmp_path):
+    value = {'x': 'a' * 100}
+    size = len(json.dumps(value).encode('utf-8'))
+    cache = AnalysisCache(max_memory_bytes=0, disk_dir=str(tmp_path), max_disk_bytes=size * 3)
+    for i, key in enumerate('abcd'):
+        cache.put(key, value)
+        os.utime(tmp_path / f"{key}.json", (i, i))
+    # Al pasar el límite se borran los más viejos hasta el 90 %
+    assert sorted(p.stem for p in tmp_path.glob('*.json')) == ['c', 'd']
+    assert cache.stats()['disk_bytes'] == size * 2
+    assert cache.get('a') is None and cache.get('d') == value
+    # Un directorio que ya excede el límite se recorta al abrir la caché
+    assert AnalysisCache(disk_dir=str(tmp_path), max_disk_bytes=size).stats()['disk_bytes'] <= size
@@ -0,0 +1,80 @@
+import json
+import os
+
+import pytest
+from PIL import Image
+
+from safebuild import cli
+from safebuild.history import HistoryStore
+
+
+def make_images(directory, names):
+    for name in names:
+        path = directory / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        Image.new('RGB', (64, 48), 'gray').save(path)
+
+
+def read_records(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_iter_images_walks_subdirectories(tmp_path):
+    make_images(tmp_path, ['a.jpg', 'sub/b.png', 'sub/deep/c.JPEG'])
+    (tmp_path / 'notas.txt').write_text('x')
+    assert sorted(os.path.relpath(p, tmp_path) for p in cli.iter_images(str(tmp_path))) == [
+        'a.jpg', os.path.join('sub', 'b.png'), os.path.join('sub', 'deep', 'c.JPEG')]
+
+
+def test_load_completed_truncates_partial_last_line(tmp_path):
+    output = tmp_path / 'out.jsonl'
+    output.write_bytes(b'{"path": "a.jpg"}\n{"path": "b.jpg"}\n{"path": "c.j')
+    assert cli.load_completed(str(output)) == {cli.path_key('a.jpg'), cli.path_key('b.jpg')}
+    assert output.read_bytes() == b'{"path": "a.jpg"}\n{"path": "b.jpg"}\n'
+
+
+def test_run_resumes_and_records_history(tmp_path):
+    images = tmp_path / 'fotos'
+    make_images(images, ['obra1.jpg', 'obra2.jpg', 'peligro.jpg'])
+    output = tmp_path / 'out.jsonl'
+    history = HistoryStore(str(tmp_path / 'h.db'))
+
+    summary = cli.run(str(images), str(output), workers=1, history=history, site='s', camera='c')
+    assert summary == {'processed': 3, 'skipped': 0, 'errors': 0}
+    assert history.summary(site='s')['analyses'] == 3
+
+    make_images(images, ['seguro.jpg'])
+    summary = cli.run(str(images), str(output), workers=1)
+    assert summary == {'processed': 1, 'skipped': 3, 'errors': 0}
+    records = read_records(output)
+    assert len({r['path'] for r in records}) == 4
+    assert all('analysis' in r for r in records)
+    history.close()
+
+
+def test_failed_images_are_retried_on_resume(tmp_path):
+    images = tmp_path / 'fotos'
+    make_images(images, ['a.jpg', 'b.jpg'])
+    output = tmp_path / 'out.jsonl'
+    a, b = str(images / 'a.jpg'), str(images / 'b.jpg')
+    output.write_text(json.dumps({'path': a, 'analysis': {}}) + '\n' +
+                      json.dumps({'path': b, 'error': "TimeoutError: lento"}) + '\n', encoding='utf-8')
+    assert cli.load_completed(str(output)) == {cli.path_key(a)}
+
+    summary = cli.run(str(images), str(output), workers=1)
+    assert summary == {'processed': 1, 'skipped': 1, 'errors': 0}
+    assert 'analysis' in read_records(output)[-1] and read_records(output)[-1]['path'] == b
+    assert cli.load_completed(str(output)) == {cli.path_key(a), cli.path_key(b)}
+
+
+@pytest.mark.parametrize('error', [Image.DecompressionBombError("imagen enorme"), RuntimeError("fallo del modelo")])
+def test_analyze_path_reports_any_failure(tmp_path, monkeypatch, error):
+    class BrokenDetector:
+        def detect(self, image_file):
+            raise error
+
+    make_images(tmp_path, ['x.jpg'])
+    monkeypatch.setattr(cli, '_detector', BrokenDetector())
+    record = cli.analyze_path(str(tmp_path / 'x.jpg'))
+    assert record == {'path': str(tmp_path / 'x.jpg'), 'error': f"{type(error).__name__}: {error}"}
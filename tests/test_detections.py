@@ -0,0 +1,40 @@
+import numpy as np
+
+from safebuild.detections import OTHER_CLASS_ID, Detections, as_detections
+
+LEGACY = [
+    {'class_name': 'person', 'confidence': 0.9, 'bbox': [10, 20, 110, 220]},
+    {'class_name': 'helmet', 'confidence': 0.4, 'bbox': [30, 15, 60, 40]},
+    {'class_name': 'dog', 'confidence': 0.8, 'bbox': [0, 0, 5, 5]},
+]
+
+
+def test_from_dicts_round_trip():
+    detections = Detections.from_dicts(LEGACY)
+    assert len(detections) == 3
+    assert detections.class_ids.tolist() == [0, 1, OTHER_CLASS_ID]
+    dicts = detections.to_dicts()
+    assert [d['class_name'] for d in dicts] == ['person', 'helmet', 'other']
+    assert dicts[0]['bbox'] == [10, 20, 110, 220] and dicts[1]['confidence'] == 0.4
+
+
+def test_json_round_trip():
+    detections = Detections.from_dicts(LEGACY)
+    restored = Detections.from_json(detections.to_json())
+    assert restored.to_json() == detections.to_json()
+    assert Detections.from_json(Detections().to_json()).to_json() == {'class_id': [], 'confidence': [], 'bbox': []}
+
+
+def test_filter_confidence_and_counts():
+    detections = Detections.from_dicts(LEGACY)
+    assert detections.filter_confidence(None) is detections
+    kept = detections.filter_confidence(0.5)
+    assert kept.class_ids.tolist() == [0, OTHER_CLASS_ID]
+    assert kept.class_counts().tolist() == [1, 0, 0, 1]
+    assert Detections().class_counts().tolist() == [0, 0, 0, 0]
+
+
+def test_as_detections_accepts_both_formats():
+    detections = Detections.from_dicts(LEGACY)
+    assert as_detections(detections) is detections
+    assert np.array_equal(as_detections(LEGACY).boxes, detections.boxes)
@@ -0,0 +1,153 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from safebuild.detection import MemoryImageFile
+from safebuild.detections import Detections
+from safebuild.detectors import Detector, OnnxDetector, SimulatorDetector, TiledDetector, create_detector, tile_starts
+from safebuild.ingest import IngestLimitError, SessionMemoryBudget
+
+
+def jpeg_file(name, size=(640, 480)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (90, 90, 90)).save(buffer, format='JPEG')
+    return MemoryImageFile(name, buffer.getvalue())
+
+
+def yolov8_model(path):
+    """
+    Modelo YOLOv8 sintético (salida constante): dos personas casi iguales,
+    un casco y una persona más
+    """
+    onnx = pytest.importorskip('onnx')
+    from onnx import TensorProto, helper, numpy_helper
+
+    base = np.zeros((1, 7, 100), np.float32)
+    base[0, :5, 0] = [320, 320, 100, 200, 0.9]
+    base[0, :5, 1] = [322, 321, 100, 200, 0.8]
+    base[0, :4, 2] = [320, 240, 40, 30]
+    base[0, 5, 2] = 0.85
+    base[0, :5, 3] = [500, 300, 80, 150, 0.7]
+    nodes = [
+        helper.make_node('ReduceMean', ['images'], ['mean'], axes=[1, 2, 3], keepdims=1),
+        helper.make_node('Constant', [], ['zero'], value=numpy_helper.from_array(np.zeros(1, np.float32))),
+        helper.make_node('Mul', ['mean', 'zero'], ['scaled']),
+        helper.make_node('Squeeze', ['scaled'], ['squeezed'], axes=[3]),
+        helper.make_node('Add', ['squeezed', 'base'], ['output0']),
+    ]
+    graph = helper.make_graph(
+        nodes, 'yolo',
+        [helper.make_tensor_value_info('images', TensorProto.FLOAT, ['batch', 3, 640, 640])],
+        [helper.make_tensor_value_info('output0', TensorProto.FLOAT, ['batch', 7, 100])],
+        [numpy_helper.from_array(base, 'base')],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 11)])
+    model.ir_version = 7
+    names = model.metadata_props.add()
+    names.key, names.value = 'names', "{0: 'person', 1: 'hardhat', 2: 'vest'}"
+    onnx.save(model, str(path))
+    return str(path)
+
+
+def test_create_detector_defaults_to_simulator():
+    detector = create_detector('simulador', tile_size=640, model_path='ignorado.onnx')
+    assert isinstance(detector, SimulatorDetector)
+    assert detector.config == {'backend': 'simulador'}
+
+
+def test_create_detector_rejects_unknown_backend():
+    with pytest.raises(ValueError, match="desconocido"):
+        create_detector('tensorrt')
+
+
+def test_simulator_decides_by_file_name():
+    critical, safe = SimulatorDetector().detect_batch([jpeg_file('peligro.jpg'), jpeg_file('seguro.jpg')])
+    assert critical.class_counts().tolist() == [2, 0, 0, 0]
+    assert safe.class_counts().tolist() == [2, 2, 2, 0]
+
+
+def test_onnx_backend_requires_model(tmp_path):
+    pytest.importorskip('onnxruntime')
+    with pytest.raises(ValueError):
+        create_detector('onnx')
+    with pytest.raises(FileNotFoundError):
+        create_detector('onnx', model_path=str(tmp_path / 'no_existe.onnx'))
+
+
+def test_onnx_detector_decodes_yolov8_output(tmp_path):
+    pytest.importorskip('onnxruntime')
+    detector = create_detector('onnx', model_path=yolov8_model(tmp_path / 'epp.onnx'), num_threads=1)
+    assert isinstance(detector, OnnxDetector)
+    assert detector.class_names == ['person', 'helmet', 'safety_vest']
+
+    # 640x480 -> letterbox sin escala y 80 px de relleno vertical
+    detections = detector.detect(jpeg_file('obra.jpg'))
+    assert detections.class_counts().tolist() == [2, 1, 0, 0]
+    first = detections.to_dicts()[0]
+    assert first['class_name'] == 'person'
+    assert first['bbox'] == pytest.approx([270, 140, 370, 340])
+
+    tiled = create_detector('onnx', model_path=detector.model_path, tile_size=320)
+    assert isinstance(tiled, TiledDetector) and tiled.detector.num_threads == 1
+
+
+class CenterDetector(Detector):
+    """
+    Detector de prueba: una persona de 20 x 20 px en el centro de cada
+    imagen que recibe, y registra las imágenes recibidas
+    """
+    name = 'centro'
+
+    def __init__(self):
+        self.images = []
+
+    def detect_batch(self, image_files):
+        results = []
+        for image_file in image_files:
+            self.images.append(image_file.image)
+            cx, cy = image_file.image.width / 2, image_file.image.height / 2
+            results.append(Detections.from_arrays([0], [0.9], [[cx - 10, cy - 10, cx + 10, cy + 10]]))
+        return results
+
+
+def test_tile_starts_cover_the_axis():
+    assert tile_starts(500, 640, 512) == [0]
+    assert tile_starts(1500, 640, 512) == [0, 512, 860]
+
+
+def test_tiled_detector_maps_tile_boxes_to_original_pixels():
+    inner = CenterDetector()
+    tiled = TiledDetector(inner, tile_size=400, overlap=100, workers=2, max_side=800)
+    detections = tiled.detect(jpeg_file('obra.jpg', size=(1600, 800)))
+    # Imagen entera reducida a 800 x 400 + una fila de 3 recortes (x = 0, 300 y 400)
+    assert [image.size for image in inner.images] == [(800, 400), (400, 400), (400, 400), (400, 400)]
+    centers = sorted(((box[0] + box[2]) / 2, (box[1] + box[3]) / 2) for box in detections.boxes.tolist())
+    assert centers == [(400, 400), (800, 400), (1000, 400), (1200, 400)]
+
+
+def test_tiled_detector_reuses_ingested_copy_at_full_resolution():
+    inner = CenterDetector()
+    budget = SessionMemoryBudget()
+    ingested = budget.ingest('upload:a', 'obra.jpg', jpeg_file('obra.jpg', size=(600, 400)).getvalue())
+    TiledDetector(inner, tile_size=320, overlap=64, max_side=4096).detect(ingested)
+    assert inner.images[0] is ingested.image
+
+
+def test_tiled_decode_is_counted_against_session_budget():
+    data = jpeg_file('obra.jpg', size=(2400, 1600)).getvalue()
+    budget = SessionMemoryBudget(max_bytes=len(data) + 1440 * 960 * 3 + 2400 * 1600 * 3)
+    ingested = budget.ingest('upload:a', 'obra.jpg', data)
+    used = budget.used_bytes
+
+    inner = CenterDetector()
+    TiledDetector(inner, tile_size=1200, overlap=100, max_side=4096).detect(ingested)
+    assert inner.images[0].size == (2400, 1600)
+    # La reserva dura lo que el lote
+    assert budget.used_bytes == used
+
+    budget.max_bytes = used + 1000
+    with pytest.raises(IngestLimitError):
+        TiledDetector(CenterDetector(), tile_size=1200, overlap=100, max_side=4096).detect(ingested)
+    assert budget.used_bytes == used
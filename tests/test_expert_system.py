@@ -0,0 +1,49 @@
+import numpy as np
+
+from safebuild import SafetyExpertSystem
+from safebuild.expert_system import STAT_KEYS
+
+
+def test_analyze_batch_matches_per_frame(frames):
+    expert_system = SafetyExpertSystem()
+    assert expert_system.analyze_batch(frames) == [expert_system.analyze_detections(f) for f in frames]
+
+
+def test_analyze_batch_accepts_dict_frames(frames):
+    expert_system = SafetyExpertSystem()
+    dict_frames = [frame.to_dicts() for frame in frames[:50]]
+    assert expert_system.analyze_batch(dict_frames) == expert_system.analyze_batch(frames[:50])
+
+
+def test_analyze_batch_empty():
+    assert SafetyExpertSystem().analyze_batch([]) == []
+
+
+def test_count_classes_batch(frames):
+    expert_system = SafetyExpertSystem()
+    counts = expert_system.count_classes_batch(frames)
+    assert counts.shape == (len(frames), 4)
+    for frame, row in zip(frames, counts):
+        assert row.tolist() == np.bincount(frame.class_ids, minlength=4).tolist()
+
+
+def test_worker_stats_batch_shape(frames):
+    stats, workers = SafetyExpertSystem().worker_stats_batch(frames)
+    assert stats.shape == (len(frames), len(STAT_KEYS))
+    assert [len(frame_workers) for frame_workers in workers] == stats[:, STAT_KEYS['persons']].tolist()
+
+
+def test_match_rules_batch_first_rule_wins():
+    expert_system = SafetyExpertSystem()
+    names = list(expert_system.rules)
+    # personas, cascos, chalecos, con ambos
+    counts = np.array([
+        [2, 0, 2, 0],  # nadie con casco
+        [2, 1, 2, 1],  # falta un casco
+        [2, 2, 0, 0],  # nadie con chaleco
+        [2, 2, 2, 2],  # todo en orden
+        [0, 0, 0, 0],  # sin personas
+    ])
+    matched = expert_system.match_rules_batch(counts)
+    assert [names[i] for i in matched] == [
+        'no_helmet_critical', 'no_helmet_partial', 'no_vest_critical', 'proper_equipment', 'no_persons']
@@ -0,0 +1,60 @@
+import pytest
+from conftest import analysis
+
+from safebuild.history import HistoryStore, batch_summary, compliance_ratio, compliant_count
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / 'h.db'))
+    yield store
+    store.close()
+
+
+def test_compliance_ratio():
+    assert compliance_ratio({'persons': 0, 'helmets': 0, 'vests': 0}) is None
+    assert compliance_ratio({'persons': 4, 'helmets': 3, 'vests': 2, 'compliant': 1}) == 0.25
+    # Sin 'compliant' (resultados viejos) se estima con el mínimo
+    assert compliance_ratio({'persons': 4, 'helmets': 3, 'vests': 2}) == 0.5
+
+
+def test_aggregates_per_scope(store):
+    store.record(analysis("ALTA", 2, 0, 2, 0), 'norte', 'c1', elapsed_ms=10, timestamp=1)
+    store.record_many([
+        {'analysis': analysis("OK", 2, 2, 2, 2), 'site': 'norte', 'camera': 'c2', 'elapsed_ms': 20, 'timestamp': 2},
+        {'analysis': analysis("MEDIA", 0, 0, 0, 0), 'site': 'sur', 'camera': 'c1', 'timestamp': 3},
+    ])
+    total = store.summary()
+    assert total['analyses'] == 3 and total['alerts'] == 2 and total['last_ts'] == 3
+    norte = store.summary(site='norte')
+    assert norte['analyses'] == 2 and norte['alerts_alta'] == 1 and norte['alerts_ok'] == 1
+    assert norte['avg_compliance'] == 0.5 and norte['avg_elapsed_ms'] == 15
+    assert store.summary(site='norte', camera='c2')['analyses'] == 1
+    # Sin personas no cuenta para el cumplimiento; sin tiempo no cuenta para el promedio
+    assert store.summary(site='sur')['avg_compliance'] is None
+    assert store.summary(site='sur')['avg_elapsed_ms'] is None
+    assert store.summary(site='nadie')['analyses'] == 0
+
+
+def test_recent_is_newest_first(store):
+    for ts in (1, 3, 2):
+        store.record(analysis("OK", 1, 1, 1, 1), 'norte', 'c', source=f"f{ts}", timestamp=ts)
+    store.record(analysis("OK", 1, 1, 1, 1), 'sur', 'c', source='otra', timestamp=9)
+    assert [row['source'] for row in store.recent(limit=2, site='norte')] == ['f3', 'f2']
+    assert store.recent(limit=1)[0]['source'] == 'otra'
+
+
+def test_batch_summary():
+    summary = batch_summary([analysis("ALTA", 2, 0, 1, 0), analysis("OK", 2, 2, 2, 2), analysis("OK", 0, 0, 0, 0)])
+    assert summary['images'] == 3 and summary['persons'] == 4 and summary['compliant'] == 2
+    assert summary['compliance'] == 0.5
+    assert summary['levels'] == {"ALTA": 1, "MEDIA": 0, "OK": 2}
+    assert batch_summary([])['compliance'] is None
+
+
+def test_batch_summary_estimates_compliance_like_the_history():
+    # Sin 'compliant': nunca más trabajadores en regla que personas
+    legacy = analysis("OK", 1, 3, 2)
+    assert compliant_count(legacy['statistics']) == 1
+    totals = batch_summary([legacy])
+    assert totals['compliant'] == 1 and totals['compliance'] == compliance_ratio(legacy['statistics']) == 1.0
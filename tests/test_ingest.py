@@ -0,0 +1,68 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from safebuild.ingest import (BufferReader, IngestedImage, IngestLimitError, SessionMemoryBudget,
+                              decode_downscaled, estimate_decode_bytes, fit_size)
+
+
+def encoded(size, format='JPEG', mode='RGB'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, 128).save(buffer, format=format)
+    return buffer.getvalue()
+
+
+def test_fit_size_keeps_aspect_and_never_upscales():
+    assert fit_size((4000, 3000), 1440) == (1440, 1080)
+    assert fit_size((300, 200), 1440) == (300, 200)
+
+
+def test_buffer_reader_reads_without_copying():
+    reader = BufferReader(memoryview(b'0123456789'))
+    assert reader.read(3) == b'012'
+    reader.seek(-2, io.SEEK_END)
+    assert reader.read() == b'89'
+
+
+@pytest.mark.parametrize('format, mode', [('JPEG', 'RGB'), ('PNG', 'L'), ('PNG', 'RGBA')])
+def test_small_image_is_fully_decoded(format, mode):
+    # Más chica que max_side: thumbnail no la toca y la copia debe quedar cargada
+    image, original_size = decode_downscaled(encoded((120, 80), format, mode), max_side=1440)
+    assert original_size == (120, 80)
+    assert image.mode == 'RGB' and image.size == (120, 80)
+    assert np.asarray(image).shape == (80, 120, 3)
+
+
+def test_large_jpeg_is_decoded_downscaled():
+    data = encoded((4000, 3000))
+    image, original_size = decode_downscaled(data, max_side=1000)
+    assert original_size == (4000, 3000) and max(image.size) == 1000
+    # Draft decodifica a 1/4: mucho menos que la resolución completa
+    assert estimate_decode_bytes(data, max_side=1000) == 1000 * 750 * 3
+    assert estimate_decode_bytes(encoded((4000, 3000), 'PNG'), max_side=1000) == 4000 * 3000 * 3
+
+
+def test_ingested_image():
+    data = encoded((800, 600))
+    ingested = IngestedImage('obra.jpg', data, max_side=400)
+    assert ingested.getvalue() is data
+    assert ingested.original_size == (800, 600) and ingested.scale == 0.5
+    assert ingested.nbytes == len(data) + 400 * 300 * 3
+    assert ingested.digest == IngestedImage('otra.jpg', data, max_side=400).digest
+
+
+def test_session_budget_rejects_before_decoding_and_releases_slots():
+    data = encoded((800, 600))
+    budget = SessionMemoryBudget(max_bytes=2 * (len(data) + 800 * 600 * 3))
+    budget.ingest('upload:a', 'a.jpg', data)
+    budget.ingest('upload:b', 'b.jpg', data)
+    with pytest.raises(IngestLimitError):
+        budget.ingest('upload:c', 'c.jpg', data)
+    # Reemplazar un slot libera primero la imagen anterior
+    budget.ingest('upload:b', 'b.jpg', data)
+    budget.release_missing('upload:', {'upload:b'})
+    assert budget.get('upload:a') is None and budget.get('upload:b') is not None
+    budget.release('upload:b')
+    assert budget.used_bytes == 0
@@ -0,0 +1,59 @@
+import urllib.request
+
+import pytest
+
+from safebuild.metrics import RULE_SECONDS, STAGE_SECONDS, Histogram, MetricsRegistry, start_metrics_server
+
+
+def test_histogram_quantiles_interpolate_within_bucket():
+    histogram = Histogram(buckets=(1.0, 2.0, 4.0))
+    assert histogram.quantile(0.5) is None
+    for value in (0.5, 1.5, 1.5, 3.0):
+        histogram.observe(value)
+    assert histogram.count == 4 and histogram.sum == pytest.approx(6.5)
+    assert histogram.quantile(0.5) == pytest.approx(1.5)
+    assert histogram.quantile(1.0) == pytest.approx(4.0)
+
+
+def test_summary_per_stage():
+    metrics = MetricsRegistry()
+    with metrics.time_stage('detect'):
+        pass
+    metrics.observe(STAGE_SECONDS, 0.002, stage='rules')
+    metrics.observe(STAGE_SECONDS, 0.004, stage='rules')
+    rows = {row['stage']: row for row in metrics.summary(STAGE_SECONDS)}
+    assert set(rows) == {'detect', 'rules'}
+    assert rows['rules']['count'] == 2 and rows['rules']['mean_ms'] == pytest.approx(3.0)
+    assert metrics.summary(RULE_SECONDS) == []
+
+
+def test_prometheus_text_format():
+    metrics = MetricsRegistry(buckets=(0.001, 0.01))
+    metrics.observe(STAGE_SECONDS, 0.005, stage='detect')
+    lines = metrics.render_prometheus().splitlines()
+    assert lines[:2] == [f"# HELP {STAGE_SECONDS} Duración de cada etapa del análisis", f"# TYPE {STAGE_SECONDS} histogram"]
+    assert f'{STAGE_SECONDS}_bucket{{stage="detect",le="0.001"}} 0' in lines
+    assert f'{STAGE_SECONDS}_bucket{{stage="detect",le="0.01"}} 1' in lines
+    assert f'{STAGE_SECONDS}_bucket{{stage="detect",le="+Inf"}} 1' in lines
+    assert f'{STAGE_SECONDS}_count{{stage="detect"}} 1' in lines
+
+
+def test_prometheus_escapes_label_values():
+    metrics = MetricsRegistry(buckets=(1.0,))
+    metrics.observe(RULE_SECONDS, 0.5, rule='casco "obligatorio"\\zona\nnorte')
+    text = metrics.render_prometheus()
+    assert f'{RULE_SECONDS}_count{{rule="casco \\"obligatorio\\"\\\\zona\\nnorte"}} 1' in text.splitlines()
+
+
+def test_metrics_endpoint():
+    metrics = MetricsRegistry()
+    metrics.observe(STAGE_SECONDS, 0.01, stage='rules')
+    server = start_metrics_server(metrics, 0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(f"{url}/metrics", timeout=5) as response:
+            assert 'stage="rules"' in response.read().decode('utf-8')
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{url}/otra", timeout=5)
+    finally:
+        server.shutdown()
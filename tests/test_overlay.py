@@ -0,0 +1,57 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from safebuild.detections import Detections
+from safebuild.overlay import (HELMET_COLOR, MAX_OVERLAY_WIDTH, NON_COMPLIANT_COLOR, OTHER_COLOR, VEST_COLOR,
+                               OverlayCache, box_colors, fill_rectangles, render_overlay)
+
+SCENE = Detections.from_dicts([
+    {'class_name': 'person', 'confidence': 0.9, 'bbox': [100, 100, 180, 250]},
+    {'class_name': 'helmet', 'confidence': 0.9, 'bbox': [110, 90, 140, 120]},
+    {'class_name': 'safety_vest', 'confidence': 0.9, 'bbox': [100, 120, 180, 170]},
+    {'class_name': 'person', 'confidence': 0.9, 'bbox': [300, 150, 380, 300]},
+    {'class_name': 'helmet', 'confidence': 0.9, 'bbox': [310, 140, 340, 170]},
+    {'class_name': 'person', 'confidence': 0.9, 'bbox': [500, 150, 580, 300]},
+    {'class_name': 'dog', 'confidence': 0.9, 'bbox': [0, 0, 10, 10]},
+])
+
+
+def test_box_colors_by_compliance():
+    assert box_colors(SCENE).tolist() == [
+        NON_COMPLIANT_COLOR + 2, HELMET_COLOR, VEST_COLOR, NON_COMPLIANT_COLOR + 1, HELMET_COLOR,
+        NON_COMPLIANT_COLOR, OTHER_COLOR,
+    ]
+
+
+def test_fill_rectangles_matches_slicing():
+    rng = np.random.default_rng(0)
+    canvas = np.zeros((60, 80, 3), dtype=np.uint8)
+    expected = canvas.copy()
+    x = np.sort(rng.integers(0, 80, size=(30, 2)), axis=1)
+    y = np.sort(rng.integers(0, 60, size=(30, 2)), axis=1)
+    rects = np.stack([x[:, 0], y[:, 0], x[:, 1], y[:, 1]], axis=1)
+    colors = rng.integers(0, 256, size=(30, 3), dtype=np.uint8)
+    for (x1, y1, x2, y2), color in zip(rects, colors):
+        expected[y1:y2, x1:x2] = color
+    fill_rectangles(canvas, rects, colors)
+    assert np.array_equal(canvas, expected)
+
+
+def test_render_overlay_limits_width():
+    image = Image.new('RGB', (2000, 1000), (255, 255, 255))
+    jpeg = render_overlay(image, SCENE, scale=0.5)
+    with Image.open(io.BytesIO(jpeg)) as rendered:
+        assert rendered.format == 'JPEG' and rendered.size == (MAX_OVERLAY_WIDTH, 730)
+    with Image.open(io.BytesIO(render_overlay(image, Detections(), scale=1.0))) as empty:
+        assert np.asarray(empty).min() > 240
+
+
+def test_overlay_cache_reuses_same_detections():
+    cache = OverlayCache()
+    image = Image.new('RGB', (640, 480))
+    first = cache.get_or_render('img', image, SCENE, 1.0)
+    assert cache.get_or_render('img', image, SCENE[:], 1.0) is first
+    cache.get_or_render('img', image, SCENE[:3], 1.0)
+    assert (cache.hits, cache.misses) == (1, 2)
@@ -0,0 +1,77 @@
+import io
+from types import SimpleNamespace
+
+from PIL import Image
+
+from safebuild import SafetyExpertSystem
+from safebuild.cache import AnalysisCache
+from safebuild.detection import MemoryImageFile
+from safebuild.metrics import STAGE_SECONDS, MetricsRegistry
+from safebuild.pipeline import STAGES, AnalysisPipeline
+from safebuild.rules import compile_rules
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 30)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_job_runs_all_background_stages():
+    metrics = MetricsRegistry()
+    cache = AnalysisCache()
+    pipeline = AnalysisPipeline(SafetyExpertSystem(), cache=cache, metrics=metrics)
+    job = pipeline.submit(MemoryImageFile('peligro.png', png_bytes()), cache_key='k')
+    assert job.wait(5)
+    assert job.error is None
+    assert job.analysis['alert_level'] == "ALTA"
+    # La etapa render la completa la interfaz
+    assert job.completed_stages == len(STAGES) - 1
+    with job.stage('render'):
+        pass
+    assert job.progress == 1.0
+    assert cache.get('k')['analysis'] == job.analysis
+    assert {row['stage'] for row in metrics.summary(STAGE_SECONDS)} == {name for name, _ in STAGES}
+    pipeline.shutdown()
+
+
+def test_job_uses_its_own_expert_system():
+    always_ok = compile_rules({'rules': [{'name': 'todo_ok', 'level': "OK", 'when': {'persons': {'ge': 0}}}]})
+    pipeline = AnalysisPipeline(SafetyExpertSystem())
+    job = pipeline.submit(MemoryImageFile('peligro.png', png_bytes()), expert_system=SafetyExpertSystem(always_ok))
+    assert job.wait(5)
+    assert job.analysis['rule'] == 'todo_ok'
+    pipeline.shutdown()
+
+
+def test_errors_are_reported_on_the_job():
+    class BrokenDetector:
+        def detect(self, image_file):
+            raise RuntimeError("sin modelo")
+
+    pipeline = AnalysisPipeline(SafetyExpertSystem(), detector=BrokenDetector())
+    job = pipeline.submit(SimpleNamespace(name='x.png', original_size=(40, 30), getvalue=png_bytes))
+    assert job.wait(5)
+    assert isinstance(job.error, RuntimeError)
+    assert job.analysis is None
+    pipeline.shutdown()
+
+
+def test_batch_of_uploads_runs_concurrently_on_the_pool():
+    from safebuild.history import batch_summary
+    from safebuild.ingest import SessionMemoryBudget
+
+    budget = SessionMemoryBudget()
+    names = [f"{kind}_{index}.png" for index in range(6) for kind in ('peligro', 'seguro')]
+    ingested = [budget.ingest(f"upload:{name}", name, png_bytes()) for name in names]
+    pipeline = AnalysisPipeline(SafetyExpertSystem(), max_workers=3)
+    jobs = [pipeline.submit(image) for image in ingested]
+    assert all(job.wait(5) for job in jobs)
+    pipeline.shutdown()
+
+    levels = {image.name: job.analysis['alert_level'] for image, job in zip(ingested, jobs)}
+    assert {level for name, level in levels.items() if name.startswith('peligro')} == {"ALTA"}
+    assert {level for name, level in levels.items() if name.startswith('seguro')} == {"OK"}
+    summary = batch_summary([job.analysis for job in jobs])
+    assert summary['images'] == 12 and summary['levels'] == {"ALTA": 6, "MEDIA": 0, "OK": 6}
+    assert summary['compliance'] == 0.5
@@ -0,0 +1,144 @@
+import csv
+import io
+import sqlite3
+from datetime import datetime
+
+import pytest
+from conftest import analysis
+
+from safebuild.history import ANALYSIS_COLUMNS, HistoryStore
+from safebuild.reports import ExportTooLarge, export, main
+
+
+def at(*args):
+    return datetime(*args).timestamp()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / 'h.db'))
+    # Lunes 1 y martes 2 de enero, lunes 8 de enero y 5 de febrero de 2024
+    store.record(analysis("ALTA", 2, 0, 2, 0), 'norte', 'c1', timestamp=at(2024, 1, 1, 9))
+    store.record(analysis("OK", 2, 2, 2, 2), 'norte', 'c1', timestamp=at(2024, 1, 2, 9))
+    store.record(analysis("MEDIA", 4, 3, 2, 1), 'sur', 'c1', timestamp=at(2024, 1, 2, 10))
+    store.record(analysis("OK", 0, 0, 0, 0), 'norte', 'c2', timestamp=at(2024, 1, 8, 9))
+    store.record(analysis("OK", 1, 1, 1, 1), 'norte', 'c1', timestamp=at(2024, 2, 5, 9))
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize('period,expected', [
+    ('day', [('2024-01-01', 'norte', 1), ('2024-01-02', 'norte', 1), ('2024-01-02', 'sur', 1),
+             ('2024-01-08', 'norte', 1), ('2024-02-05', 'norte', 1)]),
+    ('week', [('2024-01-01', 'norte', 2), ('2024-01-01', 'sur', 1), ('2024-01-08', 'norte', 1),
+              ('2024-02-05', 'norte', 1)]),
+    ('month', [('2024-01-01', 'norte', 3), ('2024-01-01', 'sur', 1), ('2024-02-01', 'norte', 1)]),
+])
+def test_report_groups_by_period_and_site(store, period, expected):
+    rows = list(store.iter_report(period))
+    assert [(row['period'], row['site'], row['analyses']) for row in rows] == expected
+    # Los tramos se alinean a los períodos: ningún grupo queda partido
+    assert list(store.iter_report(period, chunk_periods=1)) == rows
+
+
+def test_report_ratios_and_filters(store):
+    week = list(store.iter_report('week', start=datetime(2024, 1, 1), end=datetime(2024, 1, 8), site='norte'))
+    assert len(week) == 1
+    row = week[0]
+    assert row['persons'] == 4 and row['compliant'] == 2 and row['compliance'] == 0.5
+    assert row['helmet_ratio'] == 0.5 and row['vest_ratio'] == 1.0
+    assert (row['alerts_alta'], row['alerts_media'], row['alerts_ok']) == (1, 0, 1)
+    empty = next(row for row in store.iter_report('day') if row['period'] == '2024-01-08')
+    assert empty['images_with_persons'] == 0 and empty['compliance'] is None
+
+
+def test_report_on_empty_history(tmp_path):
+    store = HistoryStore(str(tmp_path / 'vacio.db'))
+    assert list(store.iter_report('day')) == []
+    store.close()
+
+
+def test_old_database_is_migrated_and_compliance_estimated(tmp_path):
+    path = str(tmp_path / 'viejo.db')
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE analyses (id INTEGER PRIMARY KEY, ts REAL NOT NULL, site TEXT NOT NULL, "
+        "camera TEXT NOT NULL, source TEXT NOT NULL, persons INTEGER NOT NULL, helmets INTEGER NOT NULL, "
+        "vests INTEGER NOT NULL, alert_level TEXT NOT NULL, alert_message TEXT NOT NULL, elapsed_ms REAL)"
+    )
+    connection.execute("INSERT INTO analyses (ts, site, camera, source, persons, helmets, vests, alert_level, "
+                       "alert_message) VALUES (?, 'norte', 'c1', 'a.jpg', 4, 3, 2, 'MEDIA', '')",
+                       (at(2024, 1, 1, 9),))
+    connection.commit()
+    connection.close()
+
+    store = HistoryStore(path)
+    store.record(analysis("OK", 2, 2, 2, 1), 'norte', 'c1', timestamp=at(2024, 1, 1, 10))
+    rows = list(store.iter_analyses())
+    assert [row['compliant'] for row in rows] == [None, 1]
+    # La fila vieja se estima con el mínimo de cascos, chalecos y personas
+    report, = store.iter_report('day')
+    assert report['compliant'] == 2 + 1 and report['compliance'] == 3 / 6
+    store.close()
+
+
+def test_iter_analyses_pages_in_date_order(store):
+    # Dos filas con el mismo ts: la paginación por (ts, id) no las pierde ni repite
+    store.record(analysis("OK", 0, 0, 0, 0), 'sur', 'c2', timestamp=at(2024, 1, 2, 9))
+    rows = list(store.iter_analyses(chunk_size=2))
+    assert len(rows) == 6 and len({row['id'] for row in rows}) == 6
+    assert [row['ts'] for row in rows] == sorted(row['ts'] for row in rows)
+    assert list(rows[0]) == list(ANALYSIS_COLUMNS)
+    january = list(store.iter_analyses(start=datetime(2024, 1, 2), end=datetime(2024, 2, 1), site='norte',
+                                       chunk_size=1))
+    assert [row['camera'] for row in january] == ['c1', 'c2']
+
+
+def test_export_csv(store):
+    out = io.StringIO()
+    written = export(store, out, period='month', chunk_rows=1)
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert written == len(rows) == 3
+    assert rows[0]['period'] == '2024-01-01' and rows[0]['site'] == 'norte' and rows[0]['analyses'] == '3'
+    out = io.StringIO()
+    assert export(store, out, kind='analyses', site='sur') == 1
+    row, = csv.DictReader(io.StringIO(out.getvalue()))
+    assert row['camera'] == 'c1' and row['alert_level'] == 'MEDIA' and row['compliant'] == '1'
+
+
+def test_export_stops_at_max_rows(store):
+    assert export(store, io.StringIO(), kind='analyses', max_rows=5) == 5
+    out = io.StringIO()
+    with pytest.raises(ExportTooLarge):
+        export(store, out, kind='analyses', max_rows=2, chunk_rows=1)
+    # Nunca se escribe más allá del límite
+    assert len(out.getvalue().splitlines()) <= 1 + 2
+
+
+def test_export_rejects_unknown_options(store):
+    with pytest.raises(ValueError):
+        export(store, io.StringIO(), fmt='xlsx')
+    with pytest.raises(ValueError):
+        export(store, io.StringIO(), kind='otro')
+    with pytest.raises(ValueError):
+        list(store.iter_report('year'))
+
+
+def test_export_parquet(store, tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'filas.parquet')
+    assert export(store, path, kind='analyses', fmt='parquet', chunk_rows=2) == 5
+    table = pq.read_table(path)
+    assert table.column_names == list(ANALYSIS_COLUMNS)
+    assert table.column('site').to_pylist() == ['norte', 'norte', 'sur', 'norte', 'norte']
+    assert pq.ParquetFile(path).num_row_groups == 3
+
+
+def test_cli_end_date_is_inclusive(store, tmp_path, capsys):
+    output = tmp_path / 'semanal.csv'
+    main(['--history', store.path, '--period', 'day', '--from', '2024-01-02', '--to', '2024-01-08',
+          '-o', str(output)])
+    rows = list(csv.DictReader(output.open(encoding='utf-8')))
+    assert [(row['period'], row['site']) for row in rows] == [
+        ('2024-01-02', 'norte'), ('2024-01-02', 'sur'), ('2024-01-08', 'norte')]
+    assert "Filas exportadas: 3" in capsys.readouterr().err
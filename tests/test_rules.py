@@ -0,0 +1,110 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from safebuild import SafetyExpertSystem
+from safebuild.rules import BUILTIN_RULES, RuleBook, RuleFileError, RuleRegistry, compile_rules, load_rule_file
+
+STRICT = {
+    'all_matches': True,
+    'rules': [
+        {'name': 'grave', 'level': "ALTA", 'when': {'persons': {'gt': 0}, 'non_compliance_ratio': {'gt': 0.5}}},
+        {'name': 'tolerado', 'level': "OK", 'when': [{'persons': {'eq': 0}}, {'non_compliance_ratio': {'le': 0.5}}]},
+    ],
+}
+
+
+def write_rules(path, spec):
+    path.write_text(json.dumps(spec), encoding='utf-8')
+    # mtime distinto aunque el archivo se reescriba en el mismo instante
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    return str(path)
+
+
+def stats(persons, helmets, vests, compliant):
+    return {'persons': persons, 'helmets': helmets, 'vests': vests, 'compliant': compliant}
+
+
+def test_compiled_rules_work_per_frame_and_batched():
+    ruleset = compile_rules(STRICT)
+    assert ruleset.all_matches and list(ruleset.rules) == ['grave', 'tolerado']
+    grave, tolerado = (rule['condition'] for rule in ruleset.rules.values())
+    assert grave(stats(4, 1, 1, 1)) and not tolerado(stats(4, 1, 1, 1))
+    assert tolerado(stats(4, 2, 2, 2)) and tolerado(stats(0, 0, 0, 0))
+
+    counts = np.array([[4, 1, 1, 1], [4, 2, 2, 2], [0, 0, 0, 0]])
+    assert SafetyExpertSystem(ruleset).match_rules_batch(counts).tolist() == [0, 1, 1]
+
+
+@pytest.mark.parametrize('spec, message', [
+    ({}, "lista 'rules'"),
+    ({'rules': [{'name': 'a', 'when': {'persons': {'gt': 0}}}] * 2}, "duplicada"),
+    ({'rules': [{'level': "GRAVE", 'when': {'persons': {'gt': 0}}}]}, "nivel desconocido"),
+    ({'rules': [{'name': 'a'}]}, "falta 'when'"),
+    ({'rules': [{'when': {'altura': {'gt': 0}}}]}, "métrica desconocida"),
+    ({'rules': [{'when': {'persons': {'between': 0}}}]}, "operador desconocido"),
+    ({'rules': [{'when': {'persons': {'gt': "__import__('os')"}}}]}, "métrica desconocida"),
+    ({'rules': [{'when': {'helmet_ratio': {'gt': 'persons'}}}]}, "solo se compara con números"),
+    ({'rules': [{'when': {'persons': {'gt': float('nan')}}}]}, "número o una métrica"),
+])
+def test_invalid_specs_are_rejected(spec, message):
+    with pytest.raises(RuleFileError, match=message):
+        compile_rules(spec)
+
+
+def test_fingerprint_follows_content():
+    assert compile_rules(STRICT).fingerprint == compile_rules(json.loads(json.dumps(STRICT))).fingerprint
+    assert compile_rules(STRICT).fingerprint != BUILTIN_RULES.fingerprint
+
+
+def test_yaml_rule_file(tmp_path):
+    pytest.importorskip('yaml')
+    path = tmp_path / 'obra.yaml'
+    path.write_text("rules:\n  - name: siempre\n    when: {persons: {ge: 0}}\n", encoding='utf-8')
+    assert list(load_rule_file(str(path)).rules) == ['siempre']
+
+
+def test_rule_book_hot_reload_keeps_last_valid_rules(tmp_path):
+    path = write_rules(tmp_path / 'obra.json', STRICT)
+    book = RuleBook(path, check_interval=0)
+    assert list(book.current().rules) == ['grave', 'tolerado'] and book.error is None
+
+    write_rules(tmp_path / 'obra.json', {'rules': [{'name': 'nueva', 'when': {'persons': {'ge': 0}}}]})
+    assert list(book.current().rules) == ['nueva']
+
+    write_rules(tmp_path / 'obra.json', {'rules': [{'name': 'rota', 'when': {'altura': {'gt': 0}}}]})
+    assert list(book.current().rules) == ['nueva']
+    assert "altura" in book.error
+
+
+def test_registry_per_site_with_default(tmp_path):
+    write_rules(tmp_path / 'norte.json', STRICT)
+    registry = RuleRegistry(str(tmp_path), check_interval=0)
+    assert registry.rules_for('norte').fingerprint == compile_rules(STRICT).fingerprint
+    assert registry.rules_for('sur') is BUILTIN_RULES
+
+    write_rules(tmp_path / 'default.json', {'rules': [{'name': 'base', 'when': {'persons': {'ge': 0}}}]})
+    assert list(registry.rules_for('sur').rules) == ['base']
+    assert registry.book('sur') is registry.book('este')
+
+
+def test_registry_rejects_site_names_outside_directory(tmp_path):
+    rules_dir = tmp_path / 'reglas'
+    rules_dir.mkdir()
+    write_rules(tmp_path / 'secreto.json', STRICT)
+    (tmp_path / 'x').mkdir()
+    write_rules(tmp_path / 'x' / 'default.json', STRICT)
+    registry = RuleRegistry(str(rules_dir), check_interval=0)
+    for site in ('../secreto', '../x/default', os.path.join(str(tmp_path), 'secreto'), '..', ''):
+        assert registry.book(site) is None
+
+
+def test_registry_forgets_least_recent_sites(tmp_path):
+    registry = RuleRegistry(str(tmp_path), check_interval=0, max_sites=3)
+    for index in range(10):
+        registry.rules_for(f"obra-{index}")
+    registry.rules_for('obra-7')
+    assert list(registry._paths) == ['obra-8', 'obra-9', 'obra-7']
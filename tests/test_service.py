@@ -0,0 +1,130 @@
+import http.client
+import os
+import signal
+import threading
+import time
+
+import pytest
+from conftest import wait_for
+
+from safebuild import service as service_module
+from safebuild.history import HistoryStore
+from safebuild.service import (IngestService, ServiceClient, ServiceOverloaded, WorkerUnavailable,
+                               camera_partition, start_ingest_server)
+
+
+@pytest.fixture
+def running_service():
+    started = []
+
+    def start(**options):
+        service = IngestService(**{'workers': 1, **options})
+        server = start_ingest_server(service, port=0, max_frame_bytes=1024)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        started.append((service, server))
+        return service, server.server_address[1]
+
+    yield start
+    for service, server in started:
+        server.shutdown()
+        server.server_close()
+        service.close(timeout=5.0)
+
+
+def post(port, headers, body=b''):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    connection.putrequest('POST', '/frames?site=obra&camera=cam1')
+    for name, value in headers.items():
+        connection.putheader(name, value)
+    connection.endheaders()
+    if body:
+        connection.send(body)
+    status = connection.getresponse().status
+    connection.close()
+    return status
+
+
+def test_camera_partition_is_stable_and_in_range():
+    partitions = [camera_partition('obra', f"cam{i}", 4) for i in range(100)]
+    assert partitions == [camera_partition('obra', f"cam{i}", 4) for i in range(100)]
+    assert set(partitions) == {0, 1, 2, 3}
+
+
+@pytest.mark.parametrize('headers,expected', [
+    ({}, 411),
+    ({'Content-Length': '-5'}, 400),
+    ({'Content-Length': 'abc'}, 400),
+    ({'Content-Length': '4096'}, 413),
+    ({'Content-Length': '0'}, 400),
+])
+def test_post_validates_content_length(running_service, headers, expected):
+    _, port = running_service()
+    assert post(port, headers) == expected
+
+
+def test_frames_are_processed_and_history_flushed_on_close(tmp_path):
+    history = HistoryStore(str(tmp_path / 'historial.db'))
+    service = IngestService(workers=1, history=history)
+    for i in range(5):
+        service.submit('obra', 'cam1', b'imagen', source=f"peligro_{i}.jpg", timestamp=float(i))
+    service.close(timeout=30.0)
+    assert service.stats['processed'] == 5
+    assert history.summary(site='obra')['analyses'] == 5
+    history.close()
+
+
+def test_submit_rejects_when_camera_has_too_many_frames_in_flight(running_service):
+    _, port = running_service(max_inflight_per_camera=0)
+    client = ServiceClient(f"http://127.0.0.1:{port}")
+    with pytest.raises(ServiceOverloaded):
+        client.submit('obra', 'cam1', b'imagen')
+    assert client.status()['rejected'] == 1
+
+
+@pytest.mark.parametrize('expect_continue', [False, True])
+def test_overloaded_post_is_refused_before_reading_the_body(running_service, expect_continue):
+    _, port = running_service(max_inflight_per_camera=0)
+    headers = {'Content-Length': '1000'}
+    if expect_continue:
+        headers['Expect'] = '100-continue'
+    # El cuerpo nunca se envía: si el servicio lo leyera antes de responder, la respuesta no llegaría
+    assert post(port, headers) == 429
+
+
+def test_close_does_not_hang_on_a_full_queue(tmp_path):
+    service = IngestService(workers=1, queue_size=1)
+    pid = service.status()['workers'][0]['pid']
+    os.kill(pid, signal.SIGSTOP)
+    try:
+        service.submit('obra', 'cam1', b'imagen')
+        with pytest.raises(ServiceOverloaded):
+            service.submit('obra', 'cam1', b'imagen')
+        start = time.monotonic()
+        service.close(timeout=1.0)
+        assert time.monotonic() - start < 10
+    finally:
+        os.kill(pid, signal.SIGKILL)
+
+
+def test_dead_worker_waits_for_backoff_before_restarting(running_service, monkeypatch):
+    monkeypatch.setattr(service_module, 'RESTART_BACKOFF_S', 60.0)
+    service, _ = running_service()
+    os.kill(service.status()['workers'][0]['pid'], signal.SIGKILL)
+    wait_for(lambda: service._restart_at[0] is not None, timeout=30.0)
+    worker = service.status()['workers'][0]
+    assert not worker['alive'] and worker['restarts'] == 0
+    # Durante la espera los frames se encolan para el proceso reiniciado
+    service.submit('obra', 'cam1', b'imagen')
+
+    service._restart_at[0] = time.monotonic()
+    wait_for(lambda: service.status()['processed'] == 1, timeout=30.0)
+    assert service.status()['workers'][0]['restarts'] == 1
+
+
+def test_worker_is_abandoned_after_max_restarts(running_service):
+    service, port = running_service(max_restarts=0)
+    os.kill(service.status()['workers'][0]['pid'], signal.SIGKILL)
+    wait_for(lambda: service.status()['workers'][0]['failed'], timeout=30.0)
+    assert service.status()['restarts'] == 0
+    with pytest.raises(WorkerUnavailable):
+        ServiceClient(f"http://127.0.0.1:{port}").submit('obra', 'cam1', b'imagen')
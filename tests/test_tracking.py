@@ -0,0 +1,52 @@
+import numpy as np
+
+from safebuild.tracking import WorkerTracker, greedy_match
+
+
+def worker(x, y, helmet=True, vest=True):
+    return {'bbox': [x, y, x + 60, y + 120], 'helmet': helmet, 'vest': vest}
+
+
+def test_greedy_match_prefers_highest_iou():
+    ious = np.array([[0.9, 0.8], [0.85, 0.1], [0.0, 0.2]])
+    rows, columns = greedy_match(ious, 0.3)
+    assert list(zip(rows.tolist(), columns.tolist())) == [(0, 0)]
+    rows, columns = greedy_match(ious, 0.05)
+    assert sorted(zip(rows.tolist(), columns.tolist())) == [(0, 0), (2, 1)]
+
+
+def test_ids_persist_while_workers_move():
+    tracker = WorkerTracker(min_hits=2)
+    for frame in range(10):
+        a, b = worker(100 + 8 * frame, 200), worker(600 - 8 * frame, 220)
+        # El orden de los registros no importa
+        tracker.update([a, b] if frame % 2 else [b, a], frame)
+    tracks = {track['track_id']: track['bbox'][0] for track in tracker.active_tracks()}
+    # En el primer frame b llegó primero: es el #1
+    assert tracks == {1: 528, 2: 172}
+
+
+def test_episode_opens_once_and_reports_duration():
+    tracker = WorkerTracker(min_hits=1, raise_after=3, clear_after=2)
+    helmets = [True, False, False, False, False, False, True, True, True]
+    events = []
+    for frame, helmet in enumerate(helmets):
+        events += tracker.update([worker(100, 100, helmet=helmet)], float(frame))
+    assert [(event['kind'], event['item']) for event in events] == [('start', 'helmet'), ('end', 'helmet')]
+    start, end = events
+    assert start['alert_level'] == "ALTA" and start['alert_message'] == "Trabajador #1 sin casco"
+    assert (start['started_at'], start['timestamp']) == (1.0, 3.0)
+    assert (end['started_at'], end['timestamp'], end['duration_s']) == (1.0, 5.0, 4.0)
+
+
+def test_lost_track_closes_its_episodes():
+    tracker = WorkerTracker(min_hits=1, raise_after=1, max_age=2)
+    tracker.update([worker(100, 100, vest=False)], 0.0)
+    started = tracker.update([worker(102, 100, vest=False)], 1.0)
+    assert [event['item'] for event in started] == ['vest']
+    assert tracker.active_tracks()[0]['violations'] == ['vest']
+
+    events = [tracker.update([], float(t)) for t in (2, 3, 4)]
+    assert events[:2] == [[], []]
+    assert [(event['kind'], event['duration_s']) for event in events[2]] == [('end', 0.0)]
+    assert tracker.tracks == [] and tracker.close() == []
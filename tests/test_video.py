@@ -0,0 +1,61 @@
+import numpy as np
+from PIL import Image
+
+from safebuild import SafetyExpertSystem
+from safebuild.video import AdaptiveSampler, AlertDebouncer, Frame, analyze_stream, iter_frame_directory
+
+
+def frame(index, value=0.0):
+    return Frame(index, float(index), None, np.full((36, 64), value, dtype=np.float32))
+
+
+def level(name):
+    return {'alert_level': name, 'alert_message': name, 'recommended_action': name}
+
+
+def test_sampler_backs_off_without_persons():
+    sampler = AdaptiveSampler(min_stride=1, max_stride=4, change_threshold=8.0)
+    sampled = []
+    for index in range(20):
+        if sampler.should_sample(frame(index)):
+            sampled.append(index)
+            sampler.update(frame(index), persons=0)
+    # El intervalo se duplica hasta max_stride
+    assert sampled == [0, 2, 6, 10, 14, 18]
+
+
+def test_sampler_samples_on_scene_change_and_persons():
+    sampler = AdaptiveSampler(min_stride=1, max_stride=8)
+    sampler.update(frame(0), persons=0)
+    sampler.update(frame(1), persons=0)
+    assert not sampler.should_sample(frame(2))
+    assert sampler.should_sample(frame(2, value=50.0))
+    sampler.update(frame(2), persons=3)
+    assert sampler.stride == 1 and sampler.should_sample(frame(3))
+
+
+def test_debouncer_confirms_sustained_changes_only():
+    debouncer = AlertDebouncer(raise_after=2, clear_after=3)
+    assert debouncer.update(level("ALTA"), 0) is None
+    # Un frame aislado no alcanza
+    assert debouncer.update(level("OK"), 1) is None
+    assert debouncer.update(level("ALTA"), 2) is None
+    event = debouncer.update(level("ALTA"), 3)
+    assert event['previous_level'] == "OK" and event['alert_level'] == "ALTA" and event['timestamp'] == 2
+    assert debouncer.level == "ALTA"
+    assert [debouncer.update(level("OK"), t) for t in (4, 5)] == [None, None]
+    assert debouncer.update(level("OK"), 6)['timestamp'] == 4
+    assert debouncer.level == "OK"
+
+
+def test_analyze_stream_over_frame_directory(tmp_path):
+    for index in range(6):
+        Image.new('RGB', (64, 36), (index * 40, 0, 0)).save(tmp_path / f"peligro_{index:03d}.png")
+    frames = list(iter_frame_directory(str(tmp_path), fps=2.0))
+    assert [f.timestamp for f in frames] == [0.0, 0.5, 1.0, 1.5, 2.0, 2.5]
+
+    results = list(analyze_stream(frames, SafetyExpertSystem(), debouncer=AlertDebouncer(raise_after=3)))
+    assert results and results[-1]['frames_seen'] == 6
+    events = [r['event'] for r in results if r['event']]
+    assert len(events) == 1 and events[0]['alert_level'] == "ALTA"
+    assert results[-1]['confirmed_level'] == "ALTA"